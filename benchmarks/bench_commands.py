@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+
+    End-to-end latency and throughput benchmark against the local mock server
+
+    $ python benchmarks/bench_commands.py --concurrency 1 4 16 --latency 0.02 --waits 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pysecuritas.api.batch import execute_command  # noqa: E402
+from pysecuritas.api.camera import DirectorySink  # noqa: E402
+from pysecuritas.core.poll import FixedPollStrategy, ExponentialPollStrategy, LearnedPollStrategy  # noqa: E402
+from pysecuritas.core.session import Session  # noqa: E402
+from pysecuritas.testing.server import MockSecuritasServer  # noqa: E402
+
+STRATEGIES = {
+    "fixed": lambda: FixedPollStrategy(),
+    "exponential": lambda: ExponentialPollStrategy(0.05, 2, 1),
+    "learned": lambda: LearnedPollStrategy(0.05, 0.05, 2, 1),
+}
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of a list of values
+    """
+
+    values = sorted(values)
+    if not values:
+        return 0
+
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(server, command, concurrency, iterations, strategy, sink=None):
+    """
+    Runs a command on `concurrency` installations, `iterations` times each, images are written to `sink`
+
+    :return: a tuple (latencies, wall time, requests)
+    """
+
+    session = Session("bench", "bench", None, "es", "es").set_base_url(server.url)
+    session.connect()
+    server.reset_stats()
+    latencies = []
+    lock = threading.Lock()
+
+    def work(installation):
+        view = session.for_installation(str(installation), "1")
+        for _ in range(iterations):
+            started = time.time()
+            execute_command(view, command, 60, strategy, sink)
+            with lock:
+                latencies.append(time.time() - started)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(work, range(concurrency)))
+    wall = time.time() - started
+    requests = server.stats["TOTAL"]
+    session.close()
+
+    return latencies, wall, requests
+
+
+def main(args=None):
+    """
+    Runs the benchmark and prints a report
+    """
+
+    parser = argparse.ArgumentParser(description="pysecuritas end-to-end benchmark")
+    parser.add_argument("--command", default="EST")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--waits", type=int, default=2)
+    parser.add_argument("--image-size", type=int, default=64 * 1024)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="learned")
+    args = parser.parse_args(args)
+
+    print("command=%s latency=%ss waits=%s strategy=%s" % (args.command, args.latency, args.waits, args.strategy))
+    print("%12s %10s %10s %14s %14s" % ("concurrency", "p50 (s)", "p99 (s)", "requests/cmd", "commands/s"))
+    with MockSecuritasServer(args.latency, args.waits, image_size=args.image_size) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        for concurrency in args.concurrency:
+            latencies, wall, requests = run(server, args.command, concurrency, args.iterations,
+                                            STRATEGIES[args.strategy](), DirectorySink(directory))
+            print("%12d %10.3f %10.3f %14.1f %14.2f" % (concurrency, percentile(latencies, 50),
+                                                         percentile(latencies, 99), float(requests) / len(latencies),
+                                                         len(latencies) / wall))
+
+
+if __name__ == "__main__":
+    main()
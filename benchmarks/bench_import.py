@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+
+    Startup time of the cli, each case runs on a fresh interpreter
+
+    $ python benchmarks/bench_import.py --runs 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+HEAVY_MODULES = ("requests", "urllib3", "xmltodict")
+
+CASES = {
+    "python": "pass",
+    "import cli": "import pysecuritas.cli",
+    "cli --help": "from pysecuritas.cli import run_command\n"
+                  "try:\n    run_command(['--help'])\nexcept SystemExit:\n    pass",
+    "import session": "import pysecuritas.core.session",
+    "import api": "import pysecuritas.api.alarm, pysecuritas.api.camera, pysecuritas.api.batch",
+}
+
+
+def measure(code, runs):
+    """
+    Runs code on `runs` fresh interpreters
+
+    :return: a tuple (median seconds, heavy modules imported)
+    """
+
+    script = code + "\nimport sys\nsys.stderr.write(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    timings = []
+    heavy = None
+    for _ in range(runs):
+        started = time.time()
+        process = subprocess.run([sys.executable, "-c", script], cwd=ROOT, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, check=True)
+        timings.append(time.time() - started)
+        heavy = process.stderr.decode("utf-8").strip()
+
+    return sorted(timings)[len(timings) // 2], heavy
+
+
+def main(args=None):
+    """
+    Runs the benchmark and prints a report
+    """
+
+    parser = argparse.ArgumentParser(description="pysecuritas startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(args)
+
+    print("%16s %12s  %s" % ("case", "median (ms)", "http stack imported"))
+    for name, code in CASES.items():
+        median, heavy = measure(code, args.runs)
+        print("%16s %12.1f  %s" % (name, median * 1000, heavy or "-"))
+
+
+if __name__ == "__main__":
+    main()
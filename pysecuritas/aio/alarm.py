@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+from pysecuritas.aio.installation import AsyncInstallation
+from pysecuritas.api.installation import DEFAULT_TIMEOUT
+
+
+class AsyncAlarm(AsyncInstallation):
+    """
+    The asyncio entrypoint to perform any action on an alarm such as arm and disarm
+    """
+
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None):
+        """
+        Initializes alarm api
+        """
+
+        AsyncInstallation.__init__(self, session, timeout, poll_strategy)
+
+    async def execute_command(self, command):
+        """
+        Executes a command
+
+        :param command command to be executed
+
+        :return: the result from the operation
+        """
+
+        if command == "ARM":
+            return await self.activate_total_mode()
+
+        if command == "ARMDAY":
+            return await self.activate_day_mode()
+
+        if command == "ARMNIGHT":
+            return await self.activate_night_mode()
+
+        if command == "PERI":
+            return await self.activate_perimeter_mode()
+
+        if command == "DARM":
+            return await self.disconnect()
+
+        if command == "ARMANNEX":
+            return await self.activate_secondary_mode()
+
+        if command == "DARMANNEX":
+            return await self.disconnect_secondary()
+
+        if command == "EST":
+            return await self.get_status()
+
+    async def activate_total_mode(self):
+        """
+        Activates alarm in total mode (all sensors)
+        """
+
+        return await self.async_request("ARM")
+
+    async def activate_secondary_mode(self):
+        """
+        Activates secondary alarm
+        """
+
+        return await self.async_request("ARMANNEX")
+
+    async def activate_day_mode(self):
+        """
+        Activates alarm in day mode (only sensors configured for day mode will be activated)
+        """
+
+        return await self.async_request("ARMDAY")
+
+    async def activate_night_mode(self):
+        """
+        Activates alarm in night mode (only sensors configured for night mode will be activated)
+        """
+
+        return await self.async_request("ARMNIGHT")
+
+    async def activate_perimeter_mode(self):
+        """
+        Activates alarm in perimeter mode (only sensors configured for exterior mode will be activated)
+        """
+
+        return await self.async_request("PERI")
+
+    async def get_status(self):
+        """
+        Retrieves current alarm status
+        """
+
+        return await self.async_request("EST")
+
+    async def disconnect(self):
+        """
+        Disconnects the alarm
+        """
+
+        return await self.async_request("DARM")
+
+    async def disconnect_secondary(self):
+        """
+        Disconnects the secondary alarm
+        """
+
+        return await self.async_request("DARMANNEX")
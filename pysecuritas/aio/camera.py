@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+
+from pysecuritas.aio.installation import AsyncInstallation
+from pysecuritas.api.camera import ID_SERVICE, DirectorySink, decode_chunks, to_result
+from pysecuritas.api.installation import DEFAULT_TIMEOUT
+from pysecuritas.api.models import Snapshot, as_list
+
+
+class AsyncCamera(AsyncInstallation):
+    """
+    The asyncio entrypoint to retrieve images from cameras
+    """
+
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None):
+        """
+        Initializes camera api
+        """
+
+        AsyncInstallation.__init__(self, session, timeout, poll_strategy)
+        self.instibs = None
+
+    async def execute_command(self, command):
+        """
+        Executes a command
+
+        :param command command to be executed
+
+        :return: the result from the operation
+        """
+
+        if command == "IMG":
+            return await self.capture_snapshots()
+
+    async def capture_snapshots(self, sink=None):
+        """
+        Captures snapshots from a camera
+        Images are written on the default executor so the event loop is not blocked
+
+        :param sink where images are written (see `pysecuritas.api.camera.Sink`), defaults to the current directory
+        """
+
+        sink = sink or DirectorySink()
+        installation = AsyncInstallation(self.session)
+        if self.instibs is None:
+            self.instibs = (await installation.get_sim_and_instibs())["INSTALATION"]["INSTIBS"]
+
+        await self.async_request("IMG", device=self.session.sensor, instibs=self.instibs, idservice=ID_SERVICE)
+        images = (await self.get_inf())["DEVICES"]["DEVICE"]["IMG"]
+        loop = asyncio.get_event_loop()
+        snapshots = []
+        for i, img in enumerate(as_list(images), 1):
+            written = await loop.run_in_executor(None, sink.write, self.session.sensor, i, decode_chunks(img['#text']))
+            snapshots.append(Snapshot(self.session.sensor, i, **{getattr(sink, "field", DirectorySink.field): written}))
+
+        return to_result(snapshots, sink)
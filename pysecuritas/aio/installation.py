@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import time
+
+from pysecuritas.api.installation import DEFAULT_TIMEOUT, RATE_LIMIT, TIME_FILTER, ACTIVITY_FILTER, handle_result
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.retry import COMMAND_RETRIES
+
+
+class AsyncInstallation:
+    """
+    The asyncio entrypoint to retrieve information about an installation
+    """
+
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None):
+        """
+        Initializes endpoint api with an async session
+
+        :param session async session to access securitas api
+        :param timeout timeout before given up on a request attempt
+        :param poll_strategy strategy deciding when to poll for results, defaults to a fixed interval
+        """
+
+        self.session = session
+        self.timeout = timeout
+        self.poll_strategy = poll_strategy or FixedPollStrategy(RATE_LIMIT)
+
+    async def execute_command(self, command):
+        """
+        Executes a command
+
+        :param command command to be executed
+
+        :return: the result from the operation
+        """
+
+        if command == "ACT_V2":
+            return await self.get_activity_log()
+
+        if command == "INS":
+            return await self.get_installations()
+
+        if command == "SRV":
+            return await self.get_sim_and_instibs()
+
+        if command == "MYINSTALLATION":
+            return await self.get_installation_info()
+
+    async def get_activity_log(self, request_id=None):
+        """
+        Gets activity log
+
+        :param request_id request id already calculated (reused)
+        """
+
+        return await self.sync_request("ACT_V2", request_id, timefilter=TIME_FILTER, activityfilter=ACTIVITY_FILTER)
+
+    async def get_sim_and_instibs(self):
+        """
+        Gets information about SIM number and INSTIBS
+        """
+
+        return await self.sync_request("SRV")
+
+    async def get_alias(self):
+        """
+        Returns the installation alias
+
+        :return: the installation alias
+        """
+
+        return (await self.get_sim_and_instibs())["INSTALATION"]["ALIAS"]
+
+    async def get_installation_info(self):
+        """
+        Gets generic information about the installation including sensor IDs
+        """
+
+        return await self.sync_request("MYINSTALLATION")
+
+    async def get_installations(self):
+        """
+        Returns all installations
+        """
+
+        return await self.sync_request("INS")
+
+    async def get_inf(self):
+        """
+        Waits for signal 16 and gets the result from INF command
+
+        :return: a response or nothing if timeout happens
+        """
+
+        request_id = self.session.generate_request_id()
+        self.session.validate_connection()
+        threshold = time.time() + self.timeout
+        while time.time() < threshold:
+            await asyncio.sleep(RATE_LIMIT)
+            log = (await self.get_activity_log(request_id))["LIST"]["REG"][0]
+            if log["@signaltype"] == "16":
+                await asyncio.sleep(RATE_LIMIT)
+
+                return await self.sync_request("INF", request_id, idsignal=log["@idsignal"], signaltype="16")
+
+    async def async_request(self, action, **params):
+        """
+        Performs a double request
+        The first request is sent asynchronously with a given id
+        That same id is then used to get the result
+        The double request is sent again on failures retried by the retry engine of the session (e.g. a busy panel),
+        if any
+
+        :param action action to be performed
+        :param params additional parameters for the request
+
+        :return: a response or nothing if timeout happens
+        """
+
+        retry_engine = self.session.retry_engine
+        if not retry_engine:
+            return await self.double_request(action, **params)
+
+        return await retry_engine.aexecute(lambda: self.double_request(action, **params), self.session.installation,
+                                           COMMAND_RETRIES)
+
+    async def double_request(self, action, **params):
+        """
+        Sends a double request once and polls for its result
+
+        :param action action to be performed
+        :param params additional parameters for the request
+
+        :return: a response or nothing if timeout happens
+        """
+
+        payload = self.session.build_payload(request=action, ID=self.session.generate_request_id(), **params)
+        self.session.validate_connection()
+        payload["request"] = action + "1"
+        started = time.time()
+        await self.session.get(payload)
+        payload["request"] = action + "2"
+        threshold = started + self.timeout
+        delays = self.poll_strategy.delays(action)
+        polls = 0
+        while time.time() < threshold:
+            await asyncio.sleep(next(delays))
+            polls += 1
+            result = await self.request(payload)
+            if result:
+                self.poll_strategy.record(action, time.time() - started)
+                self.session.notify("on_async_request", action, polls, time.time() - started, True)
+
+                return result
+
+        self.session.notify("on_async_request", action, polls, time.time() - started, False)
+
+    async def sync_request(self, action, request_id=None, *arg, **params):
+        """
+        Performs a simple request
+
+        :param action action to be performed
+        :param params additional parameters for the request
+        :param request_id request id already calculated (reused)
+
+        :return: a response or nothing if timeout happens
+        """
+
+        payload = self.session.build_payload(request=action,
+                                             ID=request_id if request_id else self.session.generate_request_id(),
+                                             **params)
+        self.session.validate_connection()
+
+        return await self.request(payload)
+
+    async def request(self, payload):
+        """
+        Performs a get request and returns the result
+
+        :param payload payload sent on the request
+
+        :return: a result from the request
+        """
+
+        result = await self.session.get(payload)
+        result = handle_result(result.get("RES"), result)
+        if result:
+            return result
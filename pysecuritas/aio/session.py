@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from pysecuritas.core.rate_limit import get_priority
+from pysecuritas.core.retry import RELOGIN_CODES
+from pysecuritas.core.session import Session, ConnectionException
+from pysecuritas.core.transport import HttpxTransport, DEFAULT_RETRIES
+
+log = logging.getLogger("pysecuritas")
+
+
+class AsyncSession(Session):
+    """
+    An asyncio session will handle connectivity to interact with securitas installation and devices
+    without blocking the event loop
+    """
+
+    def __init__(self, username, password, installation, country, lang, sensor=None, token_store=None,
+                 keep_login=False, transport=None):
+        """
+        Session initializer
+
+        :param transport optional transport with async support (see `pysecuritas.core.transport`) sending the
+        requests, e.g. an `HttpxTransport` multiplexing them over HTTP/2, closing this session does not close it
+        """
+
+        Session.__init__(self, username, password, installation, country, lang, sensor, token_store, keep_login,
+                         transport)
+        self.async_login_lock = None
+
+    def get_transport(self):
+        """
+        Returns the transport sending the requests, creating an httpx transport if none was given
+        It does not retry by itself if a retry engine was set before its creation
+
+        :return: a transport
+        """
+
+        if self.transport is None:
+            log.debug("Creating new async session")
+            self.transport = HttpxTransport(http2=False, retries=0 if self.retry_engine else DEFAULT_RETRIES)
+
+        return self.transport
+
+    def get_or_create_session(self):
+        """
+        Creates a new async client to make requests or retrieves an existing one
+
+        :return: an httpx async client
+        """
+
+        return self.get_transport().get_or_create_async_client()
+
+    async def connect(self):
+        """
+        Connects to api by logging in and creating a new session
+        If a token store is available, a stored login hash is reused instead, unless it is the one already in use
+        """
+
+        if self.token_store:
+            stored_hash = self.token_store.get(self.username, self.country)
+            if stored_hash and stored_hash != self.login_hash:
+                log.info("Reusing stored login to securitas server")
+                self.login_hash = stored_hash
+                self.login_generation += 1
+
+                return
+
+        log.info("Connecting to securitas server")
+        response = await self.get({"Country": self.country,
+                                   "user": self.username,
+                                   "pwd": self.password,
+                                   "lang": self.lang, "request": "LOGIN",
+                                   "ID": self.generate_request_id()})
+
+        login_hash = response.get("HASH")
+        if response.get("RES") != "OK" or not login_hash:
+            log.error("Unable to login: %s", json.dumps(response))
+
+            raise ConnectionException("Unable to login ")
+
+        log.info("Connected to securitas server")
+        self.login_hash = login_hash
+        self.login_generation += 1
+        if self.token_store:
+            self.token_store.set(self.username, self.country, login_hash)
+
+    async def get(self, payload):
+        """
+        Performs a GET request and returns a dictionary with the parsed response
+        If response happens to end in error, session will try to re-login and repeat the request
+        If a retry engine is set, failures are retried according to its policies
+        :param payload get request parameters
+
+        :return: a parsed structured from the xml response
+        """
+
+        async def _get():
+            if self.rate_limiter:
+                await asyncio.get_event_loop().run_in_executor(None, self.rate_limiter.acquire,
+                                                               get_priority(payload.get("request")))
+            self.notify("before_request", payload)
+            started = time.time()
+            result, size, parse_time, error = None, 0, 0, None
+            try:
+                result, size, parse_time = await self.get_transport().aget(self.base_url, payload, self.timeout,
+                                                                           self.streaming)
+
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.notify("after_request", payload, result, time.time() - started, size, parse_time, error)
+
+        generation = self.login_generation
+
+        async def relogin(result):
+            await self.reconnect(generation, payload.get("hash"))
+            payload["hash"] = self.login_hash
+
+        if self.retry_engine:
+            return await self.retry_engine.aexecute(_get, on_auth=relogin)
+
+        result = await _get()
+        if result.get("ERR") in RELOGIN_CODES:
+            await relogin(result)
+
+            return await _get()
+
+        return result
+
+    async def reconnect(self, generation, used_hash=None):
+        """
+        Logs in again unless another task already did it after the given login generation
+        Concurrent callers wait for a single login and then reuse its hash
+
+        :param generation login generation seen when the failed request was sent
+        :param used_hash hash sent on the failed request, if any
+        """
+
+        if self.async_login_lock is None:
+            self.async_login_lock = asyncio.Lock()
+
+        async with self.async_login_lock:
+            if self.login_generation == generation and used_hash in (None, self.login_hash):
+                self.notify("on_relogin")
+                await self.connect()
+
+    async def close_transport(self):
+        """
+        Closes the transport created by this session, if any, a given transport is left open
+        """
+
+        if self.owns_transport and self.transport is not None:
+            transport, self.transport = self.transport, None
+            await transport.aclose()
+
+    async def close(self):
+        """
+        Closes the session and logout from the api, unless the login should be kept
+        """
+
+        log.info("Closing session to securitas server")
+        try:
+            if self.keep_login:
+                return
+
+            response = await self.get({"Country": self.country,
+                                       "user": self.username,
+                                       "lang": self.lang,
+                                       "request": "CLS",
+                                       "hash": self.login_hash,
+                                       "ID": self.generate_request_id()})
+
+            if response.get("RES") != "OK":
+                log.error("Unable to close session: %s", json.dumps(response))
+
+                raise ConnectionException("Unable to logout")
+
+            if self.token_store:
+                self.token_store.delete(self.username, self.country)
+        finally:
+            try:
+                await self.close_transport()
+            except Exception:
+                pass
+
+    async def __aexit__(self, *args):
+        """
+        Enable closing a session when used on async context manager
+        """
+
+        await self.close()
+
+    async def __aenter__(self):
+        """
+        Enable connecting when used on async context manager
+        """
+
+        await self.connect()
+
+        return self
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from pysecuritas.api.models import ActivityEntry, as_list, to_int
+
+log = logging.getLogger("pysecuritas")
+
+# in seconds
+DEFAULT_INTERVAL = 1
+HISTORY_SIZE = 256
+
+
+def signal_id(reg):
+    """
+    Returns the numeric id of a parsed REG element, ids grow as new signals are registered
+    Entries without a numeric id are considered the oldest ones
+    """
+
+    idsignal = to_int(reg.get("@idsignal"))
+
+    return idsignal if isinstance(idsignal, int) else 0
+
+
+class ActivityStore(object):
+    """
+    Append-only store of activity log entries
+    """
+
+    def append(self, numinst, entries):
+        """
+        Appends entries of an installation
+
+        :param numinst installation number
+        :param entries parsed REG elements, oldest first
+        """
+
+        raise NotImplementedError()
+
+    def cursor(self, numinst):
+        """
+        Returns the last entry stored for an installation
+
+        :param numinst installation number
+
+        :return: a tuple (idsignal, time) or None if nothing was stored
+        """
+
+        raise NotImplementedError()
+
+    def query(self, numinst, since=None, signaltype=None):
+        """
+        Returns stored entries of an installation, oldest first
+
+        :param numinst installation number
+        :param since only entries with a time greater or equal to this one (same format as the api)
+        :param signaltype only entries of this signal type
+        """
+
+        raise NotImplementedError()
+
+
+class SqliteActivityStore(ActivityStore):
+    """
+    Activity store backed by sqlite, indexed by time and signal type
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the store, creating the schema if needed
+
+        :param path database file
+        """
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS activity (numinst TEXT NOT NULL, "
+                                    "idsignal INTEGER NOT NULL, signaltype TEXT, time TEXT, reg TEXT NOT NULL, "
+                                    "PRIMARY KEY (numinst, idsignal))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS activity_time ON activity (numinst, time)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS activity_signaltype "
+                                    "ON activity (numinst, signaltype, time)")
+
+    def append(self, numinst, entries):
+        """
+        Appends entries of an installation, entries already stored are ignored
+        """
+
+        rows = [(numinst, signal_id(reg), reg.get("@signaltype"), reg.get("@time"), json.dumps(reg))
+                for reg in entries]
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO activity VALUES (?, ?, ?, ?, ?)", rows)
+
+    def cursor(self, numinst):
+        """
+        Returns the last entry stored for an installation
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT idsignal, time FROM activity WHERE numinst = ? "
+                                          "ORDER BY idsignal DESC LIMIT 1", (numinst,)).fetchone()
+
+        return tuple(row) if row else None
+
+    def query(self, numinst, since=None, signaltype=None):
+        """
+        Returns stored entries of an installation, oldest first
+        """
+
+        sql = "SELECT reg FROM activity WHERE numinst = ?"
+        params = [numinst]
+        if since is not None:
+            sql += " AND time >= ?"
+            params.append(since)
+        if signaltype is not None:
+            sql += " AND signaltype = ?"
+            params.append(str(signaltype))
+
+        with self.lock:
+            rows = self.connection.execute(sql + " ORDER BY idsignal", params).fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        """
+        Closes the database
+        """
+
+        self.connection.close()
+
+
+class JsonlActivityStore(ActivityStore):
+    """
+    Activity store backed by a json lines file, one entry per line
+    Cursors are rebuilt from the file when the store is opened
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the store
+
+        :param path json lines file
+        """
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.cursors = {}
+        if os.path.exists(path):
+            for numinst, reg in self.read():
+                self.update_cursor(numinst, reg)
+
+    def read(self):
+        """
+        Reads every stored line as a tuple (numinst, reg)
+        """
+
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    line = json.loads(line)
+                    yield line["numinst"], line["reg"]
+
+    def update_cursor(self, numinst, reg):
+        """
+        Moves the cursor of an installation if the entry is newer
+        """
+
+        cursor = self.cursors.get(numinst)
+        if cursor is None or signal_id(reg) > cursor[0]:
+            self.cursors[numinst] = (signal_id(reg), reg.get("@time"))
+
+    def append(self, numinst, entries):
+        """
+        Appends entries of an installation
+        """
+
+        with self.lock, open(self.path, "a") as f:
+            for reg in entries:
+                f.write(json.dumps({"numinst": numinst, "reg": reg}) + "\n")
+                self.update_cursor(numinst, reg)
+
+    def cursor(self, numinst):
+        """
+        Returns the last entry stored for an installation
+        """
+
+        with self.lock:
+            return self.cursors.get(numinst)
+
+    def query(self, numinst, since=None, signaltype=None):
+        """
+        Returns stored entries of an installation, oldest first
+        """
+
+        if not os.path.exists(self.path):
+            return []
+
+        with self.lock:
+            entries = [reg for n, reg in self.read() if n == numinst and
+                       (since is None or (reg.get("@time") or "") >= since) and
+                       (signaltype is None or reg.get("@signaltype") == str(signaltype))]
+
+        return sorted(entries, key=signal_id)
+
+
+class ActivitySync:
+    """
+    Incremental activity log synchronization of an installation
+    Remembers the last seen signal and returns only entries registered after it
+    """
+
+    def __init__(self, installation, store=None):
+        """
+        Initializes the synchronization
+
+        :param installation installation api whose activity log is synchronized
+        :param store optional store where new entries are appended, it also keeps the cursor across runs
+        """
+
+        self.installation = installation
+        self.store = store
+        self.numinst = installation.session.installation
+        self.last_id = None
+        self.last_time = None
+        if store:
+            cursor = store.cursor(self.numinst)
+            if cursor:
+                self.last_id, self.last_time = cursor
+
+    def sync(self):
+        """
+        Requests the activity log and returns the entries not seen yet, oldest first
+        Entries are returned as models if the installation api is typed
+
+        :return: a list of new entries
+        """
+
+        result = self.installation.request_activity_log()
+        entries = sorted(as_list((result.get("LIST") or {}).get("REG")), key=signal_id)
+        if self.last_id is not None:
+            entries = [reg for reg in entries if signal_id(reg) > self.last_id]
+
+        if entries:
+            if self.store:
+                self.store.append(self.numinst, entries)
+            self.last_id = signal_id(entries[-1])
+            self.last_time = entries[-1].get("@time")
+
+        if self.installation.typed:
+            return [ActivityEntry.from_reg(reg) for reg in entries]
+
+        return entries
+
+
+class ActivityWaiter:
+    """
+    A pending wait for a signal of the activity log
+    """
+
+    def __init__(self, signaltype, min_id, key=None, device=None):
+        """
+        Initializes the waiter
+
+        :param signaltype signal type being waited for
+        :param min_id lowest signal id accepted, if None the newest entry of the next poll is accepted as well
+        :param key optional identifier of the waiter (e.g. a request id)
+        :param device only signals of this device are accepted, signals without a device are accepted as well
+        """
+
+        self.signaltype = str(signaltype)
+        self.min_id = min_id
+        self.key = key
+        self.device = None if device is None else str(device)
+        self.future = Future()
+
+    def accepts(self, reg):
+        """
+        Check if a parsed REG element can resolve this waiter
+
+        :return: 2 if it is a signal of the device being waited for, 1 if it has no device, 0 if not accepted
+        """
+
+        if reg.get("@signaltype") != self.signaltype or signal_id(reg) < self.min_id:
+            return 0
+
+        if self.device is None or reg.get("@device") == self.device:
+            return 2
+
+        return 0 if reg.get("@device") else 1
+
+
+class ActivityWatcher:
+    """
+    Polls the activity log of an installation once for any number of waiters
+    Each new signal is dispatched to the oldest waiter of its type and device, so concurrent waiters never share
+    a signal
+    Polling runs on a background thread only while there are waiters
+    """
+
+    def __init__(self, installation, interval=DEFAULT_INTERVAL):
+        """
+        Initializes the watcher
+
+        :param installation installation api used to poll the activity log
+        :param interval time between polls
+        """
+
+        self.installation = installation
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.waiters = []
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.claimed = set()
+        self.request_ids = {}
+        self.last_id = None
+        self.thread = None
+
+    def mark(self):
+        """
+        Returns the id of the newest known signal, polling once if nothing is known yet
+        Signals registered after a mark can later be waited for with `after`
+
+        :return: the newest signal id or 0 if the activity log is empty
+        """
+
+        with self.lock:
+            known = self.last_id is not None
+        if not known:
+            self.poll()
+
+        with self.lock:
+            return self.last_id or 0
+
+    def wait_for(self, signaltype, after=None, key=None, callback=None, device=None):
+        """
+        Waits for a signal of the given type
+
+        :param signaltype signal type to wait for
+        :param after only signals registered after this id (see `mark`) are accepted, if None the newest known
+        signal is accepted as well
+        :param key optional identifier of the waiter
+        :param callback optional function called with the matching entry
+        :param device only signals of this device (e.g. a camera sensor) are accepted, so concurrent waits on
+        different devices get their own signal, signals without a device are accepted if none matches
+
+        :return: a future resolved with the matching REG element, cancel it to stop waiting
+        """
+
+        with self.lock:
+            min_id = after + 1 if after is not None else self.last_id
+            waiter = ActivityWaiter(signaltype, min_id, key, device)
+            if callback:
+                waiter.future.add_done_callback(lambda f: f.cancelled() or f.exception() or callback(f.result()))
+            self.waiters.append(waiter)
+            self.dispatch()
+            if self.waiters and (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(target=self.run, name="pysecuritas-activity-watcher")
+                self.thread.daemon = True
+                self.thread.start()
+
+        return waiter.future
+
+    def run(self):
+        """
+        Polls the activity log while there are waiters, starting right away
+        """
+
+        while True:
+            with self.lock:
+                self.waiters = [w for w in self.waiters if not w.future.done()]
+                if not self.waiters:
+                    self.thread = None
+
+                    return
+
+            try:
+                self.poll()
+            except Exception as e:
+                log.error("Unable to poll activity log: %s", e)
+            time.sleep(self.interval)
+
+    def poll(self):
+        """
+        Requests the activity log once and dispatches new signals to waiters
+        """
+
+        request_id = self.installation.session.generate_request_id()
+        entries = sorted(as_list((self.installation.request_activity_log(request_id).get("LIST") or {}).get("REG")),
+                         key=signal_id)
+        with self.lock:
+            if entries:
+                newest = signal_id(entries[-1])
+                for waiter in self.waiters:
+                    if waiter.min_id is None:
+                        waiter.min_id = newest
+                for reg in entries:
+                    if self.last_id is None or signal_id(reg) > self.last_id:
+                        self.history.append(reg)
+                        self.request_ids[signal_id(reg)] = request_id
+                self.last_id = newest if self.last_id is None else max(self.last_id, newest)
+            self.dispatch()
+
+    def dispatch(self):
+        """
+        Resolves waiters with unclaimed signals of their type, oldest waiter first, preferring signals of the
+        device they wait for
+        Must be called holding the lock
+        """
+
+        for waiter in self.waiters:
+            if waiter.future.done() or waiter.min_id is None:
+                continue
+
+            candidates = [(waiter.accepts(reg), -signal_id(reg), reg) for reg in self.history
+                          if signal_id(reg) not in self.claimed]
+            score, _, reg = max(candidates, key=lambda c: c[:2], default=(0, 0, None))
+            if score and waiter.future.set_running_or_notify_cancel():
+                self.claimed.add(signal_id(reg))
+                waiter.future.set_result(reg)
+
+        self.waiters = [w for w in self.waiters if not w.future.done()]
+        known = set(signal_id(reg) for reg in self.history)
+        self.claimed.intersection_update(known)
+        self.request_ids = dict((k, v) for k, v in self.request_ids.items() if k in known)
+
+    def request_id(self, reg):
+        """
+        Returns the id of the activity log request that first returned a signal, requests about that signal
+        (e.g. INF) are sent with the same id like the api expects
+
+        :param reg parsed REG element returned by a waiter
+
+        :return: the request id or None if the signal is no longer known
+        """
+
+        with self.lock:
+            return self.request_ids.get(signal_id(reg))
+
+
+watchers_lock = threading.Lock()
+
+
+def get_watcher(installation):
+    """
+    Returns the activity watcher shared by every api object of the same session and installation
+    Watchers are kept by the session itself, so they are released along with it
+
+    :param installation installation api, an unbound copy of it is used to poll if a new watcher is created so
+    the deadline or cancellation of a command never stops the shared polling
+
+    :return: an activity watcher
+    """
+
+    session = getattr(installation.session, "parent", installation.session)
+    with watchers_lock:
+        by_installation = session.watchers
+        numinst = installation.session.installation
+        if numinst not in by_installation:
+            if getattr(installation, "context", None) is not None:
+                installation = installation.bind(None)
+            by_installation[numinst] = ActivityWatcher(installation)
+
+        return by_installation[numinst]
@@ -3,7 +3,9 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 
+from pysecuritas.api.commands import ALARM_COMMANDS
 from pysecuritas.api.installation import Installation, DEFAULT_TIMEOUT
+from pysecuritas.api.models import AlarmStatus
 
 
 def get_available_commands():
@@ -11,16 +13,7 @@ def get_available_commands():
     Returns all available commands
     """
 
-    return {
-        "ARM": "arm all sensors (inside)",
-        "ARMDAY": "arm in day mode (inside)",
-        "ARMNIGHT": "arm in night mode (inside)",
-        "PERI": "arm (only) the perimeter sensors",
-        "DARM": "disarm everything (not the annex)",
-        "ARMANNEX": "arm the secondary alarm",
-        "DARMANNEX": "disarm the secondary alarm",
-        "EST": "return the panel status"
-    }
+    return dict(ALARM_COMMANDS)
 
 
 class Alarm(Installation):
@@ -28,12 +21,12 @@ class Alarm(Installation):
     The entrypoint to perform any action on an alarm such as arm and disarm
     """
 
-    def __init__(self, session, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None, typed=False):
         """
         Initializes alarm api
         """
 
-        Installation.__init__(self, session, timeout)
+        Installation.__init__(self, session, timeout, poll_strategy, typed)
 
     def execute_command(self, command):
         """
@@ -73,53 +66,62 @@ class Alarm(Installation):
         Activates alarm in total mode (all sensors)
         """
 
-        return self.async_request("ARM")
+        return self.alarm_request("ARM")
 
     def activate_secondary_mode(self):
         """
         Activates secondary alarm
         """
 
-        return self.async_request("ARMANNEX")
+        return self.alarm_request("ARMANNEX")
 
     def activate_day_mode(self):
         """
         Activates alarm in day mode (only sensors configured for day mode will be activated)
         """
 
-        return self.async_request("ARMDAY")
+        return self.alarm_request("ARMDAY")
 
     def activate_night_mode(self):
         """
         Activates alarm in night mode (only sensors configured for night mode will be activated)
         """
 
-        return self.async_request("ARMNIGHT")
+        return self.alarm_request("ARMNIGHT")
 
     def activate_perimeter_mode(self):
         """
         Activates alarm in perimeter mode (only sensors configured for exterior mode will be activated)
         """
 
-        return self.async_request("PERI")
+        return self.alarm_request("PERI")
 
     def get_status(self):
         """
         Retrieves current alarm status
         """
 
-        return self.async_request("EST")
+        return self.alarm_request("EST")
 
     def disconnect(self):
         """
         Disconnects the alarm
         """
 
-        return self.async_request("DARM")
+        return self.alarm_request("DARM")
 
     def disconnect_secondary(self):
         """
         Disconnects the secondary alarm
         """
 
-        return self.async_request("DARMANNEX")
+        return self.alarm_request("DARMANNEX")
+
+    def alarm_request(self, action):
+        """
+        Performs an alarm action and returns its status
+
+        :param action action to be performed
+        """
+
+        return self.to_model(AlarmStatus.from_result, self.async_request(action))
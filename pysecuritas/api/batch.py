@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import hashlib
+import logging
+import queue
+import threading
+from collections import namedtuple, deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from pysecuritas.api.alarm import get_available_commands as alarm_commands, Alarm
+from pysecuritas.api.camera import get_available_commands as camera_commands, Camera, DirectorySink
+from pysecuritas.api.installation import get_available_commands as installation_commands, Installation, \
+    DEFAULT_TIMEOUT
+from pysecuritas.core.rate_limit import RateLimiter
+from pysecuritas.core.session import Session
+from pysecuritas.core.transport import RequestsTransport
+
+log = logging.getLogger("pysecuritas")
+
+DEFAULT_WORKERS = 16
+DEFAULT_ACCOUNT_WORKERS = 4
+
+Credentials = namedtuple("Credentials", ["username", "password", "country", "lang"])
+
+BatchJob = namedtuple("BatchJob", ["credentials", "installation", "command", "sensor", "directory"])
+BatchJob.__new__.__defaults__ = (None, None)
+
+BatchResult = namedtuple("BatchResult", ["job", "result", "error"])
+
+
+def execute_command(session, command, timeout=DEFAULT_TIMEOUT, poll_strategy=None, sink=None):
+    """
+    Executes a command with the api entity (alarm, installation, camera) that provides it
+
+    :param session session used to perform the command
+    :param command command to be executed
+    :param timeout timeout before given up on a request attempt
+    :param poll_strategy strategy deciding when to poll for results
+    :param sink where images are written (see `pysecuritas.api.camera.Sink`), defaults to the current directory
+
+    :return: the result from the operation
+    """
+
+    if command in alarm_commands():
+        return Alarm(session, timeout, poll_strategy).execute_command(command)
+
+    if command in installation_commands():
+        return Installation(session, timeout, poll_strategy).execute_command(command)
+
+    if command in camera_commands():
+        return Camera(session, timeout, poll_strategy).execute_command(command, sink)
+
+    raise ValueError("Unknown command " + str(command))
+
+
+def hash_password(password):
+    """
+    Returns the digest of a password, identifying the sessions logged in with it without keeping it as a key
+    """
+
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+def close_session(session):
+    """
+    Logs out a session if it is connected, errors are logged and ignored
+    """
+
+    if session.is_connected():
+        try:
+            session.close()
+        except Exception as e:
+            log.error("Unable to close session of %s: %s", session.username, e)
+
+
+class BatchExecutor:
+    """
+    Runs commands over many installations on a bounded pool of workers
+    A single logged in session is shared by all the jobs of the same account
+    and every session shares the same pooled connections
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, account_workers=DEFAULT_ACCOUNT_WORKERS,
+                 timeout=DEFAULT_TIMEOUT, poll_strategy=None, transport=None, cache=None,
+                 rate_limiter=None, account_rate=None):
+        """
+        Initializes the executor
+
+        :param max_workers maximum number of jobs running at the same time
+        :param account_workers maximum number of jobs running at the same time for a single account
+        :param timeout timeout before given up on a request attempt
+        :param poll_strategy strategy deciding when to poll for results
+        :param transport transport shared by the sessions, by default one pooling `max_workers` connections
+        :param cache optional cache of read-only results shared by the sessions
+        :param rate_limiter optional rate limiter shared by every account
+        :param account_rate optional maximum requests per second of each account
+        """
+
+        self.max_workers = max_workers
+        self.account_workers = account_workers
+        self.timeout = timeout
+        self.poll_strategy = poll_strategy
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.transport = transport or RequestsTransport(pool_maxsize=max_workers)
+        self.owns_transport = transport is None
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.account_rate = account_rate
+
+    def get_session(self, credentials):
+        """
+        Returns the logged in session of an account, creating and connecting it if needed
+        Sessions are kept by account and password, a session that cannot connect is not kept and once a session
+        with a new password connects, the ones with the previous password are closed
+
+        :param credentials account credentials
+
+        :return: a connected session
+        """
+
+        key = (credentials.username, credentials.country.upper(), hash_password(credentials.password))
+        with self.lock:
+            session = self.sessions.get(key)
+            created = session is None
+            if created:
+                session = Session(credentials.username, credentials.password, None, credentials.country,
+                                  credentials.lang, transport=self.transport).set_cache(self.cache)
+                session.set_rate_limiter(RateLimiter(self.account_rate, max(1, int(self.account_rate)),
+                                                     self.rate_limiter) if self.account_rate else self.rate_limiter)
+                self.sessions[key] = session
+
+        with session.login_lock:
+            if not session.is_connected():
+                try:
+                    session.connect()
+                except Exception:
+                    with self.lock:
+                        if self.sessions.get(key) is session:
+                            del self.sessions[key]
+                    raise
+
+        if created:
+            with self.lock:
+                replaced = [self.sessions.pop(k) for k in list(self.sessions) if k[:2] == key[:2] and k != key]
+            for previous in replaced:
+                close_session(previous)
+
+        return session
+
+    def execute(self, job):
+        """
+        Executes a single job
+
+        :param job job to be executed
+
+        :return: the result from the operation
+        """
+
+        session = self.get_session(job.credentials).for_installation(job.installation, job.sensor)
+        sink = DirectorySink(job.directory) if job.directory else None
+
+        return execute_command(session, job.command, self.timeout, self.poll_strategy, sink)
+
+    def run(self, jobs):
+        """
+        Runs all jobs, respecting the per account limit, and yields results as each one completes
+
+        :param jobs an iterable of BatchJob
+
+        :return: a generator of BatchResult, in completion order
+        """
+
+        jobs = list(jobs)
+        results = queue.Queue()
+        pending = defaultdict(deque)
+        running = defaultdict(int)
+        futures = set()
+        stopped = threading.Event()
+        lock = threading.RLock()
+        for job in jobs:
+            pending[(job.credentials.username, job.credentials.country.upper())].append(job)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def done(account, job, future):
+                if future.cancelled():
+                    return
+
+                error = future.exception()
+                results.put(BatchResult(job, None if error else future.result(), error))
+                with lock:
+                    futures.discard(future)
+                    running[account] -= 1
+                    submit(account)
+
+            def submit(account):
+                while not stopped.is_set() and running[account] < self.account_workers and pending[account]:
+                    job = pending[account].popleft()
+                    running[account] += 1
+                    future = pool.submit(self.execute, job)
+                    futures.add(future)
+                    future.add_done_callback(lambda f, a=account, j=job: done(a, j, f))
+
+            try:
+                with lock:
+                    for account in list(pending):
+                        submit(account)
+
+                for _ in jobs:
+                    result = results.get()
+                    if result.error:
+                        log.error("Job %s on %s failed: %s", result.job.command, result.job.installation,
+                                  result.error)
+
+                    yield result
+            finally:
+                # the caller stopped early: jobs not started yet are dropped, running ones are waited for
+                with lock:
+                    stopped.set()
+                    pending.clear()
+                    for future in list(futures):
+                        future.cancel()
+
+    def close(self):
+        """
+        Logs out every session opened by this executor and closes its connections
+        """
+
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions = {}
+
+        for session in sessions:
+            close_session(session)
+
+        if self.owns_transport:
+            self.transport.close()
+
+    def __exit__(self, *args):
+        """
+        Enable closing all sessions when used on context manager
+        """
+
+        self.close()
+
+    def __enter__(self):
+        """
+        Enable usage as context manager
+        """
+
+        return self
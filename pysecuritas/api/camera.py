@@ -3,12 +3,20 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from pysecuritas.api.installation import DEFAULT_TIMEOUT
+from pysecuritas.api.activity import get_watcher
+from pysecuritas.api.commands import CAMERA_COMMANDS
+from pysecuritas.api.installation import DEFAULT_TIMEOUT, RequestException
 from pysecuritas.api.installation import Installation
+from pysecuritas.api.models import Snapshot, as_list
 
 ID_SERVICE = 1
+# in bytes of base64 text, must be a multiple of 4
+DECODE_CHUNK_SIZE = 64 * 1024
 
 
 def get_available_commands():
@@ -16,9 +24,186 @@ def get_available_commands():
     Returns all available commands
     """
 
-    return {
-        "IMG": "Take a picture (requires -s)"
-    }
+    return dict(CAMERA_COMMANDS)
+
+
+def decode_chunks(data, chunk_size=DECODE_CHUNK_SIZE):
+    """
+    Decodes a base64 image progressively
+
+    :param data base64 encoded image, as text or bytes
+    :param chunk_size size of each encoded chunk, must be a multiple of 4
+
+    :return: a generator of decoded chunks
+    """
+
+    if not isinstance(data, bytes):
+        data = data.encode("ascii")
+
+    if any(c in data for c in (b"\n", b"\r", b" ", b"\t")):
+        data = b"".join(data.split())
+
+    for i in range(0, len(data), chunk_size):
+        yield base64.b64decode(data[i:i + chunk_size])
+
+
+class Sink(object):
+    """
+    Receives the decoded images of a capture
+    The value returned by `write` is kept on the snapshot attribute named by `field`
+    """
+
+    field = "data"
+
+    def write(self, sensor, index, chunks):
+        """
+        Writes an image
+
+        :param sensor sensor that captured the image
+        :param index position of the image in the capture
+        :param chunks decoded chunks of the image
+
+        :return: a reference to the written image
+        """
+
+        raise NotImplementedError()
+
+
+class DirectorySink(Sink):
+    """
+    Writes images to files in a directory, never overwriting an existing file
+    """
+
+    field = "filename"
+
+    def __init__(self, directory="."):
+        """
+        Initializes the sink
+
+        :param directory directory where images are written
+        """
+
+        self.directory = directory
+
+    def write(self, sensor, index, chunks):
+        """
+        Writes an image
+
+        :param sensor sensor that captured the image
+        :param index position of the image in the capture
+        :param chunks decoded chunks of the image
+
+        :return: the name of the written file
+        """
+
+        base = datetime.now().strftime('%Y%m%d%H%M%S') + '_' + str(sensor) + '_' + str(index)
+        filename = base + '.jpg'
+        attempt = 0
+        while True:
+            try:
+                f = open(os.path.join(self.directory, filename), "xb")
+                break
+            except FileExistsError:
+                attempt += 1
+                filename = base + '_' + str(attempt) + '.jpg'
+
+        with f:
+            for chunk in chunks:
+                f.write(chunk)
+
+        return filename
+
+
+class MemorySink(Sink):
+    """
+    Keeps images in memory, they never touch the disk
+    """
+
+    def write(self, sensor, index, chunks):
+        """
+        Collects an image into a single buffer
+
+        :return: a memoryview of the decoded image
+        """
+
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+
+        return memoryview(buffer)
+
+
+class CallableSink(MemorySink):
+    """
+    Hands each image to a function, e.g. to upload it or run it through a model
+    """
+
+    def __init__(self, function):
+        """
+        Initializes the sink
+
+        :param function function receiving (sensor, index, image) where image is a memoryview
+        """
+
+        self.function = function
+
+    def write(self, sensor, index, chunks):
+        """
+        Calls the function with the decoded image
+
+        :return: the value returned by the function
+        """
+
+        return self.function(sensor, index, MemorySink.write(self, sensor, index, chunks))
+
+
+class StreamSink(Sink):
+    """
+    Writes images to a binary stream (file, socket, upload body...) as they are decoded
+    """
+
+    def __init__(self, stream):
+        """
+        Initializes the sink
+
+        :param stream binary stream with a write method
+        """
+
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, sensor, index, chunks):
+        """
+        Writes an image, images of concurrent captures are never interleaved
+
+        :return: the number of bytes written
+        """
+
+        size = 0
+        with self.lock:
+            for chunk in chunks:
+                self.stream.write(chunk)
+                size += len(chunk)
+
+        return size
+
+
+def to_result(snapshots, sink):
+    """
+    Builds the result of a capture as a dictionary
+
+    :param snapshots captured snapshots
+    :param sink sink where images were written
+
+    :return: the file names (FILES) or the images (IMAGES) by image name
+    """
+
+    field = getattr(sink, "field", DirectorySink.field)
+    if field == "filename":
+        return {"RES": "OK", "MSG": "Images written to disk.",
+                "FILES": dict(("IMG" + str(s.index), s.filename) for s in snapshots)}
+
+    return {"RES": "OK", "MSG": "Images captured.", "IMAGES": dict(("IMG" + str(s.index), s.data) for s in snapshots)}
 
 
 class Camera(Installation):
@@ -26,44 +211,111 @@ class Camera(Installation):
     The entrypoint to retrieve images from cameras
     """
 
-    def __init__(self, session, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None, typed=False):
         """
         Initializes alarm api
         """
 
-        Installation.__init__(self, session, timeout)
+        Installation.__init__(self, session, timeout, poll_strategy, typed)
         self.instibs = None
+        self.lock = threading.Lock()
 
-    def execute_command(self, command):
+    def execute_command(self, command, sink=None):
         """
         Executes a command
 
         :param command command to be executed
+        :param sink where images are written (see `Sink`), defaults to the current directory
 
         :return: the result from the operation
         """
 
         if command == "IMG":
-            return self.capture_snapshots()
+            return self.capture_snapshots(sink)
 
-    def capture_snapshots(self):
+    def capture_snapshots(self, sink=None):
         """
         Captures snapshots from a camera
+
+        :param sink where images are written (see `Sink`), defaults to the current directory
+        """
+
+        sink = sink or DirectorySink()
+        snapshots = self.capture(self.session.sensor, sink)
+        if self.typed:
+            return snapshots
+
+        return to_result(snapshots, sink)
+
+    def capture_images(self):
+        """
+        Captures snapshots from a camera keeping them in memory
+
+        :return: a list of memoryviews of the decoded images
+        """
+
+        return [s.data for s in self.capture(self.session.sensor, MemorySink())]
+
+    def capture_sensors(self, sensors, sink=None, max_workers=None):
+        """
+        Captures snapshots from many cameras at the same time
+
+        :param sensors ids of the camera sensors
+        :param sink where images are written (see `Sink`), defaults to the current directory
+        :param max_workers maximum number of captures running at the same time, defaults to one per sensor
+
+        :return: a dictionary with the result of each sensor
+        """
+
+        sensors = list(sensors)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(sensors))) as pool:
+            futures = dict((sensor, pool.submit(self.capture, sensor, sink)) for sensor in sensors)
+            for sensor, future in futures.items():
+                try:
+                    snapshots = future.result()
+                    results[sensor] = snapshots if self.typed else to_result(snapshots, sink)
+                except Exception as e:
+                    results[sensor] = {"RES": "ERROR", "MSG": str(e)}
+
+        return results
+
+    def get_instibs(self):
+        """
+        Returns the INSTIBS of the installation, requested only once
+        """
+
+        with self.lock:
+            if self.instibs is None:
+                installation = Installation(self.session).bind(self.context)
+                self.instibs = installation.get_sim_and_instibs()["INSTALATION"]["INSTIBS"]
+
+            return self.instibs
+
+    def capture(self, sensor, sink=None):
+        """
+        Captures snapshots from a camera, decoding and writing each image progressively
+
+        :param sensor id of the camera sensor
+        :param sink where images are written, defaults to the current directory
+
+        :return: the list of snapshots
         """
 
-        installation = Installation(self.session)
-        if self.instibs is None:
-            self.instibs = installation.get_sim_and_instibs()["INSTALATION"]["INSTIBS"]
+        sink = sink or DirectorySink()
+        instibs = self.get_instibs()
+        mark = get_watcher(self).mark()
+        self.async_request("IMG", device=sensor, instibs=instibs, idservice=ID_SERVICE)
+        inf = self.get_inf(mark, sensor)
+        if not inf:
+            raise RequestException("Timeout waiting for images of sensor " + str(sensor))
 
-        self.async_request("IMG", device=self.session.sensor, instibs=self.instibs, idservice=ID_SERVICE)
-        images = self.get_inf()["DEVICES"]["DEVICE"]["IMG"]
-        files = {}
-        i = 0
-        for img in images:
-            i += 1
-            filename = datetime.now().strftime('%Y%m%d%H%M%S') + '_' + str(i) + '.jpg'
-            files.update({"IMG" + str(i): filename})
-            with open(filename, "wb") as f:
-                f.write(base64.b64decode(img['#text']))
+        snapshots = []
+        for device in as_list(inf["DEVICES"]["DEVICE"]):
+            device_id = device.get("@id") or sensor
+            for i, img in enumerate(as_list(device["IMG"]), 1):
+                data = img["#text"] if isinstance(img, dict) else img
+                written = sink.write(device_id, i, decode_chunks(data))
+                snapshots.append(Snapshot(device_id, i, **{getattr(sink, "field", DirectorySink.field): written}))
 
-        return {"RES": "OK", "MSG": "Images written to disk.", "FILES": files}
+        return snapshots
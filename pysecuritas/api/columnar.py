@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import calendar
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timedelta
+
+from pysecuritas.api.models import ActivityEntry, as_list, parse_time, to_int
+
+MAGIC = b"PSACTCOL"
+VERSION = 1
+# every column starts on a multiple of this offset so it can be viewed in place
+ALIGNMENT = 8
+# value of numeric columns when the attribute is missing, not a number or out of range, unsigned columns use their
+# largest value instead (see `missing_value`)
+MISSING = -1
+NUMERIC_COLUMNS = (("idsignal", "q"), ("time", "q"), ("type", "i"), ("img", "B"))
+CATEGORY_COLUMNS = ("numinst", "signaltype", "alias", "device", "source")
+COLUMNS = ("numinst", "idsignal", "time", "signaltype", "type", "alias", "device", "source", "img")
+CODE_TYPE = "i"
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_number(value, missing=MISSING):
+    """
+    Converts an attribute to int, missing or non numeric values become `missing`
+    """
+
+    value = to_int(value)
+
+    return value if isinstance(value, int) else missing
+
+
+def missing_value(typecode):
+    """
+    Returns the value stored for missing numbers in a column of the given type: `MISSING`, or the largest value of
+    unsigned types
+    """
+
+    if typecode.isupper():
+        return (1 << 8 * array(typecode).itemsize) - 1
+
+    return MISSING
+
+
+def to_timestamp(value):
+    """
+    Converts an api timestamp (or a datetime) to seconds since 1970-01-01, timezone is kept as sent by the api
+
+    :return: the seconds or `MISSING` if it cannot be parsed
+    """
+
+    if not isinstance(value, datetime):
+        value = parse_time(value)
+
+    return MISSING if value is None else calendar.timegm(value.timetuple())
+
+
+def to_category(value):
+    """
+    Converts an attribute to the text stored in a category column, None if missing
+    """
+
+    return None if value is None else sys.intern(str(value))
+
+
+class Categories:
+    """
+    Column of repeated texts (signal types, devices ...), stored as codes into a list of distinct values
+    Missing values have code -1
+    """
+
+    def __init__(self, values=None, codes=None):
+        """
+        Initializes the column
+
+        :param values distinct values, in code order
+        :param codes codes of every row, an array or a read only view of a file
+        """
+
+        self.values = list(values or [])
+        self.index = dict((v, i) for i, v in enumerate(self.values))
+        self.codes = array(CODE_TYPE) if codes is None else codes
+
+    def append(self, value):
+        """
+        Appends a value, adding it to the distinct values if it is new
+        """
+
+        if value is None:
+            self.codes.append(-1)
+
+            return
+
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+
+        return None if code < 0 else self.values[code]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ActivityColumns:
+    """
+    Activity log entries of many installations stored by column: typed arrays for numbers and timestamps,
+    and codes into distinct values for texts
+    Columns can be converted to NumPy or Arrow, saved to a packed binary file (or Parquet) and loaded back
+    memory-mapped
+    """
+
+    def __init__(self):
+        """
+        Initializes empty columns
+        """
+
+        self.columns = dict((name, array(typecode)) for name, typecode in NUMERIC_COLUMNS)
+        self.columns.update((name, Categories()) for name in CATEGORY_COLUMNS)
+        self.missing = dict((name, missing_value(typecode)) for name, typecode in NUMERIC_COLUMNS)
+        self.map = None
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the columns from many ACT_V2 results
+
+        :param results dictionary of results by installation number, or an iterable of (numinst, result)
+
+        :return: the columns
+        """
+
+        columns = cls()
+        for numinst, result in (results.items() if isinstance(results, dict) else results):
+            columns.extend(numinst, result)
+
+        return columns
+
+    @classmethod
+    def from_store(cls, store, installations, since=None, signaltype=None):
+        """
+        Builds the columns from entries kept in an activity store
+
+        :param store activity store (see `pysecuritas.api.activity`)
+        :param installations installation numbers to be exported
+        :param since only entries with a time greater or equal to this one (same format as the api)
+        :param signaltype only entries of this signal type
+
+        :return: the columns
+        """
+
+        columns = cls()
+        for numinst in installations:
+            for reg in store.query(numinst, since, signaltype):
+                columns.append(numinst, reg)
+
+        return columns
+
+    def extend(self, numinst, result):
+        """
+        Appends every entry of an ACT_V2 result
+
+        :param numinst installation number
+        :param result parsed response, or the list of entries returned by a typed installation api
+
+        :return: the number of entries appended
+        """
+
+        if isinstance(result, list):
+            entries = result
+        else:
+            entries = as_list(((result or {}).get("LIST") or {}).get("REG"))
+        for entry in entries:
+            self.append(numinst, entry)
+
+        return len(entries)
+
+    def append(self, numinst, entry):
+        """
+        Appends an entry
+
+        :param numinst installation number
+        :param entry parsed REG element or `ActivityEntry`
+        """
+
+        if self.map is not None:
+            raise ValueError("Columns loaded from a file are read only")
+
+        if isinstance(entry, ActivityEntry):
+            values = (entry.idsignal, entry.signaltype, entry.time, entry.type, entry.alias, entry.device,
+                      entry.source, entry.img)
+        else:
+            values = tuple(entry.get("@" + name) for name in ActivityEntry.__slots__)
+
+        idsignal, signaltype, time, type, alias, device, source, img = values
+        self.columns["numinst"].append(to_category(numinst))
+        self.append_number("idsignal", idsignal)
+        self.columns["time"].append(to_timestamp(time))
+        self.columns["signaltype"].append(to_category(signaltype))
+        self.append_number("type", type)
+        self.columns["alias"].append(to_category(alias))
+        self.columns["device"].append(to_category(device))
+        self.columns["source"].append(to_category(source))
+        self.append_number("img", img)
+
+    def append_number(self, name, value):
+        """
+        Appends an attribute to a numeric column, values that do not fit the column are stored as missing
+        """
+
+        column = self.columns[name]
+        try:
+            column.append(to_number(value, self.missing[name]))
+        except OverflowError:
+            column.append(self.missing[name])
+
+    def column(self, name):
+        """
+        Returns a column, an array (or a read only view) of numbers or `Categories`
+        """
+
+        return self.columns[name]
+
+    def row(self, index):
+        """
+        Returns an entry as a dictionary, timestamps as datetime and missing values as None
+        """
+
+        row = {}
+        for name in COLUMNS:
+            value = self.columns[name][index]
+            if name in self.missing and value == self.missing[name]:
+                value = None
+            elif name == "time":
+                value = EPOCH + timedelta(seconds=value)
+            row[name] = value
+
+        return row
+
+    def __len__(self):
+        return len(self.columns["idsignal"])
+
+    def to_numpy(self):
+        """
+        Returns the columns as NumPy arrays sharing memory with numeric columns where possible
+        Timestamps are datetime64[s] (NaT if missing), missing numbers are `MISSING` (the largest value of unsigned
+        columns, e.g. 255 for img) and texts are their codes, see `categories`
+
+        :return: a dictionary of arrays by column name
+        """
+
+        import numpy
+
+        arrays = {}
+        for name, _ in NUMERIC_COLUMNS:
+            arrays[name] = numpy.frombuffer(self.columns[name], dtype=get_typecode(self.columns[name]))
+        times = arrays["time"].astype("datetime64[s]")
+        times[arrays["time"] == MISSING] = numpy.datetime64("NaT")
+        arrays["time"] = times
+        for name in CATEGORY_COLUMNS:
+            arrays[name] = numpy.frombuffer(self.columns[name].codes, dtype=CODE_TYPE)
+
+        return arrays
+
+    def categories(self, name):
+        """
+        Returns the distinct values of a text column, codes index into this list
+        """
+
+        return list(self.columns[name].values)
+
+    def to_arrow(self):
+        """
+        Returns the columns as an Arrow table, texts as dictionary arrays and missing values as nulls
+        """
+
+        import pyarrow
+
+        arrays = []
+        for name in COLUMNS:
+            column = self.columns[name]
+            if name in CATEGORY_COLUMNS:
+                codes = pyarrow.array([None if c < 0 else c for c in column.codes], pyarrow.int32())
+                arrays.append(pyarrow.DictionaryArray.from_arrays(codes, pyarrow.array(column.values,
+                                                                                        pyarrow.string())))
+            else:
+                values = [None if v == self.missing[name] else v for v in column]
+                arrays.append(pyarrow.array(values, pyarrow.timestamp("s") if name == "time" else None))
+
+        return pyarrow.Table.from_arrays(arrays, names=list(COLUMNS))
+
+    def save(self, path):
+        """
+        Atomically writes the columns to a file, Parquet if its name ends with .parquet (requires pyarrow),
+        the packed binary format read by `load` otherwise
+
+        :param path file to be written
+        """
+
+        if path.endswith(".parquet"):
+            import pyarrow.parquet
+
+            pyarrow.parquet.write_table(self.to_arrow(), path)
+
+            return
+
+        header = {"version": VERSION, "byteorder": sys.byteorder, "rows": len(self), "columns": []}
+        buffers = []
+        for name in COLUMNS:
+            column = self.columns[name]
+            if name in CATEGORY_COLUMNS:
+                header["columns"].append({"name": name, "type": CODE_TYPE, "categories": column.values})
+                buffers.append(memoryview(column.codes).cast("B"))
+            else:
+                header["columns"].append({"name": name, "type": get_typecode(column)})
+                buffers.append(memoryview(column).cast("B"))
+
+        # offsets are relative to the first column, which starts right after the header
+        offset = 0
+        for description, buffer in zip(header["columns"], buffers):
+            description["offset"] = offset
+            description["size"] = len(buffer)
+            offset = align(offset + len(buffer))
+        encoded = json.dumps(header).encode("utf-8")
+        start = align(len(MAGIC) + 4 + len(encoded))
+
+        directory = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix=".columns")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+                for description, buffer in zip(header["columns"], buffers):
+                    f.write(b"\0" * (start + description["offset"] - f.tell()))
+                    f.write(buffer)
+            os.replace(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps a file written by `save`, columns are read only views of the file loaded on demand
+        by the operating system
+
+        :param path file to be read
+
+        :return: the columns, to be closed once no longer needed
+        """
+
+        with open(path, "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if view[:len(MAGIC)] != MAGIC:
+                raise ValueError("%s is not an activity columns file" % path)
+
+            size = struct.unpack("<I", view[len(MAGIC):len(MAGIC) + 4])[0]
+            header = json.loads(view[len(MAGIC) + 4:len(MAGIC) + 4 + size].decode("utf-8"))
+            if header.get("version") != VERSION:
+                raise ValueError("Unsupported activity columns version %s" % header.get("version"))
+
+            start = align(len(MAGIC) + 4 + size)
+            columns = cls()
+            columns.map = view
+            for description in header["columns"]:
+                offset = start + description["offset"]
+                data = memoryview(view)[offset:offset + description["size"]]
+                if header["byteorder"] != sys.byteorder:
+                    values = array(description["type"], data.tobytes())
+                    values.byteswap()
+                else:
+                    values = data.cast(description["type"])
+                if "categories" in description:
+                    columns.columns[description["name"]] = Categories(description["categories"], values)
+                else:
+                    columns.columns[description["name"]] = values
+                    columns.missing[description["name"]] = missing_value(description["type"])
+        except Exception:
+            view.close()
+            raise
+
+        return columns
+
+    def close(self):
+        """
+        Releases the file of loaded columns
+        """
+
+        if self.map is None:
+            return
+
+        for name in COLUMNS:
+            column = self.columns[name]
+            values = column.codes if name in CATEGORY_COLUMNS else column
+            if isinstance(values, memoryview):
+                values.release()
+        self.map.close()
+        self.map = None
+
+    def __exit__(self, *args):
+        """
+        Enable releasing the file when used on context manager
+        """
+
+        self.close()
+
+    def __enter__(self):
+        """
+        Enable using loaded columns on context manager
+        """
+
+        return self
+
+
+def get_typecode(values):
+    """
+    Returns the type of the items of an array or of a view of a file
+    """
+
+    return values.typecode if isinstance(values, array) else values.format
+
+
+def align(offset):
+    """
+    Rounds an offset up to the next multiple of `ALIGNMENT`
+    """
+
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+log = logging.getLogger("pysecuritas")
+
+DEFAULT_WORKERS = 16
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the executor running submitted commands, created on first use
+    """
+
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="pysecuritas-command")
+
+        return executor
+
+
+class CommandContext:
+    """
+    Deadline, cancellation and progress shared by every request performed by a command,
+    e.g. SRV, IMG and INF when taking a picture
+    """
+
+    def __init__(self, deadline=None, on_progress=None):
+        """
+        Initializes the context
+
+        :param deadline seconds the whole command may take, no limit other than each request timeout if None
+        :param on_progress optional callback receiving (action, polls, elapsed) on every WAIT answer
+        """
+
+        self.started = time.time()
+        self.deadline = None if deadline is None else self.started + deadline
+        self.on_progress = on_progress
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    def remaining(self, default=None):
+        """
+        Returns the seconds left before the deadline
+
+        :param default value returned if there is no deadline, otherwise the smallest of both is returned
+        """
+
+        if self.deadline is None:
+            return default
+
+        remaining = max(0, self.deadline - time.time())
+
+        return remaining if default is None else min(default, remaining)
+
+    def cancelled(self):
+        """
+        Check if the command was cancelled
+        """
+
+        return self.event.is_set()
+
+    def cancel(self):
+        """
+        Cancels the command, waking up any wait
+        """
+
+        with self.lock:
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """
+        Registers a callback called when the command is cancelled, immediately if it already was
+        """
+
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+
+                return
+
+        callback()
+
+    def check(self):
+        """
+        Raises an exception if the command was cancelled or its deadline passed
+        """
+
+        if self.cancelled():
+            raise CommandCancelled("Command cancelled")
+
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise CommandTimeout("Command deadline exceeded")
+
+    def wait(self, seconds):
+        """
+        Sleeps, waking up early if the command is cancelled, and then checks the command can go on
+
+        :param seconds seconds to sleep, bounded by the deadline
+        """
+
+        self.event.wait(self.remaining(seconds))
+        self.check()
+
+    def progress(self, action, polls, elapsed):
+        """
+        Notifies a WAIT answer to the progress callback, errors raised by the callback are logged and ignored
+        """
+
+        if self.on_progress:
+            try:
+                self.on_progress(action, polls, elapsed)
+            except Exception as e:
+                log.error("Progress callback failed on %s: %s", action, e)
+
+
+class CommandHandle:
+    """
+    A command running in background, whose result can be waited for or which can be cancelled
+    A command that times out raises `CommandTimeout` instead of returning nothing
+    """
+
+    def __init__(self, future, context):
+        """
+        Initializes the handle
+
+        :param future future of the command
+        :param context context of the command
+        """
+
+        self.future = future
+        self.context = context
+
+    def cancel(self):
+        """
+        Cancels the command, a running command stops at its next request or wait
+
+        :return: True unless the command already finished
+        """
+
+        if self.future.done():
+            return False
+
+        self.context.cancel()
+        self.future.cancel()
+
+        return True
+
+    def cancelled(self):
+        """
+        Check if the command was cancelled
+        """
+
+        return self.context.cancelled()
+
+    def done(self):
+        """
+        Check if the command finished
+        """
+
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the result of the command
+
+        :param timeout seconds to wait, forever if None
+
+        :return: the result from the operation
+        """
+
+        try:
+            return self.future.result(timeout)
+        except CancelledError:
+            raise CommandCancelled("Command cancelled")
+
+    def add_done_callback(self, callback):
+        """
+        Adds a callback receiving this handle once the command finishes
+        """
+
+        self.future.add_done_callback(lambda _: callback(self))
+
+
+class CommandTimeout(Exception):
+    """
+    Exception when a command did not complete on time
+    """
+
+    def __init__(self, *args):
+        super(CommandTimeout, self).__init__(*args)
+
+
+class CommandCancelled(Exception):
+    """
+    Exception when a command was cancelled
+    """
+
+    def __init__(self, *args):
+        super(CommandCancelled, self).__init__(*args)
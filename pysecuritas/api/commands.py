@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+
+    Commands provided by each api entity, kept apart so they can be listed without importing the http stack
+"""
+
+ALARM_COMMANDS = {
+    "ARM": "arm all sensors (inside)",
+    "ARMDAY": "arm in day mode (inside)",
+    "ARMNIGHT": "arm in night mode (inside)",
+    "PERI": "arm (only) the perimeter sensors",
+    "DARM": "disarm everything (not the annex)",
+    "ARMANNEX": "arm the secondary alarm",
+    "DARMANNEX": "disarm the secondary alarm",
+    "EST": "return the panel status"
+}
+
+INSTALLATION_COMMANDS = {
+    "ACT_V2": "get the activity log",
+    "SRV": "SIM Number and INSTIBS",
+    "MYINSTALLATION": "Sensor IDs and other info",
+    "INS": "Information of all installations"
+}
+
+CAMERA_COMMANDS = {
+    "IMG": "Take a picture (requires -s)"
+}
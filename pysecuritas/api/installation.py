@@ -3,12 +3,26 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 
+import copy
 import time
+from concurrent.futures import TimeoutError, CancelledError
+
+from pysecuritas.api.activity import get_watcher
+from pysecuritas.api.command import CommandContext, CommandHandle, CommandTimeout, CommandCancelled, get_executor
+from pysecuritas.api.commands import INSTALLATION_COMMANDS
+from pysecuritas.api.models import ActivityEntry, SimInfo, InstallationInfo
+from pysecuritas.core.flight import get_single_flight
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.retry import COMMAND_RETRIES
 
 DEFAULT_TIMEOUT = 60
 RATE_LIMIT = 1
 TIME_FILTER = "3"
 ACTIVITY_FILTER = "0"
+# read-only actions whose identical concurrent requests share a single round trip
+COALESCED_ACTIONS = ("EST", "ACT_V2", "SRV", "MYINSTALLATION", "INS")
+# read-only actions whose results rarely change, kept on the session cache if there is one
+CACHED_ACTIONS = ("SRV", "MYINSTALLATION", "INS")
 
 
 def get_available_commands():
@@ -16,12 +30,7 @@ def get_available_commands():
     Returns all available commands
     """
 
-    return {
-        "ACT_V2": "get the activity log",
-        "SRV": "SIM Number and INSTIBS",
-        "MYINSTALLATION": "Sensor IDs and other info",
-        "INS": "Information of all installations"
-    }
+    return dict(INSTALLATION_COMMANDS)
 
 
 def handle_result(status, result):
@@ -38,7 +47,7 @@ def handle_result(status, result):
         return
 
     if status == "ERROR":
-        raise RequestException(result["MSG"])
+        raise RequestException(result.get("MSG"), code=result.get("ERR"))
 
     if status == "OK":
         return result
@@ -49,16 +58,21 @@ class Installation:
     The entrypoint to perform any action on an alarm such as arm and disarm
     """
 
-    def __init__(self, session, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, session, timeout=DEFAULT_TIMEOUT, poll_strategy=None, typed=False):
         """
         Initializes endpoint api with a session
 
         :param session session to access securitas api
         :param timeout timeout before given up on a request attempt
+        :param poll_strategy strategy deciding when to poll for results, defaults to a fixed interval
+        :param typed if True, results are returned as models (see `pysecuritas.api.models`) instead of dictionaries
         """
 
         self.session = session
         self.timeout = timeout
+        self.poll_strategy = poll_strategy or FixedPollStrategy(RATE_LIMIT)
+        self.typed = typed
+        self.context = None
 
     def execute_command(self, command):
         """
@@ -81,6 +95,47 @@ class Installation:
         if command == "MYINSTALLATION":
             return self.get_installation_info()
 
+    def submit(self, command, deadline=None, on_progress=None, executor=None):
+        """
+        Executes a command in background
+
+        :param command command to be executed
+        :param deadline seconds the whole command may take, including every request it performs
+        :param on_progress optional callback receiving (action, polls, elapsed) on every WAIT answer
+        :param executor executor running the command, a shared one by default
+
+        :return: a command handle, its result raises `CommandTimeout` if the command did not complete on time
+        """
+
+        context = CommandContext(deadline, on_progress)
+        api = self.bind(context)
+
+        return CommandHandle((executor or get_executor()).submit(api.execute_command, command), context)
+
+    def bind(self, context):
+        """
+        Returns a copy of this api whose requests respect the deadline and cancellation of a command
+
+        :param context command context
+
+        :return: the bound api
+        """
+
+        api = copy.copy(self)
+        api.context = context
+
+        return api
+
+    def sleep(self, seconds):
+        """
+        Sleeps between requests, waking up early if the bound command is cancelled
+        """
+
+        if self.context:
+            self.context.wait(seconds)
+        else:
+            time.sleep(seconds)
+
     def get_activity_log(self, request_id=None):
         """
         Gets activity log
@@ -88,6 +143,15 @@ class Installation:
         :param request_id request id already calculated (reused)
         """
 
+        return self.to_model(ActivityEntry.from_result, self.request_activity_log(request_id))
+
+    def request_activity_log(self, request_id=None):
+        """
+        Requests the activity log, always returning the parsed response
+
+        :param request_id request id already calculated (reused)
+        """
+
         return self.sync_request("ACT_V2", request_id, timefilter=TIME_FILTER, activityfilter=ACTIVITY_FILTER)
 
     def get_sim_and_instibs(self):
@@ -95,7 +159,7 @@ class Installation:
         Gets information about SIM number and INSTIBS
         """
 
-        return self.sync_request("SRV")
+        return self.to_model(SimInfo.from_result, self.sync_request("SRV"))
 
     def get_alias(self):
         """
@@ -104,45 +168,83 @@ class Installation:
         :return: the installation alias
         """
 
-        return self.get_sim_and_instibs()["INSTALATION"]["ALIAS"]
+        return SimInfo.from_result(self.sync_request("SRV")).alias
 
     def get_installation_info(self):
         """
         Gets generic information about the installation including sensor IDs
         """
 
-        return self.sync_request("MYINSTALLATION")
+        return self.to_model(InstallationInfo.from_result, self.sync_request("MYINSTALLATION"))
 
     def get_installations(self):
         """
         Returns all installations
         """
 
-        return self.sync_request("INS")
+        return self.to_model(InstallationInfo.list_from_result, self.sync_request("INS"))
 
-    def get_inf(self):
+    def get_inf(self, after=None, device=None):
         """
         Waits for signal 16 and gets the result from INF command
+        The activity log is polled by a watcher shared with any other concurrent wait on this installation, INF is sent
+        with the id of the activity log request that returned the signal
 
-        :return: a response or nothing if timeout happens
+        :param after only signals registered after this id are accepted (see `ActivityWatcher.mark`)
+        :param device camera sensor whose signal is waited for, so concurrent captures get their own images
+
+        :return: a response or nothing if timeout happens (`CommandTimeout` is raised instead on bound commands)
         """
 
-        request_id = self.session.generate_request_id()
         self.session.validate_connection()
-        threshold = time.time() + self.timeout
-        while time.time() < threshold:
-            time.sleep(RATE_LIMIT)
-            log = self.get_activity_log(request_id)["LIST"]["REG"][0]
-            if log["@signaltype"] == "16":
-                time.sleep(RATE_LIMIT)
+        watcher = get_watcher(self)
+        future = watcher.wait_for("16", after, device=device)
+        timeout = self.timeout
+        if self.context:
+            self.context.on_cancel(future.cancel)
+            timeout = self.context.remaining(timeout)
+        try:
+            log = future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            if self.context:
+                self.context.check()
+
+                raise CommandTimeout("No image signal received on time")
+
+            return
+        except CancelledError:
+            raise CommandCancelled("Command cancelled")
+
+        self.sleep(RATE_LIMIT)
+
+        return self.sync_request("INF", watcher.request_id(log), idsignal=log["@idsignal"], signaltype="16")
+
+    def coalesce(self, action, params, function, *args, **kwargs):
+        """
+        Performs a request, sharing the one in flight if an identical read-only request was already sent
+        on the same session and installation
+
+        :param action action to be performed
+        :param params additional parameters identifying the request
+        :param function function performing the request
+
+        :return: the result of the request
+        """
+
+        if action not in COALESCED_ACTIONS or self.context:
+            return function(*args, **kwargs)
+
+        key = (self.session.installation, action, tuple(sorted(params.items())))
 
-                return self.sync_request("INF", request_id, idsignal=log["@idsignal"], signaltype="16")
+        return get_single_flight(self.session).do(key, function, *args, **kwargs)
 
     def async_request(self, action, **params):
         """
         Performs a double request
         The first request is sent asynchronously with a given id
         That same id is then used to get the result
+        Concurrent identical read-only requests (see `COALESCED_ACTIONS`) share a single double request
 
         :param action action to be performed
         :param params additional parameters for the request
@@ -150,18 +252,92 @@ class Installation:
         :return: a response or nothing if timeout happens
         """
 
+        return self.coalesce(action, params, self.send_async_request, action, **params)
+
+    def send_async_request(self, action, **params):
+        """
+        Sends a double request and polls for its result, sending it again on failures retried by the retry engine
+        of the session (e.g. a busy panel), if any
+
+        :param action action to be performed
+        :param params additional parameters for the request
+
+        :return: a response or nothing if timeout happens (`CommandTimeout` is raised instead on bound commands)
+        """
+
+        retry_engine = self.session.retry_engine
+        if not retry_engine:
+            return self.double_request(action, **params)
+
+        return retry_engine.execute(lambda: self.double_request(action, **params), self.session.installation,
+                                    COMMAND_RETRIES, sleep=self.sleep)
+
+    def double_request(self, action, **params):
+        """
+        Sends a double request once and polls for its result
+
+        :param action action to be performed
+        :param params additional parameters for the request
+
+        :return: a response or nothing if timeout happens (`CommandTimeout` is raised instead on bound commands)
+        """
+
+        payload, started = self.start_async_request(action, **params)
+        threshold = started + (self.context.remaining(self.timeout) if self.context else self.timeout)
+        delays = self.poll_strategy.delays(action)
+        polls = 0
+        while time.time() < threshold:
+            self.sleep(next(delays))
+            polls += 1
+            result = self.request(payload)
+            if result:
+                self.poll_strategy.record(action, time.time() - started)
+                self.session.notify("on_async_request", action, polls, time.time() - started, True)
+
+                return result
+
+            if self.context:
+                self.context.progress(action, polls, time.time() - started)
+
+        self.session.notify("on_async_request", action, polls, time.time() - started, False)
+        if self.context:
+            raise CommandTimeout(action + " did not complete on time")
+
+    def start_async_request(self, action, **params):
+        """
+        Sends the first request of a double request, its result is then polled with `request`
+
+        :param action action to be performed
+        :param params additional parameters for the request
+
+        :return: a tuple (payload polling for the result, time the request was sent)
+        """
+
         payload = self.session.build_payload(request=action, ID=self.session.generate_request_id(), **params)
         self.session.validate_connection()
         payload["request"] = action + "1"
+        started = time.time()
+        if self.context:
+            self.context.check()
         self.session.get(payload)
-        time.sleep(RATE_LIMIT)
         payload["request"] = action + "2"
-        threshold = time.time() + self.timeout
-        while time.time() < threshold:
-            time.sleep(RATE_LIMIT)
-            result = self.request(payload)
-            if result:
-                return result
+
+        return payload, started
+
+    def to_model(self, build, result):
+        """
+        Converts a result to a model when typed results were requested
+
+        :param build function building the model from a result
+        :param result parsed response
+
+        :return: the model or the result as is
+        """
+
+        if self.typed and result is not None:
+            return build(result)
+
+        return result
 
     def sync_request(self, action, request_id=None, *arg, **params):
         """
@@ -178,8 +354,43 @@ class Installation:
                                              ID=request_id if request_id else self.session.generate_request_id(),
                                              **params)
         self.session.validate_connection()
+        cache = self.session.cache if action in CACHED_ACTIONS else None
+        if not cache:
+            return self.coalesce(action, params, self.request, payload)
+
+        key = self.cache_key(action, params)
+        result = cache.get(key)
+        if result is None:
+            result = self.coalesce(action, params, self.request, payload)
+            if result:
+                cache.set(key, result)
+
+        return result
+
+    def cache_key(self, action=None, params=None):
+        """
+        Builds the cache key of a request on this installation
+
+        :param action action performed, if None the key matches every action of the installation
+        :param params additional parameters of the request
+
+        :return: the cache key
+        """
+
+        parts = [self.session.username, self.session.country, self.session.installation]
+        if action:
+            parts.append(action)
+            parts.extend("%s=%s" % i for i in sorted((params or {}).items()))
+
+        return self.session.cache.key(*parts)
+
+    def invalidate_cache(self):
+        """
+        Removes the cached results of this installation
+        """
 
-        return self.request(payload)
+        if self.session.cache:
+            self.session.cache.invalidate(self.cache_key())
 
     def request(self, payload):
         """
@@ -190,6 +401,8 @@ class Installation:
         :return: a result from the request
         """
 
+        if self.context:
+            self.context.check()
         result = self.session.get(payload)
         result = handle_result(result.get("RES"), result)
         if result:
@@ -198,8 +411,9 @@ class Installation:
 
 class RequestException(Exception):
     """
-    Exception when unable to perform an action
+    Exception when unable to perform an action, `code` is the error code answered by the api if any
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, **kwargs):
         super(RequestException, self).__init__(*args)
+        self.code = kwargs.get("code")
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+from datetime import datetime
+
+TIME_FORMATS = ("%y%m%d%H%M%S", "%Y%m%d%H%M%S", "%Y-%m-%d %H:%M:%S")
+
+
+def as_list(value):
+    """
+    Returns a repeated xml element as a list, whether it appeared once, many times or not at all
+    """
+
+    if value is None:
+        return []
+
+    if isinstance(value, list):
+        return value
+
+    return [value]
+
+
+def to_int(value):
+    """
+    Converts a numeric attribute to int, keeping anything else as is
+    """
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_time(value):
+    """
+    Parses a timestamp as sent by the api
+
+    :return: a datetime or None if it cannot be parsed
+    """
+
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, time_format)
+        except (TypeError, ValueError):
+            pass
+
+
+class Model(object):
+    """
+    Base of compact response models
+    """
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """
+        Returns the model as a dictionary
+        """
+
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % i for i in sorted(self.to_dict().items())))
+
+
+class AlarmStatus(Model):
+    """
+    Result of an alarm command (EST, ARM, DARM, ...)
+    """
+
+    __slots__ = ("res", "status", "msg", "numinst")
+
+    def __init__(self, res, status, msg, numinst):
+        self.res = res
+        self.status = status
+        self.msg = msg
+        self.numinst = numinst
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Builds the model from a parsed response
+        """
+
+        return cls(result.get("RES"), result.get("STATUS"), result.get("MSG"), result.get("NUMINST"))
+
+
+class ActivityEntry(Model):
+    """
+    A single entry (REG) of the activity log
+    """
+
+    __slots__ = ("idsignal", "signaltype", "time", "type", "alias", "device", "source", "img")
+
+    def __init__(self, idsignal, signaltype, time, type=None, alias=None, device=None, source=None, img=None):
+        self.idsignal = idsignal
+        self.signaltype = signaltype
+        self.time = time
+        self.type = type
+        self.alias = alias
+        self.device = device
+        self.source = source
+        self.img = img
+
+    @classmethod
+    def from_reg(cls, reg):
+        """
+        Builds the model from a parsed REG element
+        """
+
+        return cls(to_int(reg.get("@idsignal")), to_int(reg.get("@signaltype")), parse_time(reg.get("@time")),
+                   to_int(reg.get("@type")), reg.get("@alias"), reg.get("@device"), reg.get("@source"),
+                   to_int(reg.get("@img")))
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Builds the list of entries from a parsed ACT_V2 response
+        """
+
+        return [cls.from_reg(reg) for reg in as_list((result.get("LIST") or {}).get("REG"))]
+
+
+class SimInfo(Model):
+    """
+    SIM number and INSTIBS of an installation (SRV)
+    """
+
+    __slots__ = ("numinst", "alias", "sim", "instibs")
+
+    def __init__(self, numinst, alias, sim, instibs):
+        self.numinst = numinst
+        self.alias = alias
+        self.sim = sim
+        self.instibs = instibs
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Builds the model from a parsed response
+        """
+
+        installation = result.get("INSTALATION") or {}
+
+        return cls(installation.get("NUMINST"), installation.get("ALIAS"), installation.get("SIM"),
+                   installation.get("INSTIBS"))
+
+
+class InstallationInfo(Model):
+    """
+    Generic information about an installation including its devices (MYINSTALLATION, INS)
+    """
+
+    __slots__ = ("numinst", "alias", "panel", "devices")
+
+    def __init__(self, numinst, alias, panel=None, devices=()):
+        self.numinst = numinst
+        self.alias = alias
+        self.panel = panel
+        self.devices = devices
+
+    @classmethod
+    def from_installation(cls, installation):
+        """
+        Builds the model from a parsed INSTALATION element
+        """
+
+        devices = tuple(as_list((installation.get("DEVICES") or {}).get("DEVICE")))
+
+        return cls(installation.get("NUMINST"), installation.get("ALIAS"), installation.get("PANEL"), devices)
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Builds the model from a parsed MYINSTALLATION response
+        """
+
+        return cls.from_installation(result.get("INSTALATION") or {})
+
+    @classmethod
+    def list_from_result(cls, result):
+        """
+        Builds the list of installations from a parsed INS response
+        """
+
+        installations = (result.get("INSTALATIONS") or {}).get("INSTALATION")
+
+        return [cls.from_installation(i) for i in as_list(installations)]
+
+
+class Snapshot(Model):
+    """
+    An image captured by a camera
+    """
+
+    __slots__ = ("sensor", "index", "filename", "data")
+
+    def __init__(self, sensor, index, filename=None, data=None):
+        self.sensor = sensor
+        self.index = index
+        self.filename = filename
+        self.data = data
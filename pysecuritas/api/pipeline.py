@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pysecuritas.core.rate_limit import get_priority
+from pysecuritas.core.retry import COMMAND_RETRIES
+
+DEFAULT_WORKERS = 16
+
+
+class PipelinedCommand:
+    """
+    A double request submitted to a pipeline
+    """
+
+    def __init__(self, installation, action, params, order):
+        """
+        Initializes the command
+
+        :param installation installation api performing the requests
+        :param action action to be performed
+        :param params additional parameters for the request
+        :param order position of the command, (priority, arrival)
+        """
+
+        self.installation = installation
+        self.action = action
+        self.params = params
+        self.order = order
+        self.future = Future()
+        self.payload = None
+        self.started = None
+        self.deadline = None
+        self.delays = None
+        self.next_poll = 0
+        self.polls = 0
+        self.attempts = Counter()
+        self.resolved = False
+
+
+class Pipeline:
+    """
+    Runs double requests (ARM, EST ...) of many installations at once: the first request of every submitted command
+    is sent right away and a single thread then polls all pending results in rounds, the requests of a round being
+    sent at the same time by a pool of workers and first requests by priority
+    Since the panels work in parallel, N commands take about as long as the slowest one
+    Failed commands are sent again as `Installation.send_async_request` does, by the retry engine of their session
+    The polling thread and its workers run only while there are pending commands
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        """
+        Initializes the pipeline
+
+        :param max_workers maximum number of requests sent at the same time
+        """
+
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.counter = itertools.count()
+        self.queued = []
+        self.pending = []
+        self.thread = None
+
+    def submit(self, installation, action, **params):
+        """
+        Submits a double request, its timeout and poll strategy are the ones of the installation api
+
+        :param installation installation api (`Installation`, `Alarm` ...) of the targeted installation
+        :param action action to be performed, e.g. ARM or EST
+        :param params additional parameters for the request
+
+        :return: a future resolved with the parsed response or None if timeout happens, cancel it to stop polling
+        """
+
+        command = PipelinedCommand(installation, action, params, (get_priority(action), next(self.counter)))
+        with self.lock:
+            self.queued.append(command)
+            self.wakeup.set()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="pysecuritas-pipeline")
+                self.thread.daemon = True
+                self.thread.start()
+
+        return command.future
+
+    def run(self):
+        """
+        Sends queued commands and polls pending ones until there is nothing left
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pysecuritas-pipeline") as pool:
+            while True:
+                with self.lock:
+                    self.wakeup.clear()
+                    for command in self.pending:
+                        if command.future.cancelled():
+                            self.resolve(command)
+                    self.pending = [c for c in self.pending if not c.resolved] + self.queued
+                    self.queued = []
+                    if not self.pending:
+                        self.thread = None
+
+                        return
+
+                    now = time.time()
+                    due = sorted((c for c in self.pending if c.next_poll <= now), key=lambda c: c.order)
+
+                # first requests of higher priority commands (disarming) are sent before the others
+                starts = [c for c in due if c.payload is None]
+                for _, commands in itertools.groupby(starts, key=lambda c: c.order[0]):
+                    list(pool.map(self.start, commands))
+                list(pool.map(self.poll, [c for c in due if c.payload is not None]))
+
+                with self.lock:
+                    waiting = [c.next_poll for c in self.pending if not c.resolved]
+                if waiting:
+                    self.wakeup.wait(max(0, min(waiting) - time.time()))
+
+    def start(self, command):
+        """
+        Sends the first request of a command and schedules its first poll
+        """
+
+        if command.future.cancelled():
+            self.resolve(command)
+
+            return
+
+        installation = command.installation
+        retry_engine = installation.session.retry_engine
+        try:
+            if retry_engine and not command.attempts:
+                retry_engine.admit(installation.session.installation)
+        except Exception as e:
+            self.resolve(command, error=e)
+
+            return
+
+        try:
+            command.payload, command.started = installation.start_async_request(command.action, **command.params)
+        except Exception as e:
+            self.complete(command, error=e)
+
+            return
+
+        command.deadline = command.started + installation.timeout
+        command.delays = installation.poll_strategy.delays(command.action)
+        command.polls = 0
+        command.next_poll = command.started + next(command.delays)
+
+    def poll(self, command):
+        """
+        Polls the result of a command once, resolving it on result, error or timeout
+        """
+
+        if command.future.cancelled():
+            return
+
+        installation = command.installation
+        command.polls += 1
+        try:
+            result = installation.request(command.payload)
+        except Exception as e:
+            self.complete(command, error=e)
+
+            return
+
+        now = time.time()
+        if result:
+            installation.poll_strategy.record(command.action, now - command.started)
+            installation.session.notify("on_async_request", command.action, command.polls, now - command.started,
+                                        True)
+            self.complete(command, result)
+        elif now >= command.deadline:
+            installation.session.notify("on_async_request", command.action, command.polls, now - command.started,
+                                        False)
+            self.complete(command)
+        else:
+            command.next_poll = now + next(command.delays)
+
+    def complete(self, command, result=None, error=None):
+        """
+        Resolves a command with the outcome of an attempt, unless the retry engine of its session retries it: it is
+        then sent again once the retry delay is over
+        """
+
+        installation = command.installation
+        retry_engine = installation.session.retry_engine
+        if retry_engine:
+            retry_in = retry_engine.next_retry(installation.session.installation, COMMAND_RETRIES, command.attempts,
+                                               result, error)
+            if retry_in is not None:
+                command.payload = None
+                command.next_poll = time.time() + retry_in[1]
+
+                return
+
+        self.resolve(command, result, error)
+
+    @staticmethod
+    def resolve(command, result=None, error=None):
+        """
+        Completes the future of a command, or notifies its waiters if it was cancelled
+        """
+
+        if command.resolved:
+            return
+
+        command.resolved = True
+        if not command.future.set_running_or_notify_cancel():
+            return
+
+        if error is None:
+            command.future.set_result(result)
+        else:
+            command.future.set_exception(error)
+
+    def close(self):
+        """
+        Cancels every command not finished yet
+        """
+
+        with self.lock:
+            commands = self.queued + self.pending
+
+        for command in commands:
+            command.future.cancel()
+        self.wakeup.set()
+
+    def __exit__(self, *args):
+        """
+        Enable cancelling unfinished commands when used on context manager
+        """
+
+        self.close()
+
+    def __enter__(self):
+        """
+        Enable using the pipeline on context manager
+        """
+
+        return self
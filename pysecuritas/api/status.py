@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pysecuritas.api.activity import ActivitySync
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.installation import DEFAULT_TIMEOUT
+
+log = logging.getLogger("pysecuritas")
+
+# in seconds
+DEFAULT_INTERVAL = 30
+DEFAULT_WORKERS = 8
+# signal types registered when the alarm is armed or disarmed
+STATUS_SIGNALS = ("1", "2", "31", "32", "46", "202", "203")
+
+StatusChange = namedtuple("StatusChange", ["numinst", "previous", "status", "result", "signal"])
+
+
+class WatchedStatus:
+    """
+    Status and activity log cursor of a watched installation
+    """
+
+    def __init__(self, alarm):
+        """
+        Initializes the watched status
+
+        :param alarm alarm api of the installation
+        """
+
+        self.alarm = alarm
+        self.sync = ActivitySync(alarm)
+        self.status = None
+        self.lock = threading.Lock()
+
+
+class StatusWatcher:
+    """
+    Follows the alarm status of many installations, polling their activity log and requesting the status (EST)
+    only when an arming or disarming signal was registered
+    Changes are delivered to callbacks, generators (`changes`) and async iterators (`async for change in watcher`)
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT, poll_strategy=None,
+                 signals=STATUS_SIGNALS, max_workers=DEFAULT_WORKERS):
+        """
+        Initializes the watcher
+
+        :param interval seconds between polls of each activity log
+        :param timeout timeout before given up on a status request
+        :param poll_strategy strategy deciding when to poll for status results
+        :param signals signal types suggesting a change of status
+        :param max_workers maximum number of installations polled at the same time
+        """
+
+        self.interval = interval
+        self.timeout = timeout
+        self.poll_strategy = poll_strategy
+        self.signals = set(str(s) for s in signals)
+        self.max_workers = max_workers
+        self.watched = {}
+        self.callbacks = []
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def watch(self, session):
+        """
+        Starts watching an installation
+
+        :param session session (or session view) targeting the installation
+
+        :return: self
+        """
+
+        with self.lock:
+            self.watched[session.installation] = WatchedStatus(Alarm(session, self.timeout, self.poll_strategy))
+
+        return self
+
+    def unwatch(self, numinst):
+        """
+        Stops watching an installation
+        """
+
+        with self.lock:
+            self.watched.pop(numinst, None)
+
+    def subscribe(self, callback):
+        """
+        Adds a callback receiving every `StatusChange`, called from the polling thread
+
+        :return: self
+        """
+
+        with self.lock:
+            self.callbacks.append(callback)
+
+        return self
+
+    def publish(self, change):
+        """
+        Delivers a change to every subscriber and callback, errors raised by them are logged and ignored
+        Callbacks are not notified when the watcher stops (change is None)
+        """
+
+        with self.lock:
+            receivers = list(self.subscribers) + (list(self.callbacks) if change is not None else [])
+
+        for receiver in receivers:
+            try:
+                receiver(change)
+            except Exception as e:
+                log.error("Status subscriber failed: %s", e)
+
+    def check(self, watched):
+        """
+        Polls the activity log of an installation and requests its status if needed
+
+        :param watched watched status of the installation
+
+        :return: the change or None if the status did not change
+        """
+
+        with watched.lock:
+            entries = watched.sync.sync()
+            if watched.status is None:
+                signal = None
+            else:
+                signal = next((e for e in reversed(entries) if str(e.get("@signaltype")) in self.signals), None)
+                if signal is None:
+                    return None
+
+            result = watched.alarm.get_status()
+            if not result or result.get("STATUS") == watched.status:
+                return None
+
+            change = StatusChange(watched.alarm.session.installation, watched.status, result.get("STATUS"), result,
+                                  signal)
+            watched.status = change.status
+
+        return change
+
+    def poll(self):
+        """
+        Checks every watched installation once and publishes the changes
+
+        :return: the list of changes
+        """
+
+        with self.lock:
+            watched = list(self.watched.values())
+
+        def check(w):
+            try:
+                return self.check(w)
+            except Exception as e:
+                log.error("Unable to check status of %s: %s", w.alarm.session.installation, e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            changes = [c for c in pool.map(check, watched) if c]
+
+        for change in changes:
+            self.publish(change)
+
+        return changes
+
+    def run(self):
+        """
+        Polls until stopped
+        """
+
+        while not self.stopped.is_set():
+            self.poll()
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        """
+        Starts polling on a background thread
+
+        :return: self
+        """
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="pysecuritas-status-watcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stops polling and ends every generator and async iterator
+        """
+
+        self.stopped.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.publish(None)
+
+    def add_subscriber(self, subscriber):
+        """
+        Adds a function receiving every change and None once the watcher stops
+        """
+
+        with self.lock:
+            self.subscribers.append(subscriber)
+
+    def remove_subscriber(self, subscriber):
+        """
+        Removes a subscriber
+        """
+
+        with self.lock:
+            self.subscribers.remove(subscriber)
+
+    def changes(self, timeout=None):
+        """
+        Returns a generator yielding changes published from now on, until the watcher stops
+        It stops receiving changes once closed or garbage collected, even if it was never iterated
+
+        :param timeout seconds to wait for each change, waits forever if None
+
+        :return: a generator of `StatusChange`
+        """
+
+        def generate():
+            changes = queue.Queue()
+            self.add_subscriber(changes.put)
+            try:
+                # suspended here until the first change is requested, so changes are received from now on
+                yield
+                while True:
+                    try:
+                        change = changes.get(timeout=timeout)
+                    except queue.Empty:
+                        return
+
+                    if change is None:
+                        return
+
+                    yield change
+            finally:
+                self.remove_subscriber(changes.put)
+
+        generator = generate()
+        next(generator)
+
+        return generator
+
+    async def __aiter__(self):
+        """
+        Iterates over changes as they are published until the watcher stops, without blocking the event loop
+        """
+
+        loop = asyncio.get_running_loop()
+        changes = asyncio.Queue()
+
+        def subscriber(change):
+            loop.call_soon_threadsafe(changes.put_nowait, change)
+
+        self.add_subscriber(subscriber)
+        try:
+            while True:
+                change = await changes.get()
+                if change is None:
+                    return
+
+                yield change
+        finally:
+            self.remove_subscriber(subscriber)
+
+    def __exit__(self, *args):
+        """
+        Enable stopping the watcher when used on context manager
+        """
+
+        self.stop()
+
+    def __enter__(self):
+        """
+        Enable starting the watcher when used on context manager
+        """
+
+        return self.start()
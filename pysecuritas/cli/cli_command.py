@@ -5,18 +5,20 @@
 
 import argparse
 import json
+import sys
 import textwrap
+import threading
 
 from pysecuritas.__version__ import __description__
-from pysecuritas.api.alarm import get_available_commands as alarm_commands, Alarm
-from pysecuritas.api.camera import get_available_commands as camera_commands, Camera
-from pysecuritas.api.installation import get_available_commands as installation_commands, Installation
-from pysecuritas.core.session import Session
+from pysecuritas.api.commands import ALARM_COMMANDS, INSTALLATION_COMMANDS, CAMERA_COMMANDS
+from pysecuritas.cli.daemon import DaemonClient, DEFAULT_SOCKET, to_json
+from pysecuritas.core.token_store import FileTokenStore, DEFAULT_PATH
 
 
 class CLICommand:
     """
     Class responsible for creating a cli parser and execute a single command
+    The http stack is only imported when a command runs locally, so parsing and forwarding to a daemon stay fast
     """
 
     def __init__(self):
@@ -62,14 +64,54 @@ class CLICommand:
                             '--sensor',
                             help='The sensor ID (to take a picture using IMG)',
                             required=False)
-        commands = alarm_commands().copy()
-        commands.update(installation_commands())
-        commands.update(camera_commands())
+        parser.add_argument('-t',
+                            '--token-store',
+                            help='Reuse login between runs, storing it in the given file (default: %s)' % DEFAULT_PATH,
+                            nargs='?',
+                            const=DEFAULT_PATH,
+                            required=False)
+        parser.add_argument('-k',
+                            '--keep-login',
+                            help='Do not logout on exit so the login can be reused by the next run.',
+                            action='store_true')
+        parser.add_argument('-d',
+                            '--daemon',
+                            help='Forward the command to a running pysecuritas-daemon listening on the given socket '
+                                 '(default: %s)' % DEFAULT_SOCKET,
+                            nargs='?',
+                            const=DEFAULT_SOCKET,
+                            required=False)
+        commands = ALARM_COMMANDS.copy()
+        commands.update(INSTALLATION_COMMANDS)
+        commands.update(CAMERA_COMMANDS)
+        parser.add_argument('-b',
+                            '--batch',
+                            help='Run the commands of a file ("-" for stdin) on the same session, one per line as\n'
+                                 '"COMMAND [INSTALLATION [SENSOR]]" or as json, printing a json line per result.',
+                            required=False)
+        parser.add_argument('-P',
+                            '--parallel',
+                            help='Number of installations whose batch commands run at the same time, commands of the\n'
+                                 'same installation always run in order (default: 1, every command in order).',
+                            type=int,
+                            default=1)
+        parser.add_argument('-e',
+                            '--export',
+                            help='Write activity logs (ACT_V2) to a columnar file instead of printing them, every\n'
+                                 'installation of a batch goes to the same file (.parquet requires pyarrow).',
+                            required=False)
         parser.add_argument("command",
                             help=textwrap.dedent('\n'.join([': '.join(i) for i in commands.items()])),
+                            nargs='?',
+                            type=str)
+        parser.add_argument("commands",
+                            help='More commands to run on the same session (batch mode).',
+                            nargs='*',
                             type=str)
 
         self.args = parser.parse_args(args)
+        if not self.args.command and not self.args.batch:
+            parser.error("a command is required")
 
     def run(self):
         """
@@ -78,20 +120,176 @@ class CLICommand:
         :return: the result from the operation
         """
 
+        if self.is_batch():
+            self.run_batch()
+
+            return
+
         command = self.args.command
+        if self.args.daemon:
+            self.result = DaemonClient(self.args.daemon).execute(self.args.username, self.args.password,
+                                                                 self.args.country, self.args.language, command,
+                                                                 self.args.installation, self.args.sensor)
+            self.export()
 
+            return
+
+        from pysecuritas.api.alarm import Alarm
+        from pysecuritas.api.camera import Camera
+        from pysecuritas.api.installation import Installation
+        from pysecuritas.core.session import Session
+
+        token_store = FileTokenStore(self.args.token_store) if self.args.token_store else None
         with Session(self.args.username, self.args.password, self.args.installation, self.args.country,
-                     self.args.language, self.args.sensor) as session:
-            if command in alarm_commands():
+                     self.args.language, self.args.sensor, token_store, self.args.keep_login) as session:
+            if command in ALARM_COMMANDS:
                 self.result = Alarm(session).execute_command(command)
-            elif command in installation_commands():
+            elif command in INSTALLATION_COMMANDS:
                 self.result = Installation(session).execute_command(command)
-            elif command in camera_commands():
+            elif command in CAMERA_COMMANDS:
                 self.result = Camera(session).execute_command(command)
 
+        self.export()
+
+    def export(self):
+        """
+        Writes the activity log of a single command to the export file, the result becomes a summary of the export
+        """
+
+        if not self.args.export or self.args.command != "ACT_V2":
+            return
+
+        from pysecuritas.api.columnar import ActivityColumns
+
+        columns = ActivityColumns()
+        rows = columns.extend(self.args.installation, self.result)
+        columns.save(self.args.export)
+        self.result = {"RES": "OK", "FILE": self.args.export, "ROWS": rows}
+
+    def is_batch(self):
+        """
+        Check if several commands were provided, from cli arguments or a file
+        """
+
+        return bool(self.args.batch or self.args.commands)
+
+    def read_jobs(self):
+        """
+        Reads the commands of a batch from cli arguments and the batch file
+
+        :return: a list of jobs, dictionaries with command, installation and sensor
+        """
+
+        jobs = [self.job(command) for command in [self.args.command] + self.args.commands if command]
+        if self.args.batch == "-":
+            jobs.extend(self.read_lines(sys.stdin))
+        elif self.args.batch:
+            with open(self.args.batch, "r") as f:
+                jobs.extend(self.read_lines(f))
+
+        return jobs
+
+    def read_lines(self, lines):
+        """
+        Parses batch lines, as "COMMAND [INSTALLATION [SENSOR]]" or as json objects, ignoring blank lines and comments
+
+        :return: a list of jobs
+        """
+
+        jobs = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("{"):
+                values = json.loads(line)
+                jobs.append(self.job(values.get("command"), values.get("installation"), values.get("sensor")))
+            else:
+                jobs.append(self.job(*line.split()[:3]))
+
+        return jobs
+
+    def job(self, command, installation=None, sensor=None):
+        """
+        Builds a job, installation and sensor default to the ones provided on cli arguments
+        """
+
+        return {"command": command, "installation": installation or self.args.installation,
+                "sensor": sensor or self.args.sensor}
+
+    def run_batch(self, output=None):
+        """
+        Runs every command of a batch on a single session, or forwarding them to a daemon,
+        and writes a json line with each result as soon as it finishes
+
+        :param output stream where results are written, stdout by default
+        """
+
+        output = output or sys.stdout
+        jobs = self.read_jobs()
+        lock = threading.Lock()
+        self.result = []
+        columns = None
+        if self.args.export:
+            from pysecuritas.api.columnar import ActivityColumns
+
+            columns = ActivityColumns()
+
+        def write(job, result=None, error=None):
+            record = dict(job)
+            if error is None:
+                record["result"] = result
+            else:
+                record["error"] = "%s: %s" % (type(error).__name__, error)
+            with lock:
+                if columns is not None and error is None and job["command"] == "ACT_V2":
+                    record["result"] = {"RES": "OK", "FILE": self.args.export,
+                                        "ROWS": columns.extend(job["installation"], result)}
+                self.result.append(record)
+                output.write(json.dumps(record, default=to_json) + "\n")
+                output.flush()
+
+        def run(execute):
+            from concurrent.futures import ThreadPoolExecutor
+
+            def run_jobs(installation_jobs):
+                for job in installation_jobs:
+                    try:
+                        write(job, execute(job))
+                    except Exception as e:
+                        write(job, error=e)
+
+            # commands of the same installation run in order, only different installations run at the same time
+            by_installation = {}
+            for job in jobs:
+                by_installation.setdefault(job["installation"], []).append(job)
+            with ThreadPoolExecutor(max_workers=max(1, self.args.parallel)) as pool:
+                list(pool.map(run_jobs, by_installation.values()))
+
+        if self.args.daemon:
+            client = DaemonClient(self.args.daemon)
+            run(lambda job: client.execute(self.args.username, self.args.password, self.args.country,
+                                           self.args.language, job["command"], job["installation"], job["sensor"]))
+        else:
+            from pysecuritas.api.batch import execute_command
+            from pysecuritas.core.session import Session
+
+            token_store = FileTokenStore(self.args.token_store) if self.args.token_store else None
+            with Session(self.args.username, self.args.password, self.args.installation, self.args.country,
+                         self.args.language, self.args.sensor, token_store, self.args.keep_login) as session:
+                run(lambda job: execute_command(session.for_installation(job["installation"], job["sensor"]),
+                                                job["command"]))
+
+        if columns is not None:
+            columns.save(self.args.export)
+
     def pretty_print(self):
         """
-        Prints the result from the executed operation
+        Prints the result from the executed operation, batch results were already printed while running
         """
 
-        print(json.dumps(self.result, indent=2))
+        if self.is_batch():
+            return
+
+        print(json.dumps(self.result, indent=2, default=to_json))
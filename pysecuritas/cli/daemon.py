@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import socket
+import socketserver
+
+log = logging.getLogger("pysecuritas")
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser("~"), ".pysecuritas", "daemon.sock")
+# in seconds
+CLIENT_TIMEOUT = 120
+
+
+def to_json(value):
+    """
+    Converts values json cannot encode, to be used as `default` of `json.dumps`: images streamed as base64 bytes
+    (see `pysecuritas.core.parser`) become text and images kept in memory (memoryviews) are base64 encoded
+
+    :param value value to be converted
+
+    :return: the text of the value
+    """
+
+    if isinstance(value, bytes):
+        return value.decode("ascii")
+
+    if isinstance(value, memoryview):
+        return base64.b64encode(value).decode("ascii")
+
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+class Daemon:
+    """
+    Long running process keeping logged in sessions warm and executing commands received on a unix socket
+    Each connection sends one json request per line and receives one json response per line
+    The http stack is only imported by the daemon, the client just needs a socket
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, executor=None):
+        """
+        Initializes the daemon
+
+        :param socket_path path of the unix socket
+        :param executor executor holding the sessions, a new one is created if not provided
+        """
+
+        from pysecuritas.api.batch import BatchExecutor
+
+        self.socket_path = socket_path
+        self.executor = executor or BatchExecutor()
+        self.server = None
+
+    def handle(self, request):
+        """
+        Executes a request
+
+        :param request dictionary with username, password, country, language, installation, sensor, command and
+                       the absolute directory where images are written
+
+        :return: a dictionary with either the result or the error
+        """
+
+        from pysecuritas.api.batch import BatchJob, Credentials
+
+        try:
+            credentials = Credentials(request["username"], request["password"], request["country"],
+                                      request["language"])
+            directory = request.get("directory")
+            if directory is not None and not os.path.isabs(directory):
+                raise ValueError("Image directory must be absolute: %s" % directory)
+            job = BatchJob(credentials, request.get("installation"), request["command"], request.get("sensor"),
+                           directory)
+
+            return {"result": self.executor.execute(job)}
+        except Exception as e:
+            log.error("Unable to execute request: %s", e)
+
+            return {"error": "%s: %s" % (type(e).__name__, e)}
+
+    def handler(self):
+        """
+        Builds the connection handler bound to this daemon
+        """
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+
+                    try:
+                        response = daemon.handle(json.loads(line.decode("utf-8")))
+                    except ValueError as e:
+                        response = {"error": "Invalid request: %s" % e}
+
+                    self.wfile.write((json.dumps(response, default=to_json) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        return Handler
+
+    def bind(self):
+        """
+        Creates the unix socket, only accessible by the current user
+
+        :return: self
+        """
+
+        directory = os.path.dirname(self.socket_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, self.handler())
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+
+        return self
+
+    def serve_forever(self):
+        """
+        Serves requests until shutdown, then logs out every session
+        """
+
+        if self.server is None:
+            self.bind()
+
+        log.info("Listening on %s", self.socket_path)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """
+        Stops serving, must be called from another thread
+        """
+
+        if self.server is not None:
+            self.server.shutdown()
+
+    def close(self):
+        """
+        Closes the socket and logs out every session
+        """
+
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+        self.executor.close()
+
+
+class DaemonClient:
+    """
+    Thin client forwarding commands to a running daemon
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=CLIENT_TIMEOUT):
+        """
+        Initializes the client
+
+        :param socket_path path of the daemon unix socket
+        :param timeout seconds to wait for a response
+        """
+
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def execute(self, username, password, country, language, command, installation=None, sensor=None,
+                directory="."):
+        """
+        Executes a command on the daemon
+
+        :param directory directory where images are written, resolved on the client side since the daemon runs
+                         from another working directory
+
+        :return: the result from the operation
+        """
+
+        request = {"username": username, "password": password, "country": country, "language": language,
+                   "command": command, "installation": installation, "sensor": sensor,
+                   "directory": os.path.abspath(directory)}
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(self.timeout)
+        try:
+            client.connect(self.socket_path)
+            client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            with client.makefile("rb") as f:
+                response = json.loads(f.readline().decode("utf-8"))
+        finally:
+            client.close()
+
+        if "error" in response:
+            raise DaemonException(response["error"])
+
+        return response["result"]
+
+
+class DaemonException(Exception):
+    """
+    Exception when the daemon was unable to execute a command
+    """
+
+    def __init__(self, *args):
+        super(DaemonException, self).__init__(*args)
+
+
+def main(args=None):
+    """
+    Runs the daemon until interrupted
+    """
+
+    parser = argparse.ArgumentParser(description="Keeps securitas sessions warm and executes commands sent by "
+                                                 "pysecuritas --daemon")
+    parser.add_argument("-S", "--socket", help="Unix socket to listen on (default: %s)" % DEFAULT_SOCKET,
+                        default=DEFAULT_SOCKET)
+    parser.add_argument("-w", "--workers", help="Maximum number of commands running at the same time per account",
+                        type=int, default=4)
+    args = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+
+    from pysecuritas.api.batch import BatchExecutor
+    from pysecuritas.core.cache import ResultCache
+
+    try:
+        Daemon(args.socket, BatchExecutor(account_workers=args.workers, cache=ResultCache())).serve_forever()
+    except KeyboardInterrupt:
+        pass
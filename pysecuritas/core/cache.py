@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger("pysecuritas")
+
+# in seconds
+DEFAULT_TTL = 3600
+DEFAULT_MAX_SIZE = 256
+
+
+class ResultCache:
+    """
+    Thread safe cache of results with a time to live, evicting the least recently used entries when full
+    Can be shared by many sessions and optionally persisted to a json file
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, path=None):
+        """
+        Initializes the cache
+
+        :param ttl seconds a result is valid for
+        :param max_size maximum number of results kept
+        :param path optional json file where results are persisted, loaded if it exists
+        """
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    @staticmethod
+    def key(*parts):
+        """
+        Builds the key of a result from its parts (account, installation, action ...)
+        """
+
+        return "|".join("" if p is None else str(p) for p in parts)
+
+    def get(self, key):
+        """
+        Returns a copy of a cached result
+
+        :param key key of the result
+
+        :return: the result or None if there is none or it expired
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["expires"] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return copy.deepcopy(entry["result"])
+
+    def set(self, key, result):
+        """
+        Caches a result
+
+        :param key key of the result
+        :param result result to be cached
+        """
+
+        with self.lock:
+            self.entries[key] = {"result": copy.deepcopy(result), "expires": time.time() + self.ttl}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.save()
+
+    def invalidate(self, *parts):
+        """
+        Removes every result whose key starts with the given parts, or all of them if none is given
+        """
+
+        prefix = self.key(*parts)
+        with self.lock:
+            for key in [k for k in self.entries if not parts or k == prefix or k.startswith(prefix + "|")]:
+                del self.entries[key]
+            self.save()
+
+    def clear(self):
+        """
+        Removes every result
+        """
+
+        self.invalidate()
+
+    def load(self):
+        """
+        Loads persisted results that did not expire, an unreadable file is ignored
+        """
+
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        now = time.time()
+        with self.lock:
+            for key, entry in sorted(entries.items(), key=lambda i: i[1].get("expires", 0)):
+                if entry.get("expires", 0) > now:
+                    self.entries[key] = entry
+
+    def save(self):
+        """
+        Atomically persists the results, must be called holding the lock
+        """
+
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix=".cache")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entries, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            os.remove(tmp)
+            log.error("Unable to persist cache: %s", e)
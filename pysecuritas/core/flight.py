@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import copy
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller performs the call
+    and every caller arriving while it is in flight gets its result (or exception)
+    """
+
+    def __init__(self):
+        """
+        Initializes the in-flight calls
+        """
+
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Performs a call unless an identical one is already in flight
+
+        :param key hashable key identifying identical calls
+        :param function function to be called
+
+        :return: the result of the call, followers receive their own copy
+        """
+
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key)
+            future.set_exception(e)
+            raise
+
+        self.finish(key)
+        future.set_result(result)
+
+        return result
+
+    def finish(self, key):
+        """
+        Removes an in-flight call, calls arriving later are performed again
+        """
+
+        with self.lock:
+            del self.calls[key]
+
+    def in_flight(self):
+        """
+        Returns the number of calls in flight
+        """
+
+        with self.lock:
+            return len(self.calls)
+
+
+def get_single_flight(session):
+    """
+    Returns the single flight shared by every api object using the same session, or views of it
+    It is kept by the session itself, so it is released along with it
+
+    :param session session or session view
+
+    :return: a single flight
+    """
+
+    return getattr(session, "parent", session).single_flight
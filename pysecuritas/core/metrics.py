@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import contextvars
+import threading
+from collections import defaultdict
+
+# in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+POLL_BUCKETS = (1, 2, 3, 5, 10, 20, 30, 60)
+
+
+class SessionHook(object):
+    """
+    Receives notifications about the requests performed by a session
+    Every method is optional, override only the ones needed
+    """
+
+    def before_request(self, payload):
+        """
+        Called before a request is sent
+
+        :param payload request parameters
+        """
+
+        pass
+
+    def after_request(self, payload, result, elapsed, size, parse_time, error=None):
+        """
+        Called after a request completes, successfully or not
+
+        :param payload request parameters
+        :param result parsed response or None if the request failed
+        :param elapsed seconds taken by the whole request
+        :param size bytes received
+        :param parse_time seconds taken to parse the response
+        :param error exception raised by the request, if any
+        """
+
+        pass
+
+    def on_relogin(self):
+        """
+        Called when the session logs in again after its login expired
+        """
+
+        pass
+
+    def on_async_request(self, action, polls, elapsed, completed):
+        """
+        Called when a two-phase request finishes
+
+        :param action action performed (ARM, EST, ...)
+        :param polls number of result requests sent
+        :param elapsed seconds between submission and completion
+        :param completed False if the request timed out
+        """
+
+        pass
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed buckets
+    """
+
+    def __init__(self, buckets):
+        """
+        Initializes the histogram
+
+        :param buckets upper bounds of each bucket
+        """
+
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        """
+        Records a value
+        """
+
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket where it falls
+
+        :param q quantile between 0 and 1
+
+        :return: the bucket bound, infinity if above every bucket or None if empty
+        """
+
+        if not self.count:
+            return None
+
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= q * self.count:
+                return bound
+
+        return float("inf")
+
+
+def labels(**values):
+    """
+    Formats prometheus labels
+    """
+
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in sorted(values.items())) + "}"
+
+
+class MetricsCollector(SessionHook):
+    """
+    Collects latency, size, parse time, poll and re-login metrics of every session it is added to
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, poll_buckets=POLL_BUCKETS):
+        """
+        Initializes the collector
+
+        :param latency_buckets buckets of latency and parse time histograms
+        :param poll_buckets buckets of poll count histograms
+        """
+
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(latency_buckets))
+        self.parse_time = Histogram(latency_buckets)
+        self.polls = defaultdict(lambda: Histogram(poll_buckets))
+        self.bytes = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.waits = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.relogins = 0
+
+    def after_request(self, payload, result, elapsed, size, parse_time, error=None):
+        """
+        Records a request
+        """
+
+        request = payload.get("request")
+        with self.lock:
+            self.latency[request].observe(elapsed)
+            self.bytes[request] += size
+            if error is not None:
+                self.errors[request] += 1
+            else:
+                self.parse_time.observe(parse_time)
+                if result and result.get("RES") == "WAIT":
+                    self.waits[request] += 1
+
+    def on_relogin(self):
+        """
+        Records a re-login
+        """
+
+        with self.lock:
+            self.relogins += 1
+
+    def on_async_request(self, action, polls, elapsed, completed):
+        """
+        Records the number of polls of a two-phase request
+        """
+
+        with self.lock:
+            self.polls[action].observe(polls)
+            if not completed:
+                self.timeouts[action] += 1
+
+    def snapshot(self):
+        """
+        Returns a summary of the collected metrics
+
+        :return: a dictionary
+        """
+
+        with self.lock:
+            return {
+                "requests": dict((r, {"count": h.count, "sum": h.sum, "p50": h.quantile(0.5), "p99": h.quantile(0.99),
+                                      "bytes": self.bytes[r], "errors": self.errors[r], "waits": self.waits[r]})
+                                 for r, h in self.latency.items()),
+                "polls": dict((a, {"count": h.count, "sum": h.sum, "timeouts": self.timeouts[a]})
+                              for a, h in self.polls.items()),
+                "parse_time": {"count": self.parse_time.count, "sum": self.parse_time.sum},
+                "relogins": self.relogins,
+            }
+
+    def to_prometheus(self, prefix="pysecuritas"):
+        """
+        Exports the collected metrics in prometheus text format
+
+        :param prefix prefix of every metric name
+
+        :return: the exposition text
+        """
+
+        lines = []
+
+        def histogram(name, help_text, histograms):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s histogram" % (prefix, name))
+            for label_values, h in histograms:
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append("%s_%s_bucket%s %d" % (prefix, name, labels(le=bound, **label_values), count))
+                lines.append("%s_%s_bucket%s %d" % (prefix, name, labels(le="+Inf", **label_values), h.count))
+                lines.append("%s_%s_sum%s %s" % (prefix, name, labels(**label_values), repr(float(h.sum))))
+                lines.append("%s_%s_count%s %d" % (prefix, name, labels(**label_values), h.count))
+
+        def counter(name, help_text, values):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+            for label_values, value in values:
+                lines.append("%s_%s%s %d" % (prefix, name, labels(**label_values) if label_values else "", value))
+
+        with self.lock:
+            histogram("request_duration_seconds", "Duration of requests by type.",
+                      [({"request": r}, h) for r, h in sorted(self.latency.items())])
+            histogram("parse_duration_seconds", "Time spent parsing responses.", [({}, self.parse_time)])
+            histogram("async_request_polls", "Result requests sent per two-phase request.",
+                      [({"action": a}, h) for a, h in sorted(self.polls.items())])
+            counter("response_bytes_total", "Bytes received by request type.",
+                    [({"request": r}, v) for r, v in sorted(self.bytes.items())])
+            counter("request_errors_total", "Failed requests by request type.",
+                    [({"request": r}, v) for r, v in sorted(self.errors.items())])
+            counter("wait_responses_total", "WAIT answers by request type.",
+                    [({"request": r}, v) for r, v in sorted(self.waits.items())])
+            counter("async_request_timeouts_total", "Two-phase requests that timed out.",
+                    [({"action": a}, v) for a, v in sorted(self.timeouts.items())])
+            counter("relogins_total", "Logins performed after an expired login.", [({}, self.relogins)])
+
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryHook(SessionHook):
+    """
+    Traces every request as an OpenTelemetry span and counts re-logins (requires opentelemetry-api)
+    Spans are kept by context, so requests of different threads or asyncio tasks never end each other's spans
+    """
+
+    def __init__(self, tracer=None, meter=None):
+        """
+        Initializes the hook
+
+        :param tracer tracer to use, defaults to the global `pysecuritas` tracer
+        :param meter meter creating the re-login counter, defaults to the global `pysecuritas` meter
+        """
+
+        from opentelemetry import metrics, trace
+
+        self.trace = trace
+        self.tracer = tracer or trace.get_tracer("pysecuritas")
+        self.relogins = (meter or metrics.get_meter("pysecuritas")).create_counter(
+            "securitas.relogins", description="Re-logins after an expired login")
+        self.spans = contextvars.ContextVar("pysecuritas_spans_%s" % id(self), default=())
+
+    def before_request(self, payload):
+        """
+        Starts a span for the request
+        """
+
+        span = self.tracer.start_span("securitas " + str(payload.get("request")),
+                                      attributes={"securitas.request": str(payload.get("request")),
+                                                  "securitas.installation": str(payload.get("numinst", ""))})
+        self.spans.set(self.spans.get() + (span,))
+
+    def after_request(self, payload, result, elapsed, size, parse_time, error=None):
+        """
+        Ends the span of the request
+        """
+
+        spans = self.spans.get()
+        if not spans:
+            return
+
+        span = spans[-1]
+        self.spans.set(spans[:-1])
+        span.set_attribute("securitas.response_bytes", size)
+        span.set_attribute("securitas.parse_time", parse_time)
+        if result:
+            span.set_attribute("securitas.result", str(result.get("RES")))
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+
+    def on_relogin(self):
+        """
+        Counts the re-login and records it on the current span, e.g. the span of the command being performed
+        Re-logins happen between the failed request and its retry, when no request span is open
+        """
+
+        self.relogins.add(1)
+        self.trace.get_current_span().add_event("securitas.relogin")
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+from collections import OrderedDict
+from xml.parsers import expat
+
+# in bytes
+CHUNK_SIZE = 64 * 1024
+SKIPPED_TAGS = ("BLOQ",)
+BINARY_TAGS = ("IMG",)
+
+
+class StreamingParser:
+    """
+    Incremental xml parser producing the same structure as xmltodict
+    Chunks are fed as they arrive, unwanted subtrees are skipped without being built and text of binary tags
+    (e.g. base64 images) is returned as bytes
+    """
+
+    def __init__(self, skip=SKIPPED_TAGS, binary=BINARY_TAGS):
+        """
+        Initializes the parser
+
+        :param skip tags whose subtrees are discarded
+        :param binary tags whose text is returned as bytes
+        """
+
+        self.skip = frozenset(skip)
+        self.binary = frozenset(binary)
+        self.stack = []
+        self.skipping = 0
+        self.result = None
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.characters
+
+    def start(self, name, attrs):
+        """
+        Handles the start of an element
+        """
+
+        if self.skipping or name in self.skip:
+            self.skipping += 1
+
+            return
+
+        item = OrderedDict(("@" + k, v) for k, v in attrs.items()) if attrs else None
+        self.stack.append((name, item, []))
+
+    def end(self, name):
+        """
+        Handles the end of an element by attaching it to its parent
+        """
+
+        if self.skipping:
+            self.skipping -= 1
+
+            return
+
+        name, item, text = self.stack.pop()
+        data = None
+        if text:
+            if name in self.binary:
+                data = b"".join(t.encode("ascii") for t in text).strip()
+            else:
+                data = "".join(text).strip()
+            data = data or None
+
+        if item is None:
+            item = data
+        elif data is not None:
+            item["#text"] = data
+
+        if not self.stack:
+            self.result = OrderedDict([(name, item)])
+
+            return
+
+        parent_name, parent, parent_text = self.stack[-1]
+        if parent is None:
+            parent = OrderedDict()
+            self.stack[-1] = (parent_name, parent, parent_text)
+
+        if name not in parent:
+            parent[name] = item
+        elif isinstance(parent[name], list):
+            parent[name].append(item)
+        else:
+            parent[name] = [parent[name], item]
+
+    def characters(self, data):
+        """
+        Collects the text of the current element
+        """
+
+        if not self.skipping and self.stack:
+            self.stack[-1][2].append(data)
+
+    def feed(self, chunk):
+        """
+        Parses a chunk of the document
+
+        :param chunk bytes of the document
+        """
+
+        self.parser.Parse(chunk, False)
+
+    def close(self):
+        """
+        Finishes parsing
+
+        :return: the parsed document
+        """
+
+        self.parser.Parse(b"", True)
+
+        return self.result
+
+
+def parse_stream(chunks, skip=SKIPPED_TAGS, binary=BINARY_TAGS):
+    """
+    Parses a document incrementally
+
+    :param chunks iterable of byte chunks
+    :param skip tags whose subtrees are discarded
+    :param binary tags whose text is returned as bytes
+
+    :return: the parsed document
+    """
+
+    parser = StreamingParser(skip, binary)
+    for chunk in chunks:
+        parser.feed(chunk)
+
+    return parser.close()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import random
+import threading
+
+# in seconds
+DEFAULT_INTERVAL = 1
+
+
+class PollStrategy(object):
+    """
+    Decides how long to wait before each poll of a two-phase request
+    """
+
+    def delays(self, action):
+        """
+        Returns an iterator of waiting times, the first one is measured from the moment the request was
+        submitted and each of the following ones from the previous poll
+
+        :param action action being polled (ARM, EST, ...)
+
+        :return: an iterator of delays in seconds
+        """
+
+        raise NotImplementedError()
+
+    def record(self, action, elapsed):
+        """
+        Records how long an action took to complete, from submission to a final result
+
+        :param action action that completed
+        :param elapsed time in seconds between submission and result
+        """
+
+        pass
+
+
+class FixedPollStrategy(PollStrategy):
+    """
+    Polls on a fixed interval, this is the historical behaviour
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, initial=None):
+        """
+        Initializes the strategy
+
+        :param interval time between polls
+        :param initial time before the first poll, defaults to two intervals
+        """
+
+        self.interval = interval
+        self.initial = 2 * interval if initial is None else initial
+
+    def delays(self, action):
+        """
+        Waits the initial delay and then the fixed interval forever
+        """
+
+        yield self.initial
+        while True:
+            yield self.interval
+
+
+class ExponentialPollStrategy(PollStrategy):
+    """
+    Polls with exponentially growing delays, randomized with jitter so concurrent polls do not align
+    """
+
+    def __init__(self, initial=0.5, factor=2.0, maximum=8.0, jitter=0.1):
+        """
+        Initializes the strategy
+
+        :param initial time before the first poll
+        :param factor multiplier applied to the delay after each poll
+        :param maximum upper bound for a single delay
+        :param jitter fraction of each delay that is randomized (0.1 means ±10%)
+        """
+
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delays(self, action):
+        """
+        Grows the delay by `factor` after each poll, up to `maximum`
+        """
+
+        delay = self.initial
+        while True:
+            yield max(0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+            delay = min(self.maximum, delay * self.factor)
+
+
+class LearnedPollStrategy(PollStrategy):
+    """
+    Learns the latency of each action and fires the first poll near the expected completion time
+    Following polls back off exponentially
+    """
+
+    def __init__(self, initial=2.0, interval=0.5, factor=2.0, maximum=8.0, alpha=0.3, margin=0.9):
+        """
+        Initializes the strategy
+
+        :param initial time before the first poll while an action has no latency recorded
+        :param interval delay after a first poll that was too early
+        :param factor multiplier applied to the delay after each unsuccessful poll
+        :param maximum upper bound for a single delay
+        :param alpha weight of the most recent sample on the moving average
+        :param margin fraction of the expected latency waited before the first poll
+        """
+
+        self.initial = initial
+        self.interval = interval
+        self.factor = factor
+        self.maximum = maximum
+        self.alpha = alpha
+        self.margin = margin
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def expected_latency(self, action):
+        """
+        Returns the moving average of the latency for an action
+
+        :param action action to look up
+
+        :return: latency in seconds or None if unknown
+        """
+
+        with self.lock:
+            return self.latencies.get(action)
+
+    def delays(self, action):
+        """
+        Waits for the expected latency and then backs off exponentially
+        """
+
+        expected = self.expected_latency(action)
+        yield self.initial if expected is None else min(self.maximum, expected * self.margin)
+        delay = self.interval
+        while True:
+            yield delay
+            delay = min(self.maximum, delay * self.factor)
+
+    def record(self, action, elapsed):
+        """
+        Updates the exponential moving average of an action latency
+        """
+
+        with self.lock:
+            previous = self.latencies.get(action)
+            self.latencies[action] = elapsed if previous is None else \
+                self.alpha * elapsed + (1 - self.alpha) * previous
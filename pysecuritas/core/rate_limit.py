@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# lower is served first
+PRIORITIES = {
+    "DARM": 0,
+    "DARMANNEX": 0,
+    "ARM": 1,
+    "ARMDAY": 1,
+    "ARMNIGHT": 1,
+    "PERI": 1,
+    "ARMANNEX": 1,
+    "LOGIN": 2,
+    "CLS": 2,
+    "IMG": 3,
+    "INF": 3,
+    "EST": 4,
+    "ACT_V2": 4,
+    "SRV": 5,
+    "MYINSTALLATION": 5,
+    "INS": 5,
+}
+DEFAULT_PRIORITY = 3
+
+
+def get_priority(request):
+    """
+    Returns the priority of a request, disarming comes before arming, which comes before reading status
+
+    :param request request name, including the 1/2 suffix of two-phase requests
+
+    :return: the priority, lower is served first
+    """
+
+    if request in PRIORITIES:
+        return PRIORITIES[request]
+
+    return PRIORITIES.get((request or "")[:-1], DEFAULT_PRIORITY)
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of requests, waiting requests are served by priority and then in arrival order
+    Limiters can be chained: a limiter per account with a global limiter as parent
+    """
+
+    def __init__(self, rate, burst=1, parent=None):
+        """
+        Initializes the limiter
+
+        :param rate requests per second
+        :param burst maximum number of requests sent at once after being idle
+        :param parent optional limiter also acquired by every request, e.g. a global one shared by all accounts
+        """
+
+        self.rate = float(rate)
+        self.burst = burst
+        self.parent = parent
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self.by_priority = {}
+
+    def refill(self):
+        """
+        Adds the tokens earned since the last refill, must be called holding the lock
+        """
+
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=DEFAULT_PRIORITY, timeout=None):
+        """
+        Waits until a request can be sent
+
+        :param priority priority of the request, lower is served first
+        :param timeout maximum seconds to wait, waits forever if None
+
+        :return: seconds waited
+        """
+
+        started = time.time()
+        deadline = None if timeout is None else started + timeout
+        with self.condition:
+            ticket = (priority, next(self.counter))
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    self.refill()
+                    first = self.waiting[0] == ticket
+                    if first and self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+
+                    wait = (1 - self.tokens) / self.rate if first else None
+                    if deadline is not None:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            self.rejected += 1
+
+                            raise RateLimitException("Rate limit wait exceeded %s seconds" % timeout)
+
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self.condition.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+            waited = time.time() - started
+            self.acquired += 1
+            self.waited += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.by_priority[priority] = self.by_priority.get(priority, 0) + 1
+
+        if self.parent is not None:
+            waited += self.parent.acquire(priority, None if deadline is None else max(0, deadline - time.time()))
+
+        return waited
+
+    def report(self):
+        """
+        Returns the budget use of this limiter
+
+        :return: a dictionary
+        """
+
+        with self.condition:
+            self.refill()
+
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "available": self.tokens,
+                "queued": len(self.waiting),
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "waited": self.waited,
+                "max_wait": self.max_wait,
+                "by_priority": dict(self.by_priority),
+            }
+
+
+class RateLimitException(Exception):
+    """
+    Exception when a request waited too long for the rate limiter
+    """
+
+    def __init__(self, *args):
+        super(RateLimitException, self).__init__(*args)
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import ssl
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+import requests
+
+log = logging.getLogger("pysecuritas")
+
+# failure categories
+TRANSIENT = "transient"
+AUTH = "auth"
+BUSY = "busy"
+TIMEOUT = "timeout"
+FATAL = "fatal"
+# error codes answered when the login hash expired or is not valid
+RELOGIN_CODES = ("60067", "60022")
+# http status codes worth retrying
+RETRY_STATUS = (429, 502, 503, 504)
+# categories retried for a single request and for a whole command (e.g. ARM1 and its polls)
+REQUEST_RETRIES = (TRANSIENT, AUTH)
+COMMAND_RETRIES = (BUSY,)
+# categories whose retries are paid from the budget, re-logins are shared by concurrent requests (see
+# `Session.reconnect`) so they cannot flood the server
+BUDGETED = (TRANSIENT, BUSY)
+
+
+class RetryPolicy:
+    """
+    How many times and how long after a failure of a category is retried
+    """
+
+    def __init__(self, attempts=3, backoff=1, factor=2, maximum=30, jitter=0.1):
+        """
+        Initializes the policy
+
+        :param attempts maximum number of retries
+        :param backoff seconds waited before the first retry
+        :param factor growth of the wait after each retry
+        :param maximum longest wait in seconds, also bounding waits asked by the server
+        :param jitter random fraction added to or removed from each wait
+        """
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Returns the seconds to wait before a retry
+
+        :param attempt number of the retry, starting at 1
+        :param retry_after seconds asked by the server (Retry-After), used instead of the backoff if given
+        """
+
+        if retry_after is not None:
+            return min(self.maximum, max(0, retry_after))
+
+        delay = min(self.maximum, self.backoff * self.factor ** (attempt - 1))
+
+        return max(0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+DEFAULT_POLICIES = {
+    TRANSIENT: RetryPolicy(3, 1),
+    AUTH: RetryPolicy(1, 0, jitter=0),
+    BUSY: RetryPolicy(3, 2),
+}
+
+
+class RetryBudget:
+    """
+    Bounds retries to a fraction of the calls, so a degraded service is not flooded by retries
+    Every call earns `ratio` retries, up to `maximum` saved ones
+    """
+
+    def __init__(self, ratio=0.2, maximum=10):
+        """
+        Initializes the budget, full
+
+        :param ratio retries earned by each call
+        :param maximum most retries that can be saved
+        """
+
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = float(maximum)
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        """
+        Earns retries for a call
+        """
+
+        with self.lock:
+            self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Spends a retry
+
+        :return: False if there is no retry left
+        """
+
+        with self.lock:
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+
+            return True
+
+    def available(self):
+        """
+        Returns the retries left
+        """
+
+        with self.lock:
+            return self.tokens
+
+
+class CircuitBreaker:
+    """
+    Stops sending commands to an installation after consecutive failures, for a while
+    Once the wait is over a single trial command is let through: its success closes the circuit, its failure opens it
+    again
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        """
+        Initializes the breaker
+
+        :param threshold consecutive failures opening the circuit of an installation
+        :param reset_timeout seconds the circuit stays open before a trial
+        """
+
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = Counter()
+        self.opened = {}
+        self.trials = set()
+        self.lock = threading.Lock()
+
+    def allow(self, key):
+        """
+        Check if a command can be sent to an installation
+
+        :param key installation number
+        """
+
+        with self.lock:
+            opened = self.opened.get(key)
+            if opened is None:
+                return True
+
+            if key in self.trials or time.time() - opened < self.reset_timeout:
+                return False
+
+            self.trials.add(key)
+
+            return True
+
+    def success(self, key):
+        """
+        Records a successful command, closing the circuit
+        """
+
+        with self.lock:
+            self.failures.pop(key, None)
+            self.opened.pop(key, None)
+            self.trials.discard(key)
+
+    def failure(self, key):
+        """
+        Records a failed command, opening the circuit after too many of them or if it was a trial
+        """
+
+        with self.lock:
+            self.failures[key] += 1
+            if key in self.trials or self.failures[key] >= self.threshold:
+                if key not in self.opened or key in self.trials:
+                    log.warning("Opening circuit of installation %s after %s failures", key, self.failures[key])
+                self.opened[key] = time.time()
+                self.trials.discard(key)
+
+    def open_circuits(self):
+        """
+        Returns the installations whose circuit is open
+        """
+
+        with self.lock:
+            return sorted(self.opened)
+
+
+class RetryEngine:
+    """
+    Retries failed requests and commands according to the category of the failure: network errors and overloaded
+    servers (transient), expired logins (auth) and busy panels (busy)
+    Network and busy retries are bounded by a budget and commands to failing installations are stopped by a circuit
+    breaker
+    An engine can be shared by many sessions
+    """
+
+    def __init__(self, policies=None, codes=None, budget=None, breaker=None):
+        """
+        Initializes the engine
+
+        :param policies policies by category, added to or replacing the default ones (None disables a category)
+        :param codes categories by api error code (ERR), added to the default ones, e.g. BUSY for the codes answered
+        by a busy panel
+        :param budget retry budget, a default one if None
+        :param breaker circuit breaker, a default one if None
+        """
+
+        self.policies = dict(DEFAULT_POLICIES)
+        self.policies.update(policies or {})
+        self.codes = dict((code, AUTH) for code in RELOGIN_CODES)
+        self.codes.update(codes or {})
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.retries = Counter()
+        self.exhausted = Counter()
+        self.rejected = 0
+
+    def classify(self, result=None, error=None):
+        """
+        Returns the category of a failure
+
+        :param result parsed response, None if the command timed out
+        :param error exception raised, if any
+
+        :return: a tuple (category or None if it did not fail, seconds asked by the server before a retry or None)
+        """
+
+        if error is not None:
+            code = getattr(error, "code", None)
+            if code in self.codes:
+                return self.codes[code], None
+
+            status = getattr(getattr(error, "response", None), "status_code", None)
+            if status is not None:
+                return (TRANSIENT, get_retry_after(error.response)) if status in RETRY_STATUS else (FATAL, None)
+
+            return (TRANSIENT, None) if is_transient(error) else (FATAL, None)
+
+        if result is None:
+            return TIMEOUT, None
+
+        if result.get("RES") == "ERROR" and result.get("ERR") in self.codes:
+            return self.codes[result.get("ERR")], None
+
+        return None, None
+
+    def execute(self, function, key=None, retry=REQUEST_RETRIES, on_auth=None, sleep=time.sleep):
+        """
+        Calls a function until it succeeds or its failure should not be retried
+
+        :param function function performing a request or a command, returning its result
+        :param key installation targeted, whose circuit is checked and updated, None to skip the circuit breaker
+        :param retry categories retried
+        :param on_auth function receiving the failed result before retrying an auth failure, e.g. a re-login
+        :param sleep function waiting between attempts
+
+        :return: the result of the last attempt, the exception of the last attempt is raised instead if any
+        """
+
+        self.admit(key)
+        attempts = Counter()
+        while True:
+            result, error = None, None
+            try:
+                result = function()
+            except Exception as e:
+                error = e
+
+            retry_in = self.next_retry(key, retry, attempts, result, error)
+            if retry_in is None:
+                if error is not None:
+                    raise error
+
+                return result
+
+            category, delay = retry_in
+            if category == AUTH and on_auth:
+                on_auth(result)
+            sleep(delay)
+
+    async def aexecute(self, function, key=None, retry=REQUEST_RETRIES, on_auth=None, sleep=asyncio.sleep):
+        """
+        Awaits a coroutine function until it succeeds or its failure should not be retried, see `execute`
+
+        :param function coroutine function performing a request or a command, returning its result
+        :param on_auth coroutine function receiving the failed result before retrying an auth failure
+        :param sleep coroutine function waiting between attempts
+        """
+
+        self.admit(key)
+        attempts = Counter()
+        while True:
+            result, error = None, None
+            try:
+                result = await function()
+            except Exception as e:
+                error = e
+
+            retry_in = self.next_retry(key, retry, attempts, result, error)
+            if retry_in is None:
+                if error is not None:
+                    raise error
+
+                return result
+
+            category, delay = retry_in
+            if category == AUTH and on_auth:
+                await on_auth(result)
+            await sleep(delay)
+
+    def admit(self, key):
+        """
+        Starts a call, raising `CircuitOpenException` if the circuit of the installation is open
+
+        :param key installation targeted, None to skip the circuit breaker
+        """
+
+        if key is not None and not self.breaker.allow(key):
+            with self.lock:
+                self.rejected += 1
+
+            raise CircuitOpenException("Too many failures on installation %s, not sending commands for now" % key)
+
+        self.budget.deposit()
+
+    def next_retry(self, key, retry, attempts, result, error):
+        """
+        Records the outcome of an attempt and decides if it is retried
+
+        :param key installation targeted, None to skip the circuit breaker
+        :param retry categories retried
+        :param attempts counter of failed attempts by category, updated
+        :param result result of the attempt
+        :param error exception raised by the attempt, if any
+
+        :return: a tuple (category, seconds to wait) if the attempt is retried, None otherwise
+        """
+
+        category, retry_after = self.classify(result, error)
+        if category is None:
+            if key is not None:
+                self.breaker.success(key)
+
+            return None
+
+        attempts[category] += 1
+        policy = self.policies.get(category) if category in retry else None
+        if policy is None or attempts[category] > policy.attempts or \
+                (category in BUDGETED and not self.budget.withdraw()):
+            if policy is not None:
+                with self.lock:
+                    self.exhausted[category] += 1
+            if key is not None and category in (TRANSIENT, BUSY, TIMEOUT):
+                self.breaker.failure(key)
+            elif key is not None:
+                self.breaker.success(key)
+
+            return None
+
+        with self.lock:
+            self.retries[category] += 1
+        log.info("Retrying after %s failure (%s)", category,
+                 error if error is not None else (result or {}).get("ERR"))
+
+        return category, policy.delay(attempts[category], retry_after)
+
+    def report(self):
+        """
+        Returns the retries performed and the state of the budget and circuits
+
+        :return: a dictionary
+        """
+
+        with self.lock:
+            return {
+                "retries": dict(self.retries),
+                "exhausted": dict(self.exhausted),
+                "rejected": self.rejected,
+                "budget": self.budget.available(),
+                "open": self.breaker.open_circuits(),
+            }
+
+
+def is_transient(error):
+    """
+    Check if an exception is a network error worth retrying: connection errors and timeouts of requests, transport
+    errors of httpx and socket errors
+    Invalid urls, unsupported schemes and TLS failures are not
+    """
+
+    if isinstance(error, (requests.exceptions.SSLError, ssl.SSLError)):
+        return False
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError, socket.timeout,
+                          socket.gaierror)):
+        return True
+
+    names = [c.__name__ for c in type(error).__mro__ if c.__module__.startswith("httpx")]
+
+    return "TransportError" in names and "UnsupportedProtocol" not in names
+
+
+def get_retry_after(response):
+    """
+    Returns the seconds asked by a Retry-After header, given as seconds or as a date
+
+    :return: the seconds or None if there is no valid header
+    """
+
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CircuitOpenException(Exception):
+    """
+    Exception when commands to an installation are stopped after too many failures
+    """
+
+    def __init__(self, *args):
+        super(CircuitOpenException, self).__init__(*args)
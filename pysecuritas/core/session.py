@@ -3,15 +3,17 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 
+import itertools
 import json
 import logging
+import threading
+import time
 from datetime import datetime
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3 import Retry
-
-from pysecuritas.core.utils import handle_response
+from pysecuritas.core.flight import SingleFlight
+from pysecuritas.core.rate_limit import get_priority
+from pysecuritas.core.retry import RELOGIN_CODES
+from pysecuritas.core.transport import RequestsTransport, DEFAULT_RETRIES
 
 log = logging.getLogger("pysecuritas")
 
@@ -23,11 +25,18 @@ BASE_URL = "https://mob2217.securitasdirect.es:12010/WebService/ws.do"
 class Session:
     """
     A session will handle connectivity to interact with securitas installation and devices
+    It can be shared by many threads: an expired login is renewed once and connections are kept
     """
 
-    def __init__(self, username, password, installation, country, lang, sensor=None):
+    def __init__(self, username, password, installation, country, lang, sensor=None, token_store=None,
+                 keep_login=False, transport=None):
         """
         Session initializer
+
+        :param token_store optional store used to reuse login hashes across sessions and processes
+        :param keep_login if True, closing the session does not logout so the login hash remains usable
+        :param transport optional transport (see `pysecuritas.core.transport`) sending the requests, it can be
+        shared with other sessions and closing this session does not close it, requests are used by default
         """
 
         self.username = username
@@ -37,9 +46,23 @@ class Session:
         self.lang = lang.lower()
         self.sensor = sensor
         self.timeout = DEFAULT_TIMEOUT
+        self.base_url = BASE_URL
+        self.streaming = False
         self.session = None
         self.login_hash = None
-        requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS += 'HIGH:!DH:!aNULL'
+        self.login_generation = 0
+        self.login_lock = threading.RLock()
+        self.token_store = token_store
+        self.keep_login = keep_login
+        self.hooks = []
+        self.transport = transport
+        self.owns_transport = transport is None
+        self.cache = None
+        self.rate_limiter = None
+        self.retry_engine = None
+        self.watchers = {}
+        self.single_flight = SingleFlight()
+        self.request_ids = itertools.count()
 
     def set_timeout(self, timeout):
         """
@@ -52,19 +75,130 @@ class Session:
 
         return self
 
+    def set_base_url(self, base_url):
+        """
+        Sets the value of `base_url`, the endpoint receiving every request
+
+        :return: self
+        """
+
+        self.base_url = base_url
+
+        return self
+
+    def add_hook(self, hook):
+        """
+        Adds a hook notified about every request (see `pysecuritas.core.metrics.SessionHook`)
+
+        :return: self
+        """
+
+        self.hooks.append(hook)
+
+        return self
+
+    def notify(self, event, *args):
+        """
+        Notifies every hook about an event, errors raised by hooks are logged and ignored
+
+        :param event name of the hook method
+        :param args arguments of the hook method
+        """
+
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(*args)
+            except Exception as e:
+                log.error("Hook %s failed on %s: %s", type(hook).__name__, event, e)
+
+    def set_streaming(self, streaming):
+        """
+        Sets the value of `streaming`, when enabled responses are parsed incrementally while they are read
+
+        :return: self
+        """
+
+        self.streaming = streaming
+
+        return self
+
+    def set_cache(self, cache):
+        """
+        Sets the value of `cache`, a `pysecuritas.core.cache.ResultCache` keeping results of read-only requests
+        that rarely change (SRV, MYINSTALLATION, INS), it can be shared with other sessions
+
+        :return: self
+        """
+
+        self.cache = cache
+
+        return self
+
+    def set_rate_limiter(self, rate_limiter):
+        """
+        Sets the value of `rate_limiter`, a `pysecuritas.core.rate_limit.RateLimiter` every request waits for,
+        it can be shared with other sessions
+
+        :return: self
+        """
+
+        self.rate_limiter = rate_limiter
+
+        return self
+
+    def set_retry_engine(self, retry_engine):
+        """
+        Sets the value of `retry_engine`, a `pysecuritas.core.retry.RetryEngine` retrying failed requests and
+        commands by category of failure, it can be shared with other sessions
+        Without it, requests are only repeated once after a re-login
+        With it, the transport created by the session does not retry by itself so attempts are not multiplied,
+        transports given to the session should be created with `retries=0` as well
+
+        :return: self
+        """
+
+        with self.login_lock:
+            self.retry_engine = retry_engine
+            if self.owns_transport and self.transport is not None:
+                transport, self.transport = self.transport, None
+                transport.close()
+
+        return self
+
+    def get_transport(self):
+        """
+        Returns the transport sending the requests, creating a requests transport if none was given
+        Safe to call from many threads
+
+        :return: a transport
+        """
+
+        transport = self.transport
+        if transport is None:
+            with self.login_lock:
+                if self.transport is None:
+                    log.debug("Creating new session")
+                    self.transport = RequestsTransport(retries=0 if self.retry_engine else DEFAULT_RETRIES)
+                transport = self.transport
+
+        return transport
+
     def get_or_create_session(self):
         """
-        Creates a new session to make requests or retrieves an existing one
+        Creates a new session to make requests or retrieves an existing one, safe to call from many threads
+        Sessions created with a shared transport use its pooled connections, only for requests transports
 
         :return: a requests session
         """
 
-        if not self.session:
-            log.debug("Creating new session")
-            self.session = requests.Session()
-            self.session.mount("https://", HTTPAdapter(max_retries=Retry(total=3, backoff_factor=1)))
+        session = self.session
+        if not session:
+            with self.login_lock:
+                if not self.session:
+                    self.session = self.get_transport().get_or_create_session()
+                session = self.session
 
-        return self.session
+        return session
 
     def build_payload(self, **params):
         """
@@ -83,16 +217,27 @@ class Session:
 
     def generate_request_id(self):
         """
-        Generates a new request id
+        Generates a new request id, unique for this session even when many requests are sent within a second
         """
 
-        return "AND_________________________" + self.username + datetime.now().strftime("%Y%m%d%H%M%S")
+        return "AND_________________________" + self.username + datetime.now().strftime("%Y%m%d%H%M%S") + \
+            "%04d" % (next(self.request_ids) % 10000)
 
     def connect(self):
         """
         Connects to api by logging in and creating a new session
+        If a token store is available, a stored login hash is reused instead, unless it is the one already in use
         """
 
+        if self.token_store:
+            stored_hash = self.token_store.get(self.username, self.country)
+            if stored_hash and stored_hash != self.login_hash:
+                log.info("Reusing stored login to securitas server")
+                self.login_hash = stored_hash
+                self.login_generation += 1
+
+                return
+
         log.info("Connecting to securitas server")
         response = self.get({"Country": self.country,
                              "user": self.username,
@@ -108,6 +253,9 @@ class Session:
 
         log.info("Connected to securitas server")
         self.login_hash = login_hash
+        self.login_generation += 1
+        if self.token_store:
+            self.token_store.set(self.username, self.country, login_hash)
 
     def is_connected(self):
         """
@@ -128,31 +276,85 @@ class Session:
         """
         Performs a GET request and returns a dictionary with the parsed response
         If response happens to end in error, session will try to re-login and repeat the request
+        If a rate limiter is set, the request waits for it first, if a retry engine is set, failures are retried
+        according to its policies
         :param payload get request parameters
 
         :return: a parsed structured from the xml response
         """
 
         def _get():
-            return handle_response(self.get_or_create_session().get(BASE_URL, params=payload, timeout=self.timeout))
+            if self.rate_limiter:
+                self.rate_limiter.acquire(get_priority(payload.get("request")))
+            self.notify("before_request", payload)
+            started = time.time()
+            result, size, parse_time, error = None, 0, 0, None
+            try:
+                result, size, parse_time = self.get_transport().get(self.base_url, payload, self.timeout,
+                                                                    self.streaming)
+
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.notify("after_request", payload, result, time.time() - started, size, parse_time, error)
+
+        generation = self.login_generation
+
+        def relogin(result):
+            self.reconnect(generation, payload.get("hash"))
+            payload["hash"] = self.login_hash
+
+        if self.retry_engine:
+            return self.retry_engine.execute(_get, on_auth=relogin)
 
         result = _get()
-        if result.get("ERR") in ("60067", "60022"):
-            self.session = None
-            self.connect()
-            payload["hash"] = self.login_hash
+        if result.get("ERR") in RELOGIN_CODES:
+            relogin(result)
 
             return _get()
 
         return result
 
+    def reconnect(self, generation, used_hash=None):
+        """
+        Logs in again unless another thread already did it after the given login generation
+        Concurrent callers wait for a single login and then reuse its hash
+        Connections are kept, only the login hash is renewed
+
+        :param generation login generation seen when the failed request was sent
+        :param used_hash hash sent on the failed request, if any
+        """
+
+        with self.login_lock:
+            if self.login_generation == generation and used_hash in (None, self.login_hash):
+                self.notify("on_relogin")
+                self.connect()
+
+    def for_installation(self, installation, sensor=None):
+        """
+        Returns a view of this session targeting another installation of the same account
+        The view shares login and connections with this session
+
+        :param installation installation number
+        :param sensor optional sensor id
+
+        :return: a session view
+        """
+
+        return SessionView(self, installation, sensor)
+
     def close(self):
         """
-        Closes the session and logout from the api
+        Closes the session and logout from the api, unless the login should be kept
         """
 
         log.info("Closing session to securitas server")
         try:
+            if self.keep_login:
+                return
+
             response = self.get({"Country": self.country,
                                  "user": self.username,
                                  "lang": self.lang,
@@ -164,11 +366,14 @@ class Session:
                 log.error("Unable to close session: %s", json.dumps(response))
 
                 raise ConnectionException("Unable to logout")
+
+            if self.token_store:
+                self.token_store.delete(self.username, self.country)
         finally:
-            if self.session:
+            self.session = None
+            if self.transport and self.owns_transport:
                 try:
-                    self.session.close()
-                    self.session = None
+                    self.transport.close()
                 except:
                     pass
 
@@ -189,6 +394,43 @@ class Session:
         return self
 
 
+class SessionView:
+    """
+    A session bound to a specific installation that delegates everything else to a shared session
+    """
+
+    def __init__(self, session, installation, sensor=None):
+        """
+        Session view initializer
+
+        :param session shared session
+        :param installation installation number
+        :param sensor optional sensor id
+        """
+
+        self.parent = session
+        self.installation = installation
+        self.sensor = sensor
+
+    def build_payload(self, **params):
+        """
+        Builds a payload from the shared session targeting this view installation
+        """
+
+        payload = self.parent.build_payload(**params)
+        if self.installation:
+            payload["numinst"] = self.installation
+
+        return payload
+
+    def __getattr__(self, name):
+        """
+        Delegates to the shared session
+        """
+
+        return getattr(self.parent, name)
+
+
 class ConnectionException(Exception):
     """
     Exception when unable to connect
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("pysecuritas")
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".pysecuritas", "tokens.json")
+
+
+class TokenStore(object):
+    """
+    Keeps login hashes so they can be reused across sessions and processes
+    """
+
+    def get(self, username, country):
+        """
+        Returns the stored login hash of an account
+
+        :param username account username
+        :param country account country
+
+        :return: the login hash or None if there is none
+        """
+
+        raise NotImplementedError()
+
+    def set(self, username, country, login_hash):
+        """
+        Stores the login hash of an account
+
+        :param username account username
+        :param country account country
+        :param login_hash hash to be stored
+        """
+
+        raise NotImplementedError()
+
+    def delete(self, username, country):
+        """
+        Removes the login hash of an account
+
+        :param username account username
+        :param country account country
+        """
+
+        raise NotImplementedError()
+
+
+class FileTokenStore(TokenStore):
+    """
+    Token store backed by a json file, guarded by a lock file so several processes can share it
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_age=None):
+        """
+        Initializes the store
+
+        :param path json file where hashes are kept
+        :param max_age seconds after which a stored hash is ignored, never expires if None
+        """
+
+        self.path = path
+        self.max_age = max_age
+
+    @staticmethod
+    def key(username, country):
+        """
+        Builds the key of an account
+        """
+
+        return username + "|" + country.upper()
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds an exclusive lock on the store while reading or writing it
+        """
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def read(self):
+        """
+        Reads every stored entry, an unreadable store is considered empty
+        """
+
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def write(self, entries):
+        """
+        Atomically replaces the stored entries
+        """
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".tokens")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def get(self, username, country):
+        """
+        Returns the stored login hash of an account if it has not expired
+        """
+
+        with self.locked():
+            entry = self.read().get(self.key(username, country))
+
+        if not entry:
+            return None
+
+        if self.max_age is not None and time.time() - entry.get("time", 0) > self.max_age:
+            log.debug("Stored login hash expired")
+
+            return None
+
+        return entry.get("hash")
+
+    def set(self, username, country, login_hash):
+        """
+        Stores the login hash of an account
+        """
+
+        with self.locked():
+            entries = self.read()
+            entries[self.key(username, country)] = {"hash": login_hash, "time": time.time()}
+            self.write(entries)
+
+    def delete(self, username, country):
+        """
+        Removes the login hash of an account
+        """
+
+        with self.locked():
+            entries = self.read()
+            if entries.pop(self.key(username, country), None) is not None:
+                self.write(entries)
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import logging
+import ssl
+import threading
+import time
+
+import requests
+import xmltodict
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+from urllib3.util import ssl_
+
+from pysecuritas.core.parser import parse_stream, StreamingParser, CHUNK_SIZE
+from pysecuritas.core.utils import handle_response, response_size, clean_response
+
+log = logging.getLogger("pysecuritas")
+
+# every request goes to a single host, one pool is enough
+DEFAULT_POOL_CONNECTIONS = 1
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 1
+# ciphers accepted by the api server on top of the urllib3 defaults (urllib3 2 uses the system defaults)
+CIPHERS = ":".join(c for c in (getattr(ssl_, "DEFAULT_CIPHERS", None), "HIGH:!DH:!aNULL") if c)
+
+
+def query(params):
+    """
+    Returns the query parameters of a request as text, dropping the missing ones like requests does
+    """
+
+    return dict((k, str(v)) for k, v in params.items() if v is not None)
+
+
+class Transport(object):
+    """
+    Sends the requests of sessions to the api, it can be shared by many sessions, even of different accounts
+    """
+
+    def get(self, url, params, timeout, streaming=False):
+        """
+        Performs a GET request and parses the xml response
+
+        :param url endpoint receiving the request
+        :param params query parameters
+        :param timeout timeout of the request in seconds
+        :param streaming if True, the body is parsed incrementally as it is read (see `handle_response`)
+
+        :return: a tuple (parsed response, size of the body in bytes, seconds spent parsing it)
+        """
+
+        raise NotImplementedError()
+
+    async def aget(self, url, params, timeout, streaming=False):
+        """
+        Performs a GET request without blocking the event loop, same arguments and result as `get`
+        """
+
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Closes every open connection
+        """
+
+        pass
+
+    async def aclose(self):
+        """
+        Closes every open connection of async requests
+        """
+
+        pass
+
+    def __exit__(self, *args):
+        """
+        Enable closing the transport when used on context manager
+        """
+
+        self.close()
+
+    def __enter__(self):
+        """
+        Enable usage as context manager
+        """
+
+        return self
+
+
+class CipherAdapter(HTTPAdapter):
+    """
+    Http adapter whose connections use an ssl context accepting the api server ciphers
+    The context is built once per adapter instead of changing the global urllib3 ciphers
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the adapter, same arguments as `HTTPAdapter`
+        """
+
+        self.ssl_context = ssl_.create_urllib3_context(ciphers=CIPHERS)
+        HTTPAdapter.__init__(self, *args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """
+        Creates the pool manager with the adapter ssl context
+        """
+
+        kwargs["ssl_context"] = self.ssl_context
+
+        return HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        """
+        Creates proxy managers with the adapter ssl context
+        """
+
+        kwargs["ssl_context"] = self.ssl_context
+
+        return HTTPAdapter.proxy_manager_for(self, *args, **kwargs)
+
+
+class RequestsTransport(Transport):
+    """
+    Pooled http connections to the api made with requests, the default transport
+    Connections are kept alive between requests and survive re-logins, so TLS handshakes are only paid once
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR, keep_alive=True):
+        """
+        Initializes the transport
+
+        :param pool_connections number of hosts whose connections are pooled
+        :param pool_maxsize maximum number of connections kept open per host
+        :param pool_block if True, no more than `pool_maxsize` connections are opened per host at the same time
+                          and requests wait for a free one
+        :param retries number of retries on connection errors
+        :param backoff_factor backoff factor between retries
+        :param keep_alive if False, connections are closed after every request
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.keep_alive = keep_alive
+        self.session = None
+        self.lock = threading.Lock()
+
+    def get_or_create_session(self):
+        """
+        Creates the pooled requests session or retrieves the existing one
+
+        :return: a requests session
+        """
+
+        session = self.session
+        if session:
+            return session
+
+        with self.lock:
+            if not self.session:
+                self.session = self.create_session()
+
+            return self.session
+
+    def get(self, url, params, timeout, streaming=False):
+        """
+        Performs a GET request and parses the xml response
+        """
+
+        response = self.get_or_create_session().get(url, params=params, timeout=timeout, stream=streaming)
+        received = time.time()
+        result = handle_response(response, streaming)
+
+        return result, response_size(response, streaming), time.time() - received
+
+    def create_session(self):
+        """
+        Creates a requests session mounting an adapter with the configured pool and ciphers
+
+        :return: a requests session
+        """
+
+        log.debug("Creating new transport")
+        session = requests.Session()
+        adapter = CipherAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              max_retries=Retry(total=self.retries, backoff_factor=self.backoff_factor),
+                              pool_block=self.pool_block)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+
+        return session
+
+    def close(self):
+        """
+        Closes every pooled connection
+        """
+
+        with self.lock:
+            session, self.session = self.session, None
+
+        if session:
+            session.close()
+
+
+class HttpxTransport(Transport):
+    """
+    Connections to the api made with httpx (requires httpx, and h2 for HTTP/2), usable from threads and asyncio
+    With HTTP/2, concurrent requests (e.g. polls of many installations) are multiplexed over a single connection
+    instead of opening one connection each
+    """
+
+    def __init__(self, http2=True, max_connections=DEFAULT_POOL_MAXSIZE, retries=DEFAULT_RETRIES, keep_alive=True):
+        """
+        Initializes the transport
+
+        :param http2 if True, HTTP/2 is used when the server supports it
+        :param max_connections maximum number of connections open at the same time
+        :param retries number of retries on connection errors
+        :param keep_alive if False, connections are closed after every request
+        """
+
+        import httpx
+
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.retries = retries
+        self.keep_alive = keep_alive
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections if keep_alive else 0)
+        self.client = None
+        self.async_client = None
+        self.lock = threading.Lock()
+
+    def create_ssl_context(self):
+        """
+        Creates an ssl context verifying certificates and accepting the api server ciphers
+        """
+
+        import certifi
+
+        ssl_context = ssl.create_default_context(cafile=certifi.where())
+        ssl_context.set_ciphers(CIPHERS)
+
+        return ssl_context
+
+    def get_or_create_client(self):
+        """
+        Creates the httpx client or retrieves the existing one
+
+        :return: an httpx client
+        """
+
+        import httpx
+
+        client = self.client
+        if client:
+            return client
+
+        with self.lock:
+            if not self.client:
+                log.debug("Creating new httpx transport")
+                self.client = httpx.Client(transport=httpx.HTTPTransport(
+                    verify=self.create_ssl_context(), http2=self.http2, limits=self.limits, retries=self.retries))
+
+            return self.client
+
+    def get_or_create_async_client(self):
+        """
+        Creates the httpx async client or retrieves the existing one, it must always be used from the same event loop
+
+        :return: an httpx async client
+        """
+
+        import httpx
+
+        if not self.async_client:
+            log.debug("Creating new httpx async transport")
+            self.async_client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(
+                verify=self.create_ssl_context(), http2=self.http2, limits=self.limits, retries=self.retries))
+
+        return self.async_client
+
+    def get(self, url, params, timeout, streaming=False):
+        """
+        Performs a GET request and parses the xml response
+        """
+
+        client = self.get_or_create_client()
+        if not streaming:
+            response = client.get(url, params=query(params), timeout=timeout)
+            received = time.time()
+            result = handle_response(response)
+
+            return result, response_size(response), time.time() - received
+
+        with client.stream("GET", url, params=query(params), timeout=timeout) as response:
+            response.raise_for_status()
+
+            return clean_response(parse_stream(response.iter_bytes(CHUNK_SIZE))), response.num_bytes_downloaded, 0
+
+    async def aget(self, url, params, timeout, streaming=False):
+        """
+        Performs a GET request without blocking the event loop
+        """
+
+        client = self.get_or_create_async_client()
+        if not streaming:
+            response = await client.get(url, params=query(params), timeout=timeout)
+            received = time.time()
+            result = handle_response(response)
+
+            return result, response_size(response), time.time() - received
+
+        async with client.stream("GET", url, params=query(params), timeout=timeout) as response:
+            response.raise_for_status()
+            parser = StreamingParser()
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                parser.feed(chunk)
+
+            return clean_response(parser.close()), response.num_bytes_downloaded, 0
+
+    def close(self):
+        """
+        Closes every connection of the client
+        """
+
+        with self.lock:
+            client, self.client = self.client, None
+
+        if client:
+            client.close()
+
+    async def aclose(self):
+        """
+        Closes every connection of the async client
+        """
+
+        client, self.async_client = self.async_client, None
+        if client:
+            await client.aclose()
+
+
+class MemoryTransport(Transport):
+    """
+    Transport answering requests in memory, without any network, for tests and benchmarks
+    e.g. `MemoryTransport(MockSecuritasServer().answer)`
+    """
+
+    def __init__(self, handler, latency=0):
+        """
+        Initializes the transport
+
+        :param handler function receiving the query parameters (as text) and returning the xml response
+        :param latency seconds added to every request
+        """
+
+        self.handler = handler
+        self.latency = latency
+        self.calls = 0
+
+    def answer(self, params, streaming):
+        """
+        Builds and parses the response of a request
+        """
+
+        self.calls += 1
+        body = self.handler(query(params))
+        body = body.encode("utf-8") if not isinstance(body, bytes) else body
+        received = time.time()
+        if streaming:
+            result = clean_response(parse_stream([body]))
+        else:
+            result = clean_response(xmltodict.parse(body))
+
+        return result, len(body), time.time() - received
+
+    def get(self, url, params, timeout, streaming=False):
+        """
+        Answers a GET request
+        """
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self.answer(params, streaming)
+
+    async def aget(self, url, params, timeout, streaming=False):
+        """
+        Answers a GET request without blocking the event loop
+        """
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        return self.answer(params, streaming)
@@ -5,20 +5,43 @@
 
 import xmltodict
 
+from pysecuritas.core.parser import parse_stream, CHUNK_SIZE
 
-def handle_response(response):
+
+def handle_response(response, streaming=False):
     """
     Raises exception if request was not successful or parses
     the xml response into a dictionary
 
     :param response http response to be validated and parsed
+    :param streaming if True, the body is parsed incrementally as it is read, skipping unnecessary fields and
+    returning images as bytes, otherwise the whole body is decoded and parsed at once
 
     :return: a parsed structured from the xml response
     """
 
     response.raise_for_status()
+    if not streaming:
+        return clean_response(xmltodict.parse(response.text))
+
+    try:
+        return clean_response(parse_stream(response.iter_content(CHUNK_SIZE)))
+    finally:
+        response.close()
+
+
+def response_size(response, streaming=False):
+    """
+    Returns the size in bytes of a response body
+
+    :param response http response already handled
+    :param streaming if True, the body was consumed as a stream and only its declared length is known
+    """
+
+    if streaming:
+        return int(response.headers.get("Content-Length") or 0)
 
-    return clean_response(xmltodict.parse(response.text))
+    return len(response.content)
 
 
 def clean_response(result):
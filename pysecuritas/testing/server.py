@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import argparse
+import base64
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape, quoteattr
+
+PATH = "/WebService/ws.do"
+ALARM_STATUS = {"ARM": "1", "ARMDAY": "P", "ARMNIGHT": "Q", "PERI": "E", "DARM": "0", "ARMANNEX": "A",
+                "DARMANNEX": "0"}
+ALARM_SIGNALS = {"ARM": "2", "ARMDAY": "31", "ARMNIGHT": "46", "PERI": "32", "DARM": "1", "ARMANNEX": "202",
+                 "DARMANNEX": "203"}
+ASYNC_ACTIONS = set(ALARM_STATUS) | {"EST", "IMG"}
+IMAGE_SIGNAL = "16"
+ACTIVITY_WINDOW = 30
+
+
+def element(tag, text=None, **attrs):
+    """
+    Builds an xml element
+    """
+
+    attributes = "".join(" %s=%s" % (k, quoteattr(str(v))) for k, v in attrs.items())
+    if text is None:
+        return "<%s%s/>" % (tag, attributes)
+
+    return "<%s%s>%s</%s>" % (tag, attributes, text, tag)
+
+
+def pet(*children):
+    """
+    Builds a response document
+    """
+
+    return '<?xml version="1.0" encoding="UTF-8"?><PET>' + "".join(children) + \
+           '<BLOQ remotefr="0">' + element("MSG", "Service available") + '</BLOQ></PET>'
+
+
+class MockSecuritasServer:
+    """
+    A local stand-in for the securitas api speaking the ws.do xml protocol
+    Latency, WAIT answers, expiration of login hashes and image sizes are configurable
+    """
+
+    def __init__(self, latency=0, waits=0, hash_ttl=None, expire_code="60022", image_size=16 * 1024, images=1,
+                 host="127.0.0.1", port=0):
+        """
+        Initializes the server
+
+        :param latency seconds added to every response
+        :param waits number of WAIT answers before the result of a two-phase request is ready
+        :param hash_ttl number of requests a login hash is valid for, never expires if None
+        :param expire_code error code answered when a hash is not valid (60022 or 60067)
+        :param image_size size in bytes of each image returned by INF
+        :param images number of images returned by INF
+        :param host address to listen on
+        :param port port to listen on, 0 picks a free one
+        """
+
+        self.latency = latency
+        self.waits = waits
+        self.hash_ttl = hash_ttl
+        self.expire_code = expire_code
+        self.image_size = image_size
+        self.images = images
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.hashes = {}
+        self.pending = {}
+        self.signals = []
+        self.status = {}
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """
+        Returns the url of the endpoint, to be used with `Session.set_base_url`
+        """
+
+        host, port = self.server.server_address[:2]
+
+        return "http://%s:%s%s" % (host, port, PATH)
+
+    def handler(self):
+        """
+        Builds the request handler bound to this server
+        """
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != PATH:
+                    self.send_error(404)
+
+                    return
+
+                params = dict((k, v[0]) for k, v in parse_qs(url.query, keep_blank_values=True).items())
+                if mock.latency:
+                    time.sleep(mock.latency)
+                body = mock.answer(params).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def answer(self, params):
+        """
+        Builds the response of a request
+
+        :param params query parameters of the request
+
+        :return: the xml document
+        """
+
+        request = params.get("request", "")
+        with self.lock:
+            self.stats[request] += 1
+            self.stats["TOTAL"] += 1
+            if request == "LOGIN":
+                login_hash = "%032x" % self.stats["LOGIN"]
+                self.hashes[login_hash] = self.hash_ttl
+
+                return pet(element("RES", "OK"), element("HASH", login_hash))
+
+            login_hash = params.get("hash")
+            if login_hash not in self.hashes or self.hashes[login_hash] == 0:
+                self.stats["EXPIRED"] += 1
+
+                return pet(element("RES", "ERROR"), element("ERR", self.expire_code),
+                           element("MSG", "Session expired"))
+
+            if self.hashes[login_hash] is not None:
+                self.hashes[login_hash] -= 1
+
+            if request == "CLS":
+                del self.hashes[login_hash]
+
+                return pet(element("RES", "OK"))
+
+            return self.answer_action(request, params)
+
+    def answer_action(self, request, params):
+        """
+        Builds the response of an api action, must be called holding the lock
+        """
+
+        numinst = params.get("numinst", "")
+        action = request[:-1]
+        if action in ASYNC_ACTIONS and request.endswith("1"):
+            self.pending[(numinst, params.get("ID"), action)] = self.waits
+
+            return pet(element("RES", "OK"), element("MSG", "Request in progress"))
+
+        if action in ASYNC_ACTIONS and request.endswith("2"):
+            key = (numinst, params.get("ID"), action)
+            if key not in self.pending:
+                return pet(element("RES", "ERROR"), element("MSG", "Unknown request"))
+
+            if self.pending[key] > 0:
+                self.pending[key] -= 1
+
+                return pet(element("RES", "WAIT"))
+
+            del self.pending[key]
+            if action == "IMG":
+                self.add_signal(numinst, IMAGE_SIGNAL, params.get("device"))
+
+                return pet(element("RES", "OK"), element("MSG", "Request processed"))
+
+            if action in ALARM_STATUS:
+                self.status[numinst] = ALARM_STATUS[action]
+                self.add_signal(numinst, ALARM_SIGNALS[action])
+
+            return pet(element("RES", "OK"), element("STATUS", self.status.get(numinst, "0")),
+                       element("MSG", "Your Alarm status"), element("NUMINST", escape(numinst)))
+
+        if request == "ACT_V2":
+            regs = [s for s in self.signals if s["numinst"] == numinst][-ACTIVITY_WINDOW:]
+
+            return pet(element("RES", "OK"), element("LIST", "".join(
+                element("REG", alias="Signal", type=s["signaltype"], device=s["device"] or "", source="Mock",
+                        idsignal=s["idsignal"], signaltype=s["signaltype"], time=s["time"], img=0)
+                for s in reversed(regs))))
+
+        if request == "SRV":
+            return pet(element("RES", "OK"), element("INSTALATION", element("NUMINST", escape(numinst)) +
+                                                     element("ALIAS", "Mock") + element("SIM", "600000000") +
+                                                     element("INSTIBS", "1000")))
+
+        if request == "MYINSTALLATION":
+            return pet(element("RES", "OK"), element("INSTALATION", element("NUMINST", escape(numinst)) +
+                                                     element("ALIAS", "Mock") + element("PANEL", "SDVFAST") +
+                                                     element("DEVICES", element("DEVICE", id="1", name="Camera"))))
+
+        if request == "INS":
+            return pet(element("RES", "OK"), element("INSTALATIONS", element(
+                "INSTALATION", element("NUMINST", escape(numinst or "1")) + element("ALIAS", "Mock"))))
+
+        if request == "INF":
+            signal = next((s for s in self.signals if str(s["idsignal"]) == params.get("idsignal")), None)
+            if signal is None:
+                return pet(element("RES", "ERROR"), element("MSG", "Unknown signal"))
+
+            images = "".join(element("IMG", base64.b64encode(os.urandom(self.image_size)).decode("ascii"),
+                                      id=i + 1, type="BINARY") for i in range(self.images))
+
+            return pet(element("RES", "OK"), element("DEVICES", element("DEVICE", images, id=signal["device"])))
+
+        return pet(element("RES", "ERROR"), element("MSG", "Unknown request " + escape(request)))
+
+    def add_signal(self, numinst, signaltype, device=None):
+        """
+        Registers a new signal on the activity log, must be called holding the lock
+        """
+
+        self.signals.append({"numinst": numinst, "idsignal": len(self.signals) + 1, "signaltype": signaltype,
+                             "device": device, "time": datetime.now().strftime("%y%m%d%H%M%S")})
+
+    def reset_stats(self):
+        """
+        Resets the request counters
+        """
+
+        with self.lock:
+            self.stats = Counter()
+
+    def start(self):
+        """
+        Starts serving on a background thread
+
+        :return: self
+        """
+
+        self.thread = threading.Thread(target=self.server.serve_forever, name="pysecuritas-mock-server")
+        self.thread.daemon = True
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stops serving
+        """
+
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def __exit__(self, *args):
+        """
+        Enable stopping the server when used on context manager
+        """
+
+        self.stop()
+
+    def __enter__(self):
+        """
+        Enable starting the server when used on context manager
+        """
+
+        return self.start()
+
+
+def main(args=None):
+    """
+    Runs the mock server until interrupted
+    """
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the securitas api")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--waits", type=int, default=0)
+    parser.add_argument("--hash-ttl", type=int, default=None)
+    parser.add_argument("--image-size", type=int, default=16 * 1024)
+    args = parser.parse_args(args)
+    server = MockSecuritasServer(args.latency, args.waits, args.hash_ttl, image_size=args.image_size, port=args.port)
+    print("Serving on " + server.url)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
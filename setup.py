@@ -23,6 +23,13 @@ requires = [
     "requests>=2.25.0"
 ]
 
+extras = {
+    "aio": ["httpx>=0.18.0"],
+    "http2": ["httpx[http2]>=0.18.0"],
+    "otel": ["opentelemetry-api>=1.0.0"],
+    "columnar": ["numpy>=1.16.0", "pyarrow>=1.0.0"]
+}
+
 test_requirements = [
     "pytest>=3",
     "requests-mock>=1.8.0"
@@ -42,8 +49,9 @@ setup(
     ]),
     package_data={"": ["LICENSE", "NOTICE"]},
     include_package_data=True,
-    python_requires=">=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*",
+    python_requires=">=3.7",
     install_requires=requires,
+    extras_require=extras,
     license=info["__license__"],
     zip_safe=False,
     tests_require=test_requirements,
@@ -53,18 +61,16 @@ setup(
         "Natural Language :: English",
         "Operating System :: OS Independent",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3 :: Only",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9"
     ],
     entry_points={
         "console_scripts": [
-            "pysecuritas = pysecuritas.cli:run_command"
+            "pysecuritas = pysecuritas.cli:run_command",
+            "pysecuritas-daemon = pysecuritas.cli.daemon:main"
         ]
     },
     project_urls={
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import unittest
+
+import httpx
+
+from pysecuritas.aio.alarm import AsyncAlarm
+from pysecuritas.aio.session import AsyncSession
+
+
+class TestAsyncAlarm(unittest.TestCase):
+    """
+    Test suite for async alarm
+    """
+
+    def test_command_parameters(self):
+        """
+        Tests all requests base action parameters
+        """
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+
+            return httpx.Response(
+                200, text='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>')
+
+        async def run(actions):
+            session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+            session.login_hash = "1"
+            session.get_transport().async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            alarm = AsyncAlarm(session, 10)
+
+            return await asyncio.gather(*[alarm.execute_command(action) for action in actions])
+
+        actions = ["ARM", "ARMDAY", "ARMNIGHT", "PERI", "DARM", "ARMANNEX", "DARMANNEX", "EST"]
+        results = asyncio.run(run(actions))
+        self.assertEqual([{"RES": "OK", "HASH": "11111111111"}] * len(actions), results)
+        requests = [c.url.params["request"] for c in calls]
+        for action in actions:
+            self.assertIn(action + "1", requests)
+            self.assertIn(action + "2", requests)
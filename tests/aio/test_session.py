@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import unittest
+
+import httpx
+import pytest
+
+from pysecuritas.aio.alarm import AsyncAlarm
+from pysecuritas.aio.session import AsyncSession
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.retry import RetryEngine, RetryPolicy, AUTH, BUSY
+from pysecuritas.core.session import ConnectionException
+from pysecuritas.core.transport import HttpxTransport, MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer, element, pet
+
+
+def mock_client(*bodies, **kwargs):
+    """
+    Creates an async client answering with the given bodies in order (the last one is repeated)
+
+    :param bodies xml bodies to be returned
+    :param calls optional list where requests are recorded
+
+    :return: the client and the list where requests are recorded
+    """
+
+    calls = kwargs.get("calls", [])
+    answered = []
+
+    def handler(request):
+        calls.append(request)
+        answered.append(request)
+
+        return httpx.Response(200, text=bodies[min(len(answered), len(bodies)) - 1])
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+class TestAsyncSession(unittest.TestCase):
+    """
+    Test suite for async session
+    """
+
+    def test_valid_connect(self):
+        """
+        Tests a valid connection attempt
+        """
+
+        session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+        session.get_transport().async_client, calls = mock_client(
+            '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>')
+        asyncio.run(session.connect())
+        self.assertTrue(session.is_connected())
+        self.assertEqual("11111111111", session.login_hash)
+        self.assertEqual("LOGIN", calls[0].url.params["request"])
+
+    def test_default_transport(self):
+        """
+        Tests that requests are sent with an httpx transport dropping empty parameters, like sync ones
+        """
+
+        session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+        self.assertIsInstance(session.get_transport(), HttpxTransport)
+        session.get_transport().async_client, calls = mock_client(
+            '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>')
+        asyncio.run(session.connect())
+        self.assertNotIn("hash", calls[0].url.params)
+
+    def test_invalid_connect_status(self):
+        """
+        Tests an invalid connection attempt with NOK result
+        """
+
+        session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+        session.get_transport().async_client, _ = mock_client('<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES></PET>')
+        with pytest.raises(ConnectionException):
+            asyncio.run(session.connect())
+
+    def test_re_login(self):
+        """
+        Tests that an expired hash triggers a new login and the request is repeated
+        """
+
+        async def run():
+            session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+            session.login_hash = "2"
+            session.get_transport().async_client, calls = mock_client(
+                '<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>60067</ERR></PET>',
+                '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES></PET>')
+            client = session.transport.async_client
+
+            async def connect():
+                session.login_hash = "11111111111"
+
+            session.connect = connect
+            payload = {"request": "REQ", "hash": "2"}
+            await session.get(payload)
+
+            return session, client, payload, calls
+
+        session, client, payload, calls = asyncio.run(run())
+        self.assertIs(client, session.transport.async_client)
+        self.assertEqual("11111111111", session.login_hash)
+        self.assertEqual("11111111111", payload["hash"])
+        self.assertEqual(["REQ", "REQ"], [c.url.params["request"] for c in calls])
+
+    def test_context_manager(self):
+        """
+        Tests login and logout when used as an async context manager
+        """
+
+        async def run():
+            session = AsyncSession("u1", "p1", "i1", "c1", "l1")
+            session.get_transport().async_client, calls = mock_client(
+                '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>')
+            client = session.transport.async_client
+            async with session:
+                pass
+
+            return session, client, calls
+
+        session, client, calls = asyncio.run(run())
+        self.assertEqual(["LOGIN", "CLS"], [c.url.params["request"] for c in calls])
+        self.assertIsNone(session.transport)
+        self.assertTrue(client.is_closed)
+
+    def test_transport(self):
+        """
+        Tests sending requests through a given transport, which is not closed with the session
+        """
+
+        pytest.importorskip("h2")
+
+        async def run(transport, url=None):
+            session = AsyncSession("u1", "p1", "i1", "es", "es", transport=transport)
+            if url:
+                session.set_base_url(url)
+            async with session:
+                status = await AsyncAlarm(session, 10, FixedPollStrategy(0.01, 0.01)).get_status()
+            self.assertIs(transport, session.transport)
+
+            return status
+
+        with MockSecuritasServer(waits=1) as server:
+            memory = MemoryTransport(server.answer)
+            self.assertEqual("0", asyncio.run(run(memory))["STATUS"])
+            self.assertEqual(5, memory.calls)
+
+            transport = HttpxTransport()
+
+            async def run_httpx():
+                try:
+                    return await run(transport, server.url)
+                finally:
+                    self.assertIsNotNone(transport.async_client)
+                    await transport.aclose()
+
+            self.assertEqual("0", asyncio.run(run_httpx())["STATUS"])
+            self.assertEqual(2, server.stats["LOGIN"])
+
+    def test_retry_engine(self):
+        """
+        Tests that a retry engine renews an expired login once for concurrent requests and sends busy commands again
+        """
+
+        busy = []
+
+        def handler(params):
+            if params["request"] == "ARM2" and not busy:
+                busy.append(params["ID"])
+
+                return pet(element("RES", "ERROR"), element("ERR", "B1"), element("MSG", "Busy"))
+
+            return server.answer(params)
+
+        async def run():
+            session = AsyncSession("u1", "p1", "i1", "es", "es", transport=MemoryTransport(handler, 0.01))
+            session.set_retry_engine(RetryEngine({BUSY: RetryPolicy(2, 0)}, {"B1": BUSY}))
+            async with session:
+                server.hashes.clear()
+                alarm = AsyncAlarm(session, 10, FixedPollStrategy(0.01, 0.01))
+                statuses = await asyncio.gather(*[alarm.get_status() for _ in range(3)])
+                armed = await alarm.activate_total_mode()
+
+            return session, statuses, armed
+
+        with MockSecuritasServer() as server:
+            session, statuses, armed = asyncio.run(run())
+
+        self.assertEqual(["0", "0", "0"], [s["STATUS"] for s in statuses])
+        self.assertEqual("1", armed["STATUS"])
+        self.assertEqual(2, server.stats["LOGIN"])
+        self.assertEqual(1, len(busy))
+        self.assertEqual({AUTH: 3, BUSY: 1}, session.retry_engine.report()["retries"])
+
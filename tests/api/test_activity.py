@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import gc
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import weakref
+
+import responses
+
+from pysecuritas.api.activity import ActivitySync, SqliteActivityStore, JsonlActivityStore, ActivityWatcher, \
+    get_watcher
+from pysecuritas.api.command import CommandContext
+from pysecuritas.api.installation import Installation
+from pysecuritas.core.session import BASE_URL, Session
+
+
+def activity_log(*regs):
+    """
+    Builds an ACT_V2 response body with the given (idsignal, signaltype, time) entries, newest first
+    """
+
+    return '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><LIST>' + "".join(
+        '<REG idsignal="%s" signaltype="%s" time="%s"/>' % reg for reg in regs) + '</LIST></PET>'
+
+
+class ActivityLog:
+    """
+    Fake installation api returning a growing activity log
+    """
+
+    def __init__(self, *regs):
+        self.regs = list(regs)
+        self.requests = 0
+        self.session = Session("u1", "p1", "i1", "c1", "l1")
+
+    def add(self, idsignal, signaltype, device=None):
+        self.regs.append({"@idsignal": str(idsignal), "@signaltype": str(signaltype)})
+        if device:
+            self.regs[-1]["@device"] = device
+
+    def request_activity_log(self, request_id=None):
+        self.requests += 1
+
+        return {"RES": "OK", "LIST": {"REG": list(reversed(self.regs))}}
+
+
+class TestActivity(unittest.TestCase):
+    """
+    Test suite for incremental activity log synchronization
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = Session("u1", "p1", "i1", "c1", "l1")
+        self.session.login_hash = "1"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_sync(self, store_factory):
+        """
+        Tests synchronizing twice and resuming from the store with a new sync
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body=activity_log(("11", "2", "201230100000"), ("10", "1", "201230090000")))
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body=activity_log(("13", "16", "201230120000"), ("12", "2", "201230110000"),
+                                        ("11", "2", "201230100000")))
+
+        store = store_factory()
+        sync = ActivitySync(Installation(self.session), store)
+        self.assertEqual(["10", "11"], [r["@idsignal"] for r in sync.sync()])
+        self.assertEqual(["12", "13"], [r["@idsignal"] for r in sync.sync()])
+        self.assertEqual([], sync.sync())
+        self.assertEqual((13, "201230120000"), store.cursor("i1"))
+        self.assertEqual(["11", "12"], [r["@idsignal"] for r in store.query("i1", since="201230100000",
+                                                                            signaltype=2)])
+        self.assertEqual([], store.query("i2"))
+
+        resumed = ActivitySync(Installation(self.session, typed=True), store_factory())
+        self.assertEqual(13, resumed.last_id)
+        self.assertEqual([], resumed.sync())
+
+    @responses.activate
+    def test_sqlite_store(self):
+        """
+        Tests synchronization with a sqlite store
+        """
+
+        path = os.path.join(self.directory, "activity.db")
+        self.assert_sync(lambda: SqliteActivityStore(path))
+
+    @responses.activate
+    def test_jsonl_store(self):
+        """
+        Tests synchronization with a json lines store
+        """
+
+        path = os.path.join(self.directory, "activity.jsonl")
+        self.assert_sync(lambda: JsonlActivityStore(path))
+
+    @responses.activate
+    def test_typed_sync_without_store(self):
+        """
+        Tests synchronization returning models and keeping the cursor in memory
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200, body=activity_log(("5", "16", "201230100000")))
+        sync = ActivitySync(Installation(self.session, typed=True))
+        entries = sync.sync()
+        self.assertEqual([(5, 16)], [(e.idsignal, e.signaltype) for e in entries])
+        self.assertEqual([], sync.sync())
+
+    def test_watcher_concurrent_waiters(self):
+        """
+        Tests that concurrent waiters share one poll stream and each one gets its own signal
+        """
+
+        activity_log = ActivityLog({"@idsignal": "1", "@signaltype": "16"})
+        watcher = ActivityWatcher(activity_log, 0.01)
+        mark = watcher.mark()
+        self.assertEqual(1, mark)
+        first = watcher.wait_for(16, mark, "r1")
+        second = watcher.wait_for(16, mark, "r2")
+        received = []
+        third = watcher.wait_for(2, mark, callback=received.append)
+        activity_log.add(2, 1)
+        activity_log.add(3, 16)
+        self.assertEqual("3", first.result(1)["@idsignal"])
+        self.assertFalse(second.done())
+        activity_log.add(4, 2)
+        activity_log.add(5, 16)
+        self.assertEqual("5", second.result(1)["@idsignal"])
+        self.assertEqual("4", third.result(1)["@idsignal"])
+        self.assertEqual([third.result()], received)
+        polls = activity_log.requests
+        watcher.thread.join(1)
+        self.assertIsNone(watcher.thread)
+        self.assertLessEqual(activity_log.requests, polls + 1)
+
+    def test_watcher_devices(self):
+        """
+        Tests that waiters of a device get the signal of that device, whatever the order signals arrive in
+        """
+
+        activity_log = ActivityLog()
+        watcher = ActivityWatcher(activity_log, 0.01)
+        mark = watcher.mark()
+        first = watcher.wait_for(16, mark, device="s1")
+        second = watcher.wait_for(16, mark, device="s2")
+        activity_log.add(1, 16, "s2")
+        self.assertEqual("1", second.result(1)["@idsignal"])
+        self.assertFalse(first.done())
+        activity_log.add(2, 16)
+        self.assertEqual("2", first.result(1)["@idsignal"])
+
+    def test_watcher_newest_entry(self):
+        """
+        Tests that without a mark the newest entry is accepted and cancelled waiters stop the polling
+        """
+
+        activity_log = ActivityLog({"@idsignal": "7", "@signaltype": "16"})
+        watcher = ActivityWatcher(activity_log, 0.01)
+        self.assertEqual("7", watcher.wait_for("16").result(1)["@idsignal"])
+        waiting = watcher.wait_for("16")
+        self.assertFalse(waiting.done())
+        waiting.cancel()
+        time.sleep(0.05)
+        self.assertIsNone(watcher.thread)
+
+    def test_shared_watcher(self):
+        """
+        Tests that api objects of the same session and installation share a watcher
+        """
+
+        self.assertIs(get_watcher(Installation(self.session)), get_watcher(Installation(self.session)))
+        self.assertIs(get_watcher(Installation(self.session.for_installation("i1"))),
+                      get_watcher(Installation(self.session)))
+        self.assertIsNot(get_watcher(Installation(self.session.for_installation("i2"))),
+                         get_watcher(Installation(self.session)))
+
+    def test_watcher_released(self):
+        """
+        Tests that a watcher does not keep its session alive
+        """
+
+        session = Session("u1", "p1", "i1", "es", "es")
+        get_watcher(Installation(session.for_installation("i2")))
+        reference = weakref.ref(session)
+        del session
+        gc.collect()
+        self.assertIsNone(reference())
+
+    def test_watcher_unbound(self):
+        """
+        Tests that a watcher created by a bound command does not keep its deadline or cancellation
+        """
+
+        context = CommandContext(deadline=0)
+        context.cancel()
+        watcher = get_watcher(Installation(self.session.for_installation("i3")).bind(context))
+        self.assertIsNone(watcher.installation.context)
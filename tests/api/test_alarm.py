@@ -8,6 +8,8 @@ import unittest
 import responses
 
 from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.models import AlarmStatus
+from pysecuritas.core.poll import FixedPollStrategy
 from pysecuritas.core.session import Session, BASE_URL
 
 
@@ -52,3 +54,21 @@ class TestAlarm(unittest.TestCase):
         assert_command("ARMANNEX")
         assert_command("DARMANNEX")
         assert_command("EST")
+
+    @responses.activate
+    def test_typed_status(self):
+        """
+        Tests getting the alarm status as a model
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><STATUS>0</STATUS><MSG>off</MSG></PET>'
+        )
+
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "1"
+        alarm = Alarm(session, 10, FixedPollStrategy(0), typed=True)
+        self.assertEqual(AlarmStatus("OK", "0", "off", None), alarm.get_status())
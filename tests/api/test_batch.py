@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import logging
+import threading
+import time
+import unittest
+
+import pytest
+import responses
+
+from pysecuritas.api.batch import BatchExecutor, BatchJob, Credentials, execute_command
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import BASE_URL, Session
+from pysecuritas.core.transport import MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Test suite for batch executor
+    """
+
+    @responses.activate
+    def test_run(self):
+        """
+        Tests running jobs of several accounts sharing one login per account with a concurrency cap
+        """
+
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        requests = []
+
+        def callback(request):
+            with lock:
+                requests.append(request.params)
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>'
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        accounts = [Credentials("u1", "p1", "es", "es"), Credentials("u2", "p2", "es", "es")]
+        jobs = [BatchJob(accounts[i % 2], str(i), "EST") for i in range(10)]
+        with BatchExecutor(max_workers=8, account_workers=2, poll_strategy=FixedPollStrategy(0)) as executor:
+            results = list(executor.run(jobs))
+
+        self.assertEqual(10, len(results))
+        self.assertTrue(all(r.error is None for r in results))
+        self.assertEqual(sorted(jobs), sorted(r.job for r in results))
+        self.assertLessEqual(state["peak"], 4)
+        logins = [r for r in requests if r["request"] == "LOGIN"]
+        self.assertEqual(["u1", "u2"], sorted(r["user"] for r in logins))
+        self.assertEqual(set(str(i) for i in range(10)),
+                         set(r["numinst"] for r in requests if r["request"] == "EST1"))
+        self.assertEqual(2, len([r for r in requests if r["request"] == "CLS"]))
+
+    @responses.activate
+    def test_run_error(self):
+        """
+        Tests that a failing job is reported without stopping the others
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>')
+        account = Credentials("u1", "p1", "es", "es")
+        executor = BatchExecutor(poll_strategy=FixedPollStrategy(0))
+        results = list(executor.run([BatchJob(account, "1", "EST"), BatchJob(account, "2", "UNKNOWN")]))
+        errors = dict((r.job.installation, r.error) for r in results)
+        self.assertIsNone(errors["1"])
+        self.assertIsInstance(errors["2"], ValueError)
+
+    def test_run_early_break(self):
+        """
+        Tests that jobs not started yet are dropped when the caller stops reading results
+        """
+
+        errors = []
+        handler = logging.Handler()
+        handler.emit = errors.append
+        logging.getLogger("concurrent.futures").addHandler(handler)
+        account = Credentials("u1", "p1", "es", "es")
+        try:
+            with MockSecuritasServer() as server:
+                executor = BatchExecutor(2, 2, poll_strategy=FixedPollStrategy(0.01, 0.01),
+                                         transport=MemoryTransport(server.answer, 0.05))
+                for result in executor.run([BatchJob(account, str(i), "EST") for i in range(20)]):
+                    self.assertIsNone(result.error)
+                    break
+                executor.close()
+        finally:
+            logging.getLogger("concurrent.futures").removeHandler(handler)
+
+        self.assertEqual([], errors)
+        self.assertLess(server.stats["EST1"], 5)
+
+    def test_execute_unknown_command(self):
+        """
+        Tests executing an unknown command
+        """
+
+        with pytest.raises(ValueError):
+            execute_command(Session("u1", "p1", "i1", "c1", "l1"), "UNKNOWN")
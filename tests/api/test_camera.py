@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import base64
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import responses
+
+from pysecuritas.api.activity import get_watcher
+from pysecuritas.api.camera import Camera, DirectorySink, MemorySink, CallableSink, StreamSink, decode_chunks, \
+    to_result
+from pysecuritas.api.models import Snapshot
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import BASE_URL, Session
+from pysecuritas.testing.server import MockSecuritasServer
+
+IMAGES = {"s1": b"\xff\xd8first" * 1000, "s2": b"\xff\xd8second" * 1000}
+
+
+class TestCamera(unittest.TestCase):
+    """
+    Test suite for camera
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_decode_chunks(self):
+        """
+        Tests decoding base64 in chunks, with and without line breaks
+        """
+
+        data = os.urandom(1000)
+        encoded = base64.b64encode(data)
+        self.assertEqual(data, b"".join(decode_chunks(encoded, 8)))
+        self.assertEqual(data, b"".join(decode_chunks(base64.encodebytes(data).decode("ascii"), 12)))
+
+    def test_directory_sink(self):
+        """
+        Tests that images with the same name are never overwritten
+        """
+
+        sink = DirectorySink(self.directory)
+        names = [sink.write("s1", 1, [b"a", b"b"]) for _ in range(3)]
+        self.assertEqual(3, len(set(names)))
+        for name in names:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                self.assertEqual(b"ab", f.read())
+
+    def test_memory_sinks(self):
+        """
+        Tests keeping images in memory, handing them to a function and writing them to a stream
+        """
+
+        image = MemorySink().write("s1", 1, iter([b"ab", b"cd"]))
+        self.assertIsInstance(image, memoryview)
+        self.assertEqual(b"abcd", image.tobytes())
+
+        received = []
+        sink = CallableSink(lambda sensor, index, data: received.append((sensor, index, bytes(data))) or len(data))
+        self.assertEqual(4, sink.write("s1", 2, [b"ab", b"cd"]))
+        self.assertEqual([("s1", 2, b"abcd")], received)
+
+        stream = io.BytesIO()
+        sink = StreamSink(stream)
+        self.assertEqual(3, sink.write("s1", 1, [b"ab", b"c"]))
+        self.assertEqual(2, sink.write("s2", 1, [b"de"]))
+        self.assertEqual(b"abcde", stream.getvalue())
+
+        snapshots = [Snapshot("s1", 1, data=image)]
+        self.assertEqual({"RES": "OK", "MSG": "Images captured.", "IMAGES": {"IMG1": image}},
+                         to_result(snapshots, MemorySink()))
+        self.assertEqual({"RES": "OK", "MSG": "Images written to disk.", "FILES": {"IMG1": "a.jpg"}},
+                         to_result([Snapshot("s1", 1, "a.jpg")], None))
+
+    @responses.activate
+    def test_capture_sensors(self):
+        """
+        Tests capturing images from many sensors at the same time
+        """
+
+        lock = threading.Lock()
+        signals = []
+        devices = {}
+
+        def callback(request):
+            params = request.params
+            action = params["request"]
+            body = '<RES>OK</RES>'
+            with lock:
+                if action == "SRV":
+                    body += '<INSTALATION><INSTIBS>99</INSTIBS></INSTALATION>'
+                elif action == "IMG2":
+                    signals.append(str(len(signals) + 1))
+                    devices[signals[-1]] = params["device"]
+                elif action == "ACT_V2":
+                    body += '<LIST>' + ''.join('<REG idsignal="%s" signaltype="16"/>' % i
+                                               for i in reversed(signals)) + '</LIST>'
+                elif action == "INF":
+                    device = devices[params["idsignal"]]
+                    body += '<DEVICES><DEVICE id="%s"><IMG>%s</IMG></DEVICE></DEVICES>' % (
+                        device, base64.b64encode(IMAGES[device]).decode("ascii"))
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET>' + body + '</PET>'
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "1"
+        camera = Camera(session, 10, FixedPollStrategy(0), typed=True)
+        results = camera.capture_sensors(["s1", "s2"], DirectorySink(self.directory))
+        self.assertEqual(["s1", "s2"], sorted(results))
+        for sensor, snapshots in results.items():
+            self.assertEqual([(sensor, 1)], [(s.sensor, s.index) for s in snapshots])
+            with open(os.path.join(self.directory, snapshots[0].filename), "rb") as f:
+                self.assertEqual(IMAGES[sensor], f.read())
+
+        self.assertEqual(1, len([c for c in responses.calls if c.request.params["request"] == "SRV"]))
+
+    def test_capture_sensors_mock_server(self):
+        """
+        Tests that concurrent captures within the same second get their own request and signal
+        """
+
+        with MockSecuritasServer(waits=1, image_size=64) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                camera = Camera(session, 10, FixedPollStrategy(0.01, 0.01), typed=True)
+                camera.get_instibs()
+                get_watcher(camera).interval = 0.01
+                sensors = ["s1", "s2", "s3", "s4"]
+                results = camera.capture_sensors(sensors, MemorySink())
+
+        self.assertEqual(sensors, sorted(results))
+        for sensor, snapshots in results.items():
+            self.assertEqual([sensor], [s.sensor for s in snapshots])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import pytest
+
+from pysecuritas.api.activity import JsonlActivityStore
+from pysecuritas.api.columnar import ActivityColumns, MISSING
+from pysecuritas.api.models import ActivityEntry
+
+REGS = [
+    {"@idsignal": "12", "@signaltype": "13", "@time": "210101120000", "@type": "1", "@device": "QR",
+     "@source": "Web", "@img": "0"},
+    {"@idsignal": "11", "@signaltype": "2", "@time": "201231235959", "@alias": "Home"},
+    {"@idsignal": "none", "@signaltype": "13"},
+]
+
+
+class TestColumnar(unittest.TestCase):
+    """
+    Test suite for columnar activity logs
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_columns(self):
+        """
+        Tests building columns from parsed and typed results
+        """
+
+        columns = ActivityColumns.from_results([("i1", {"RES": "OK", "LIST": {"REG": REGS}}),
+                                                ("i2", [ActivityEntry.from_reg(REGS[0])]),
+                                                ("i3", {"RES": "OK", "LIST": None})])
+        self.assertEqual(4, len(columns))
+        self.assertEqual([12, 11, MISSING, 12], list(columns.column("idsignal")))
+        self.assertEqual(["13", "2"], columns.categories("signaltype"))
+        self.assertEqual([0, 1, 0, 0], list(columns.column("signaltype").codes))
+        self.assertEqual(["i1", "i2"], columns.categories("numinst"))
+        self.assertEqual({"numinst": "i1", "idsignal": 12, "time": datetime(2021, 1, 1, 12), "signaltype": "13",
+                          "type": 1, "alias": None, "device": "QR", "source": "Web", "img": 0}, columns.row(0))
+        self.assertEqual(columns.row(0), dict(columns.row(3), numinst="i1"))
+        self.assertIsNone(columns.row(2)["time"])
+        self.assertIsNone(columns.row(2)["idsignal"])
+        self.assertIsNone(columns.row(2)["img"])
+        columns.append("i1", {"@img": "200"})
+        columns.append("i1", {"@img": "300"})
+        self.assertEqual([0, 200, None], [columns.row(i)["img"] for i in (0, 4, 5)])
+
+    def test_save_and_load(self):
+        """
+        Tests memory-mapping saved columns
+        """
+
+        store = JsonlActivityStore(os.path.join(self.directory, "activity.jsonl"))
+        store.append("i1", list(reversed(REGS)))
+        columns = ActivityColumns.from_store(store, ["i1", "i2"])
+        path = os.path.join(self.directory, "activity.col")
+        columns.save(path)
+
+        with ActivityColumns.load(path) as loaded:
+            self.assertEqual(len(columns), len(loaded))
+            self.assertEqual([columns.row(i) for i in range(len(columns))],
+                             [loaded.row(i) for i in range(len(loaded))])
+            self.assertIsInstance(loaded.column("time"), memoryview)
+            with pytest.raises(ValueError):
+                loaded.append("i1", REGS[0])
+
+            copy = os.path.join(self.directory, "copy.col")
+            loaded.save(copy)
+        with open(path, "rb") as f, open(copy, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+        with open(copy, "wb") as f:
+            f.write(b"not columns")
+        with pytest.raises(ValueError):
+            ActivityColumns.load(copy)
+
+    def test_numpy(self):
+        """
+        Tests converting columns to numpy arrays
+        """
+
+        numpy = pytest.importorskip("numpy")
+        arrays = ActivityColumns.from_results({"i1": {"LIST": {"REG": REGS}}}).to_numpy()
+        self.assertEqual(numpy.datetime64("2021-01-01T12:00:00"), arrays["time"][0])
+        self.assertTrue(numpy.isnat(arrays["time"][2]))
+        self.assertEqual([0, 1, 0], arrays["signaltype"].tolist())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import time
+import unittest
+
+import pytest
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.command import CommandContext, CommandTimeout, CommandCancelled
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import Session
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestCommand(unittest.TestCase):
+    """
+    Test suite for command handles
+    """
+
+    def test_progress(self):
+        """
+        Tests that a submitted command reports every WAIT answer and returns its result
+        """
+
+        progress = []
+        with MockSecuritasServer(waits=3) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                alarm = Alarm(session, 10, FixedPollStrategy(0.01, 0.01))
+                handle = alarm.submit("ARM", deadline=5, on_progress=lambda *args: progress.append(args))
+                self.assertEqual("1", handle.result(5)["STATUS"])
+                self.assertTrue(handle.done())
+                self.assertIsNone(alarm.context)
+
+        self.assertEqual([("ARM", 1), ("ARM", 2), ("ARM", 3)], [p[:2] for p in progress])
+
+    def test_deadline(self):
+        """
+        Tests that a command raises once its deadline passes instead of returning nothing
+        """
+
+        with MockSecuritasServer(waits=1000) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                started = time.time()
+                handle = Alarm(session, 60, FixedPollStrategy(0.05, 0.05)).submit("EST", deadline=0.3)
+                with pytest.raises(CommandTimeout):
+                    handle.result(5)
+
+                self.assertLess(time.time() - started, 2)
+
+    def test_cancel(self):
+        """
+        Tests that cancelling a command wakes it up and frees its worker
+        """
+
+        with MockSecuritasServer(waits=1000) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                handle = Alarm(session, 60, FixedPollStrategy(10, 10)).submit("DARM")
+                time.sleep(0.2)
+                started = time.time()
+                self.assertTrue(handle.cancel())
+                with pytest.raises(CommandCancelled):
+                    handle.result(5)
+
+                self.assertTrue(handle.cancelled())
+                self.assertLess(time.time() - started, 1)
+                self.assertFalse(handle.cancel())
+                self.assertEqual(0, server.stats["DARM2"])
+
+    def test_context(self):
+        """
+        Tests deadline and cancellation of a context
+        """
+
+        context = CommandContext(deadline=10)
+        self.assertLessEqual(context.remaining(1), 1)
+        self.assertGreater(context.remaining(), 9)
+        self.assertEqual(5, CommandContext().remaining(5))
+        cancelled = []
+        context.on_cancel(lambda: cancelled.append(1))
+        context.cancel()
+        context.on_cancel(lambda: cancelled.append(2))
+        self.assertEqual([1, 2], cancelled)
+        with pytest.raises(CommandCancelled):
+            context.check()
+
+        with pytest.raises(CommandTimeout):
+            CommandContext(deadline=0).wait(1)
@@ -10,6 +10,8 @@ import requests
 import responses
 
 from pysecuritas.api.installation import handle_result, RequestException, Installation
+from pysecuritas.core.cache import ResultCache
+from pysecuritas.core.poll import LearnedPollStrategy
 from pysecuritas.core.session import BASE_URL, Session
 from pysecuritas.core.utils import handle_response
 
@@ -82,6 +84,9 @@ class TestInstallation(unittest.TestCase):
         alarm = Installation(session, 1)
         self.assertEqual({"RES": "OK", "HASH": "11111111111"}, alarm.get_inf())
         self.assertGreaterEqual(len(responses.calls), 1)
+        inf = responses.calls[-1].request.params
+        self.assertEqual("INF", inf["request"])
+        self.assertEqual(responses.calls[0].request.params["ID"], inf["ID"])
 
     @responses.activate
     def test_async_valid_request(self):
@@ -102,6 +107,27 @@ class TestInstallation(unittest.TestCase):
         self.assertEqual({"RES": "OK", "HASH": "11111111111"}, alarm.async_request("DUMMY"))
         self.assertGreaterEqual(len(responses.calls), 2)
 
+    @responses.activate
+    def test_async_request_poll_strategy(self):
+        """
+        Tests that the poll strategy drives the poll loop and learns from completed requests
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES></PET>')
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>WAIT</RES></PET>')
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><STATUS>0</STATUS></PET>')
+
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "1"
+        strategy = LearnedPollStrategy(initial=0, interval=0, maximum=0)
+        installation = Installation(session, 5, strategy)
+        self.assertEqual({"RES": "OK", "STATUS": "0"}, installation.async_request("EST"))
+        self.assertEqual(3, len(responses.calls))
+        self.assertIsNotNone(strategy.expected_latency("EST"))
+
     @responses.activate
     def test_handle_result(self):
         """
@@ -179,3 +205,36 @@ class TestInstallation(unittest.TestCase):
         session.login_hash = "1"
         installation = Installation(session, 10)
         self.assertEqual("alias", installation.get_alias())
+
+    @responses.activate
+    def test_cached_requests(self):
+        """
+        Tests that read-only results are kept on a cache shared by sessions until invalidated
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><INSTALATION><ALIAS>alias</ALIAS></INSTALATION></PET>'
+        )
+
+        cache = ResultCache()
+        session = Session("u1", "p1", "i1", "c1", "l1").set_cache(cache)
+        session.login_hash = "1"
+        installation = Installation(session, 10)
+        self.assertEqual("alias", installation.get_alias())
+        self.assertEqual("alias", Installation(session, 10, typed=True).get_sim_and_instibs().alias)
+        other = Session("u1", "p1", "i1", "c1", "l1").set_cache(cache)
+        other.login_hash = "1"
+        self.assertEqual("alias", Installation(other, 10).get_alias())
+        self.assertEqual(1, len(responses.calls))
+
+        Installation(session.for_installation("i2"), 10).get_alias()
+        self.assertEqual(2, len(responses.calls))
+
+        installation.invalidate_cache()
+        installation.get_alias()
+        Installation(session.for_installation("i2"), 10).get_alias()
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(["SRV"] * 3, [c.request.params["request"] for c in responses.calls])
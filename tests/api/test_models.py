@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import unittest
+from datetime import datetime
+
+import responses
+import xmltodict
+
+from pysecuritas.api.installation import Installation
+from pysecuritas.api.models import ActivityEntry, AlarmStatus, InstallationInfo, SimInfo
+from pysecuritas.core.session import BASE_URL, Session
+from pysecuritas.core.utils import clean_response
+
+
+def parse(body):
+    """
+    Parses a response body as the session does
+    """
+
+    return clean_response(xmltodict.parse(body))
+
+
+class TestModels(unittest.TestCase):
+    """
+    Test suite for response models
+    """
+
+    def test_alarm_status(self):
+        """
+        Tests building an alarm status
+        """
+
+        status = AlarmStatus.from_result(parse(
+            '<PET><RES>OK</RES><STATUS>0</STATUS><MSG>Your Alarm is deactivated</MSG><NUMINST>12345</NUMINST></PET>'))
+        self.assertEqual(AlarmStatus("OK", "0", "Your Alarm is deactivated", "12345"), status)
+        self.assertFalse(hasattr(status, "__dict__"))
+
+    def test_activity_entries(self):
+        """
+        Tests building activity log entries, with one or many REG elements
+        """
+
+        entries = ActivityEntry.from_result(parse(
+            '<PET><RES>OK</RES><LIST><REG alias="Disarmed" type="2" device="" source="User" idsignal="123" '
+            'signaltype="2" time="201230095720" img="0"/><REG idsignal="124" signaltype="16" time="bad"/>'
+            '</LIST></PET>'))
+        self.assertEqual(2, len(entries))
+        self.assertEqual(ActivityEntry(123, 2, datetime(2020, 12, 30, 9, 57, 20), 2, "Disarmed", "", "User", 0),
+                         entries[0])
+        self.assertEqual((124, 16, None), (entries[1].idsignal, entries[1].signaltype, entries[1].time))
+        self.assertEqual(1, len(ActivityEntry.from_result(parse('<PET><LIST><REG idsignal="1"/></LIST></PET>'))))
+        self.assertEqual([], ActivityEntry.from_result(parse('<PET><RES>OK</RES></PET>')))
+
+    def test_installation_info(self):
+        """
+        Tests building installation and sim information
+        """
+
+        result = parse('<PET><RES>OK</RES><INSTALATION><NUMINST>1</NUMINST><ALIAS>home</ALIAS><SIM>600</SIM>'
+                       '<INSTIBS>99</INSTIBS><DEVICES><DEVICE id="1" name="door"/></DEVICES></INSTALATION></PET>')
+        self.assertEqual(SimInfo("1", "home", "600", "99"), SimInfo.from_result(result))
+        info = InstallationInfo.from_result(result)
+        self.assertEqual(("1", "home"), (info.numinst, info.alias))
+        self.assertEqual("door", info.devices[0]["@name"])
+        installations = InstallationInfo.list_from_result(parse(
+            '<PET><RES>OK</RES><INSTALATIONS><INSTALATION><NUMINST>1</NUMINST></INSTALATION>'
+            '<INSTALATION><NUMINST>2</NUMINST></INSTALATION></INSTALATIONS></PET>'))
+        self.assertEqual(["1", "2"], [i.numinst for i in installations])
+
+    @responses.activate
+    def test_typed_installation(self):
+        """
+        Tests getting typed results from an installation
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<PET><RES>OK</RES><LIST><REG idsignal="1" signaltype="16"/></LIST>'
+                 '<INSTALATION><ALIAS>alias</ALIAS></INSTALATION></PET>'
+        )
+
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "1"
+        installation = Installation(session, 10, typed=True)
+        self.assertEqual([16], [e.signaltype for e in installation.get_activity_log()])
+        self.assertEqual("alias", installation.get_sim_and_instibs().alias)
+        self.assertEqual("alias", installation.get_alias())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import wait
+
+import pytest
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.installation import RequestException
+from pysecuritas.api.pipeline import Pipeline
+from pysecuritas.core.metrics import SessionHook
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.retry import RetryEngine, RetryPolicy, BUSY
+from pysecuritas.core.session import Session
+from pysecuritas.core.transport import MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    Test suite for pipelined commands
+    """
+
+    def test_overlapping_commands(self):
+        """
+        Tests that commands of many installations run at the same time, disarming first
+        """
+
+        requests = []
+
+        class Recorder(SessionHook):
+            def before_request(self, payload):
+                requests.append(payload["request"])
+
+        with MockSecuritasServer(latency=0.02, waits=4) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                session.add_hook(Recorder())
+                with Pipeline() as pipeline:
+                    started = time.time()
+                    first = pipeline.submit(Alarm(session, 10, FixedPollStrategy(0.1, 0.1)), "EST")
+                    futures = [pipeline.submit(Alarm(session.for_installation("n%s" % i), 10,
+                                                     FixedPollStrategy(0.1, 0.1)), "ARM" if i % 2 else "DARM")
+                               for i in range(8)]
+                    results = [f.result(10) for f in futures]
+                    elapsed = time.time() - started
+                    self.assertEqual("0", first.result(10)["STATUS"])
+
+        self.assertEqual(["0", "1"] * 4, [r["STATUS"] for r in results])
+        self.assertEqual(["DARM1"] * 4 + ["ARM1"] * 4, [r for r in requests if r in ("ARM1", "DARM1")])
+        self.assertEqual((4, 20), (server.stats["ARM1"], server.stats["ARM2"]))
+        # one after the other, each command would take at least 0.5 seconds
+        self.assertLess(elapsed, 2.5)
+        self.assertIsNone(pipeline.thread)
+
+    def test_timeout_and_cancel(self):
+        """
+        Tests commands that never complete
+        """
+
+        with MockSecuritasServer(waits=1000) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                pipeline = Pipeline()
+                expired = pipeline.submit(Alarm(session, 0.2, FixedPollStrategy(0.05, 0.05)), "EST")
+                cancelled = pipeline.submit(Alarm(session, 60, FixedPollStrategy(0.05, 0.05)), "ARM")
+                self.assertIsNone(expired.result(5))
+                self.assertTrue(cancelled.cancel())
+                wait([cancelled], 5)
+                time.sleep(0.2)
+
+        self.assertIsNone(pipeline.thread)
+        self.assertLess(server.stats["ARM2"], 10)
+
+    def test_error(self):
+        """
+        Tests that a failed request fails its command only
+        """
+
+        with MockSecuritasServer() as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                with Pipeline() as pipeline:
+                    failed = pipeline.submit(Alarm(session, 10, FixedPollStrategy(0.01, 0.01)), "UNKNOWN")
+                    ok = pipeline.submit(Alarm(session, 10, FixedPollStrategy(0.01, 0.01)), "EST")
+                    with pytest.raises(RequestException):
+                        failed.result(5)
+
+                    self.assertEqual("OK", ok.result(5)["RES"])
+
+    def test_concurrent_rounds(self):
+        """
+        Tests that the requests of a round are sent at the same time and that busy panels are retried by the retry
+        engine of the session
+        """
+
+        lock = threading.Lock()
+        busy = []
+
+        with MockSecuritasServer(waits=1) as server:
+            def answer(params):
+                with lock:
+                    if params["request"] == "ARM2" and params["numinst"] == "busy" and not busy:
+                        busy.append(params["ID"])
+
+                        return '<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>B1</ERR>' \
+                               '<MSG>Panel busy</MSG></PET>'
+
+                return server.answer(params)
+
+            session = Session("u1", "p1", "i1", "es", "es", transport=MemoryTransport(answer, 0.1))
+            session.set_retry_engine(RetryEngine({BUSY: RetryPolicy(2, 0)}, {"B1": BUSY}))
+            with session:
+                with Pipeline() as pipeline:
+                    started = time.time()
+                    futures = [pipeline.submit(Alarm(session.for_installation(str(i)), 10,
+                                                     FixedPollStrategy(0.01, 0.01)), "ARM") for i in range(15)]
+                    retried = pipeline.submit(Alarm(session.for_installation("busy"), 10,
+                                                    FixedPollStrategy(0.01, 0.01)), "ARM")
+                    results = [f.result(10) for f in futures]
+                    elapsed = time.time() - started
+                    self.assertEqual("1", retried.result(10)["STATUS"])
+
+        self.assertEqual(["1"] * 15, [r["STATUS"] for r in results])
+        self.assertEqual(1, len(busy))
+        self.assertEqual(17, server.stats["ARM1"])
+        self.assertEqual({BUSY: 1}, session.retry_engine.report()["retries"])
+        # one request after the other, the commands would take more than 4 seconds
+        self.assertLess(elapsed, 1.5)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import gc
+import threading
+import time
+import unittest
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.status import StatusWatcher
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import Session
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestStatusWatcher(unittest.TestCase):
+    """
+    Test suite for status watcher
+    """
+
+    def test_poll(self):
+        """
+        Tests that the status is requested only after arming or disarming signals and changes are deduplicated
+        """
+
+        strategy = FixedPollStrategy(0.01, 0.01)
+        with MockSecuritasServer() as server:
+            with Session("u1", "p1", None, "es", "es").set_base_url(server.url) as session:
+                received = []
+                watcher = StatusWatcher(poll_strategy=strategy).subscribe(received.append)
+                watcher.watch(session.for_installation("1")).watch(session.for_installation("2"))
+                initial = sorted(watcher.poll())
+                self.assertEqual([("1", None, "0"), ("2", None, "0")], [c[:3] for c in initial])
+                self.assertEqual([], watcher.poll())
+                self.assertEqual(2, server.stats["EST1"])
+
+                alarm = Alarm(session.for_installation("1"), 10, strategy)
+                alarm.activate_total_mode()
+                alarm.disconnect()
+                alarm.activate_day_mode()
+                changes = watcher.poll()
+                self.assertEqual([("1", "0", "P")], [c[:3] for c in changes])
+                self.assertEqual("31", changes[0].signal["@signaltype"])
+                self.assertEqual(3, server.stats["EST1"])
+
+                alarm.activate_day_mode()
+                self.assertEqual([], watcher.poll())
+                self.assertEqual(4, server.stats["EST1"])
+                self.assertEqual(3, len(received))
+
+    def test_iterators(self):
+        """
+        Tests receiving changes through a generator and an async iterator
+        """
+
+        strategy = FixedPollStrategy(0.01, 0.01)
+        with MockSecuritasServer() as server:
+            with Session("u1", "p1", "1", "es", "es").set_base_url(server.url) as session:
+                watcher = StatusWatcher(0.05, poll_strategy=strategy).watch(session)
+
+                async def consume():
+                    async for change in watcher:
+                        if change.status == "1":
+                            return change
+
+                async_result = []
+                thread = threading.Thread(target=lambda: async_result.append(asyncio.run(consume())))
+                thread.start()
+                changes = watcher.changes(timeout=5)
+                while len(watcher.subscribers) < 2:
+                    time.sleep(0.01)
+
+                with watcher:
+                    self.assertEqual("0", next(changes).status)
+                    Alarm(session, 10, strategy).activate_total_mode()
+                    self.assertEqual("1", next(changes).status)
+                    thread.join(5)
+
+                self.assertEqual([], list(changes))
+                self.assertEqual(("0", "1"), async_result[0][1:3])
+
+    def test_unused_generator(self):
+        """
+        Tests that a generator never iterated stops receiving changes once dropped
+        """
+
+        watcher = StatusWatcher()
+        changes = watcher.changes()
+        self.assertEqual(1, len(watcher.subscribers))
+        del changes
+        gc.collect()
+        self.assertEqual([], watcher.subscribers)
@@ -3,7 +3,17 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from contextlib import redirect_stdout
+
+import pytest
 
 import responses
 
@@ -31,6 +41,30 @@ class TestCLICommand(unittest.TestCase):
         self.assertEqual("l1", cli_command.args.language)
         self.assertEqual("s1", cli_command.args.sensor)
         self.assertEqual("command1", cli_command.args.command)
+        self.assertIsNone(cli_command.args.token_store)
+        self.assertFalse(cli_command.args.keep_login)
+
+    def test_login_arguments(self):
+        """
+        Tests parsing of login reuse arguments
+        """
+
+        cli_command = CLICommand()
+        cli_command.parse(["-u", "u1", "-p", "p1", "-c", "c1", "-l", "l1", "-t", "tokens.json", "-k", "EST"])
+        self.assertEqual("tokens.json", cli_command.args.token_store)
+        self.assertTrue(cli_command.args.keep_login)
+
+    def test_slim_startup(self):
+        """
+        Tests that parsing arguments does not import the http stack
+        """
+
+        script = ("import sys\n"
+                  "from pysecuritas.cli.cli_command import CLICommand\n"
+                  "CLICommand().parse(['-u', 'u1', '-p', 'p1', '-c', 'c1', '-l', 'l1', 'EST'])\n"
+                  "print(','.join(m for m in ('requests', 'urllib3', 'xmltodict') if m in sys.modules))")
+        output = subprocess.check_output([sys.executable, "-c", script])
+        self.assertEqual(b"", output.strip())
 
     @responses.activate
     def test_run_alarm_command(self):
@@ -74,3 +108,124 @@ class TestCLICommand(unittest.TestCase):
         self.assertEqual({"RES": "OK", "HASH": "11111111111"}, cli_command.result)
         self.assertEqual(len(responses.calls), 3)
         self.assertTrue("ACT_V2" in responses.calls[1].request.params["request"])
+
+    @responses.activate
+    def test_run_batch(self):
+        """
+        Tests running commands from arguments and a file on a single session
+        """
+
+        requests = []
+
+        def callback(request):
+            requests.append(request.params)
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>'
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            f.write('# morning routine\nSRV i2\n\n{"command": "UNKNOWN", "installation": "i3"}\n')
+
+        try:
+            cli_command = CLICommand()
+            cli_command.parse(["-u", "u1", "-p", "p1", "-i", "i1", "-c", "c1", "-l", "l1", "-b", path, "DARM", "EST"])
+            output = io.StringIO()
+            cli_command.run_batch(output)
+        finally:
+            os.remove(path)
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([("DARM", "i1"), ("EST", "i1"), ("SRV", "i2"), ("UNKNOWN", "i3")],
+                         [(r["command"], r["installation"]) for r in records])
+        self.assertEqual("OK", records[2]["result"]["RES"])
+        self.assertTrue(records[3]["error"].startswith("ValueError"))
+        self.assertEqual(records, cli_command.result)
+        self.assertEqual(1, len([r for r in requests if r["request"] == "LOGIN"]))
+        self.assertEqual(1, len([r for r in requests if r["request"] == "CLS"]))
+        self.assertEqual("i2", [r for r in requests if r["request"] == "SRV"][0]["numinst"])
+
+    @responses.activate
+    def test_run_batch_parallel(self):
+        """
+        Tests that parallel batches keep the order of the commands of each installation
+        """
+
+        def callback(request):
+            if request.params["request"] == "DARM1":
+                time.sleep(0.1)
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>'
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        cli_command = CLICommand()
+        cli_command.parse(["-u", "u1", "-p", "p1", "-i", "i1", "-c", "c1", "-l", "l1", "-P", "4", "DARM", "EST"])
+        output = io.StringIO()
+        cli_command.run_batch(output)
+        self.assertEqual(["DARM", "EST"], [r["command"] for r in cli_command.result])
+
+    @responses.activate
+    def test_export(self):
+        """
+        Tests exporting the activity logs of a batch to a columnar file
+        """
+
+        def callback(request):
+            if request.params["request"] == "ACT_V2":
+                return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><LIST>' \
+                                '<REG idsignal="2" signaltype="13" time="210101120000"/>' \
+                                '<REG idsignal="1" signaltype="2" time="210101110000"/></LIST></PET>'
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>'
+
+        from pysecuritas.api.columnar import ActivityColumns
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            cli_command = CLICommand()
+            cli_command.parse(["-u", "u1", "-p", "p1", "-i", "i1", "-c", "c1", "-l", "l1", "-e", path, "ACT_V2"])
+            cli_command.run()
+            self.assertEqual({"RES": "OK", "FILE": path, "ROWS": 2}, cli_command.result)
+
+            cli_command = CLICommand()
+            cli_command.parse(["-u", "u1", "-p", "p1", "-i", "i1", "-c", "c1", "-l", "l1", "-e", path, "ACT_V2",
+                               "SRV"])
+            output = io.StringIO()
+            cli_command.run_batch(output)
+            self.assertEqual(2, cli_command.result[0]["result"]["ROWS"])
+            self.assertEqual("OK", cli_command.result[1]["result"]["RES"])
+            with ActivityColumns.load(path) as columns:
+                self.assertEqual(2, len(columns))
+                self.assertEqual(["13", "2"], columns.categories("signaltype"))
+        finally:
+            os.remove(path)
+
+    def test_print_images(self):
+        """
+        Tests printing images streamed as bytes or kept in memory
+        """
+
+        cli_command = CLICommand()
+        cli_command.parse(["-u", "u1", "-p", "p1", "-c", "c1", "-l", "l1", "INF"])
+        cli_command.result = {"RES": "OK", "IMG": b"aGVsbG8=", "IMAGES": {"IMG1": memoryview(b"hello")}}
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cli_command.pretty_print()
+
+        self.assertEqual({"RES": "OK", "IMG": "aGVsbG8=", "IMAGES": {"IMG1": "aGVsbG8="}},
+                         json.loads(output.getvalue()))
+
+    def test_missing_command(self):
+        """
+        Tests that a command or a batch file is required
+        """
+
+        with pytest.raises(SystemExit):
+            CLICommand().parse(["-u", "u1", "-p", "p1", "-c", "c1", "-l", "l1"])
+
+        cli_command = CLICommand()
+        cli_command.parse(["-u", "u1", "-p", "p1", "-c", "c1", "-l", "l1", "-b", "-", "-P", "4"])
+        self.assertTrue(cli_command.is_batch())
+        self.assertEqual(4, cli_command.args.parallel)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+
+import pytest
+import responses
+
+from pysecuritas.api.batch import BatchExecutor
+from pysecuritas.cli.cli_command import CLICommand
+from pysecuritas.cli.daemon import Daemon, DaemonClient, DaemonException
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import BASE_URL
+from pysecuritas.core.transport import MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestDaemon(unittest.TestCase):
+    """
+    Test suite for the daemon and its client
+    """
+
+    def setUp(self):
+        self.requests = []
+        self.mock = responses.RequestsMock(assert_all_requests_are_fired=False)
+        self.mock.add_callback(responses.GET, BASE_URL, callback=self.callback)
+        self.mock.start()
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "daemon.sock")
+        self.daemon = Daemon(self.socket_path, BatchExecutor(poll_strategy=FixedPollStrategy(0))).bind()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        self.mock.stop()
+        self.mock.reset()
+        shutil.rmtree(self.directory)
+
+    def callback(self, request):
+        self.requests.append(request.params["request"])
+        if request.params["request"] == "LOGIN" and request.params["pwd"] == "wrong":
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES></PET>'
+
+        return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>'
+
+    def test_warm_session(self):
+        """
+        Tests that commands forwarded by the client share a single login
+        """
+
+        requests = self.requests
+        client = DaemonClient(self.socket_path)
+        for _ in range(3):
+            self.assertEqual("OK", client.execute("u1", "p1", "es", "es", "EST", "1")["RES"])
+
+        cli_command = CLICommand()
+        cli_command.parse(["-u", "u1", "-p", "p1", "-i", "1", "-c", "es", "-l", "es", "-d", self.socket_path, "SRV"])
+        cli_command.run()
+        self.assertEqual("OK", cli_command.result["RES"])
+        self.assertEqual(1, requests.count("LOGIN"))
+        self.assertEqual(3, requests.count("EST1"))
+        self.assertEqual(1, requests.count("SRV"))
+        self.assertEqual(0, stat.S_IMODE(os.stat(self.socket_path).st_mode) & 0o077)
+
+        with pytest.raises(DaemonException, match="ValueError"):
+            client.execute("u1", "p1", "es", "es", "UNKNOWN", "1")
+
+        self.daemon.shutdown()
+        self.thread.join()
+        self.assertEqual(1, requests.count("CLS"))
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_credentials(self):
+        """
+        Tests that a wrong password never reaches a warm session nor stops the right one from logging in,
+        and that a password change replaces the session
+        """
+
+        requests = self.requests
+        client = DaemonClient(self.socket_path)
+        for _ in range(2):
+            with pytest.raises(DaemonException, match="ConnectionException"):
+                client.execute("u1", "wrong", "es", "es", "EST", "1")
+
+        self.assertEqual("OK", client.execute("u1", "p1", "es", "es", "EST", "1")["RES"])
+        with pytest.raises(DaemonException, match="ConnectionException"):
+            client.execute("u1", "wrong", "es", "es", "EST", "1")
+
+        self.assertEqual("OK", client.execute("u1", "p1", "es", "es", "EST", "1")["RES"])
+        self.assertEqual(4, requests.count("LOGIN"))
+        self.assertEqual(1, len(self.daemon.executor.sessions))
+        self.assertEqual("OK", client.execute("u1", "p2", "es", "es", "EST", "1")["RES"])
+        self.assertEqual(1, requests.count("CLS"))
+        self.assertEqual(["p2"], [s.password for s in self.daemon.executor.sessions.values()])
+
+        self.daemon.shutdown()
+        self.thread.join()
+        self.assertEqual(2, requests.count("CLS"))
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_invalid_request(self):
+        """
+        Tests that malformed requests are answered with an error
+        """
+
+        with pytest.raises(DaemonException, match="AttributeError"):
+            DaemonClient(self.socket_path).execute(None, None, None, None, "EST")
+
+    def test_images(self):
+        """
+        Tests that images are written to the directory of the client, not the one of the daemon
+        """
+
+        response = self.daemon.handle({"username": "u1", "password": "p1", "country": "es", "language": "es",
+                                       "command": "IMG", "installation": "1", "sensor": "1", "directory": "images"})
+        self.assertIn("must be absolute", response["error"])
+
+        with MockSecuritasServer(image_size=16) as server:
+            executor = BatchExecutor(poll_strategy=FixedPollStrategy(0), transport=MemoryTransport(server.answer))
+            daemon = Daemon(os.path.join(self.directory, "images.sock"), executor).bind()
+            thread = threading.Thread(target=daemon.serve_forever)
+            thread.start()
+            cwd = os.getcwd()
+            try:
+                os.chdir(self.directory)
+                result = DaemonClient(daemon.socket_path).execute("u1", "p1", "es", "es", "IMG", "1", "1")
+            finally:
+                os.chdir(cwd)
+                daemon.shutdown()
+                thread.join()
+
+        self.assertEqual("OK", result["RES"])
+        for filename in result["FILES"].values():
+            self.assertTrue(os.path.isfile(os.path.join(self.directory, filename)))
+            self.assertFalse(os.path.exists(os.path.join(cwd, filename)))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pysecuritas.core.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    Test suite for result cache
+    """
+
+    def test_ttl(self):
+        """
+        Tests that results expire and copies are returned
+        """
+
+        cache = ResultCache(ttl=0.1)
+        cache.set("k", {"RES": "OK"})
+        result = cache.get("k")
+        result["RES"] = "changed"
+        self.assertEqual({"RES": "OK"}, cache.get("k"))
+        time.sleep(0.15)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test_lru(self):
+        """
+        Tests that the least recently used result is evicted
+        """
+
+        cache = ResultCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((1, None, 3), (cache.get("a"), cache.get("b"), cache.get("c")))
+
+    def test_invalidate(self):
+        """
+        Tests removing results by key prefix
+        """
+
+        cache = ResultCache()
+        for key in [cache.key("u1", "ES", "1", "SRV"), cache.key("u1", "ES", "1", "INS"),
+                    cache.key("u1", "ES", "12", "SRV"), cache.key("u2", "ES", "1", "SRV")]:
+            cache.set(key, key)
+
+        cache.invalidate("u1", "ES", "1")
+        self.assertEqual(["u1|ES|12|SRV", "u2|ES|1|SRV"], sorted(cache.entries))
+        cache.clear()
+        self.assertEqual(0, len(cache.entries))
+
+    def test_persistence(self):
+        """
+        Tests that results survive across instances using the same file
+        """
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "cache", "results.json")
+            cache = ResultCache(path=path)
+            cache.set("k", {"RES": "OK"})
+            cache.set("expired", 1)
+            cache.entries["expired"]["expires"] = 0
+            cache.set("other", 2)
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            loaded = ResultCache(path=path)
+            self.assertEqual({"RES": "OK"}, loaded.get("k"))
+            self.assertEqual(["k", "other"], sorted(loaded.entries))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pysecuritas.core.flight import SingleFlight, get_single_flight
+from pysecuritas.core.session import Session
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test suite for single flight
+    """
+
+    def test_coalesce(self):
+        """
+        Tests that concurrent calls with the same key share one call and receive their own copy of the result
+        """
+
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def call(key):
+            calls.append(key)
+            started.set()
+            time.sleep(0.2)
+
+            return {"RES": "OK", "KEY": key}
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(flight.do, "a", call, "a")
+            started.wait()
+            followers = [pool.submit(flight.do, "a", call, "a") for _ in range(3)]
+            other = pool.submit(flight.do, "b", call, "b")
+            results = [f.result() for f in [leader] + followers]
+
+        self.assertEqual(["a", "b"], sorted(calls))
+        self.assertEqual({"RES": "OK", "KEY": "b"}, other.result())
+        self.assertTrue(all(r == {"RES": "OK", "KEY": "a"} for r in results))
+        self.assertEqual(4, len(set(id(r) for r in results)))
+        self.assertEqual(0, flight.in_flight())
+        flight.do("a", call, "a")
+        self.assertEqual(3, len(calls))
+
+    def test_exception(self):
+        """
+        Tests that followers receive the exception raised by the call
+        """
+
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def call():
+            started.set()
+            time.sleep(0.2)
+            raise ValueError("failed")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "a", call)
+            started.wait()
+            follower = pool.submit(flight.do, "a", call)
+            for future in (leader, follower):
+                with pytest.raises(ValueError):
+                    future.result()
+
+        self.assertEqual(0, flight.in_flight())
+
+    def test_get_single_flight(self):
+        """
+        Tests that views of a session share its single flight, kept by the session
+        """
+
+        session = Session("u1", "p1", "i1", "es", "es")
+        self.assertIs(session.single_flight, get_single_flight(session))
+        self.assertIs(get_single_flight(session), get_single_flight(session.for_installation("i2")))
+        self.assertIsNot(get_single_flight(session), get_single_flight(Session("u1", "p1", "i1", "es", "es")))
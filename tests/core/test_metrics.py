@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import asyncio
+import unittest
+
+import pytest
+import responses
+
+from pysecuritas.aio.session import AsyncSession
+from pysecuritas.api.installation import Installation
+from pysecuritas.core.metrics import MetricsCollector, Histogram, SessionHook, OpenTelemetryHook
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import BASE_URL, Session
+from pysecuritas.core.transport import MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test suite for request metrics
+    """
+
+    def test_histogram(self):
+        """
+        Tests histogram buckets and quantiles
+        """
+
+        histogram = Histogram((1, 2, 5))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.7, 4, 10):
+            histogram.observe(value)
+        self.assertEqual([1, 3, 4], histogram.counts)
+        self.assertEqual(2, histogram.quantile(0.5))
+        self.assertEqual(float("inf"), histogram.quantile(0.99))
+
+    @responses.activate
+    def test_collector(self):
+        """
+        Tests collecting metrics of requests, polls and re-logins
+        """
+
+        body = '<?xml version="1.0" encoding="UTF-8"?><PET><RES>%s</RES>%s</PET>'
+        responses.add(responses.GET, BASE_URL, status=200, body=body % ("OK", ""))
+        responses.add(responses.GET, BASE_URL, status=200, body=body % ("WAIT", ""))
+        responses.add(responses.GET, BASE_URL, status=200, body=body % ("ERROR", "<ERR>60022</ERR>"))
+        responses.add(responses.GET, BASE_URL, status=200, body=body % ("OK", "<HASH>2</HASH>"))
+        responses.add(responses.GET, BASE_URL, status=200, body=body % ("OK", "<STATUS>0</STATUS>"))
+
+        collector = MetricsCollector()
+        session = Session("u1", "p1", "i1", "c1", "l1").add_hook(collector).add_hook(SessionHook())
+        session.login_hash = "1"
+        Installation(session, 10, FixedPollStrategy(0)).async_request("EST")
+        snapshot = collector.snapshot()
+        self.assertEqual(1, snapshot["requests"]["EST1"]["count"])
+        self.assertEqual(3, snapshot["requests"]["EST2"]["count"])
+        self.assertEqual(1, snapshot["requests"]["EST2"]["waits"])
+        self.assertEqual(1, snapshot["requests"]["LOGIN"]["count"])
+        self.assertGreater(snapshot["requests"]["EST2"]["bytes"], 0)
+        self.assertEqual(1, snapshot["relogins"])
+        self.assertEqual({"count": 1, "sum": 2, "timeouts": 0}, snapshot["polls"]["EST"])
+        text = collector.to_prometheus()
+        self.assertIn('pysecuritas_request_duration_seconds_count{request="EST2"} 3', text)
+        self.assertIn('pysecuritas_async_request_polls_bucket{action="EST",le="3"} 1', text)
+        self.assertIn("pysecuritas_relogins_total 1", text)
+
+    @responses.activate
+    def test_failing_request_and_hook(self):
+        """
+        Tests that failed requests are recorded and failing hooks do not break requests
+        """
+
+        class FailingHook(SessionHook):
+            def before_request(self, payload):
+                raise ValueError()
+
+        responses.add(responses.GET, BASE_URL, status=500)
+        collector = MetricsCollector()
+        session = Session("u1", "p1", "i1", "c1", "l1").add_hook(FailingHook()).add_hook(collector)
+        with self.assertRaises(Exception):
+            session.get({"request": "REQ"})
+        self.assertEqual(1, collector.snapshot()["requests"]["REQ"]["errors"])
+
+    def test_open_telemetry(self):
+        """
+        Tests that spans of concurrent async requests are not mixed and that re-logins are counted
+        """
+
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        tracer = provider.get_tracer("test")
+        reader = InMemoryMetricReader()
+        hook = OpenTelemetryHook(tracer, MeterProvider(metric_readers=[reader]).get_meter("test"))
+        sizes = []
+
+        class Sizes(SessionHook):
+            def after_request(self, payload, result, elapsed, size, parse_time, error=None):
+                sizes.append((payload["request"], size))
+
+        with MockSecuritasServer() as server:
+            session = AsyncSession("u1", "p1", "i1", "es", "es", transport=MemoryTransport(server.answer, 0.05))
+            session.add_hook(hook).add_hook(Sizes())
+
+            async def command(request):
+                with tracer.start_as_current_span("command " + request):
+                    return await session.get(session.build_payload(request=request,
+                                                                   ID=session.generate_request_id()))
+
+            async def run():
+                await session.connect()
+                server.hashes.clear()
+
+                return await asyncio.gather(command("SRV"), command("MYINSTALLATION"))
+
+            results = asyncio.run(run())
+
+        self.assertEqual(["OK", "OK"], [r["RES"] for r in results])
+        spans = exporter.get_finished_spans()
+        requests = [s for s in spans if s.name.startswith("securitas ")]
+        self.assertEqual(["LOGIN", "SRV", "MYINSTALLATION", "LOGIN", "SRV", "MYINSTALLATION"],
+                         [r for r, _ in sizes])
+        self.assertEqual(sorted(sizes), sorted((s.attributes["securitas.request"],
+                                                s.attributes["securitas.response_bytes"]) for s in requests))
+        self.assertTrue(all(s.name == "securitas " + s.attributes["securitas.request"] for s in requests))
+        self.assertEqual(1, sum(len([e for e in s.events if e.name == "securitas.relogin"]) for s in spans))
+        metric = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics[0]
+        self.assertEqual(("securitas.relogins", 1), (metric.name, metric.data.data_points[0].value))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import unittest
+from pyexpat import ExpatError
+
+import pytest
+import xmltodict
+
+from pysecuritas.core.parser import parse_stream
+
+
+def chunked(document, size):
+    """
+    Splits a document in byte chunks of a given size
+    """
+
+    data = document.encode("utf-8")
+
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestParser(unittest.TestCase):
+    """
+    Test suite for the streaming parser
+    """
+
+    def test_same_structure_as_xmltodict(self):
+        """
+        Tests that the streaming parser builds the same structure as xmltodict
+        """
+
+        documents = [
+            '<PET>correct</PET>',
+            '<PET><RES>OK</RES><HASH>11111111111</HASH><EMPTY/></PET>',
+            '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><LIST><REG signaltype="16" idsignal="1"/>'
+            '<REG signaltype="2" idsignal="2">text</REG></LIST></PET>',
+            '<PET>\n  <A x="1"><B>1</B><B>2</B><B>3</B></A>\n  <MSG>Señal</MSG>\n</PET>',
+        ]
+        for document in documents:
+            for size in (1, 7, 1024):
+                self.assertEqual(xmltodict.parse(document), parse_stream(chunked(document, size), skip=(), binary=()))
+
+    def test_skip_and_binary(self):
+        """
+        Tests skipping subtrees and returning binary text as bytes
+        """
+
+        document = '<PET><RES>OK</RES><BLOQ><A>1</A><BLOQ>2</BLOQ></BLOQ><DEVICES><DEVICE id="1">' \
+                   '<IMG id="1">aGVsbG8=</IMG><IMG id="2">d29ybGQ=</IMG></DEVICE></DEVICES></PET>'
+        result = parse_stream(chunked(document, 5))["PET"]
+        self.assertNotIn("BLOQ", result)
+        self.assertEqual("OK", result["RES"])
+        self.assertEqual([b"aGVsbG8=", b"d29ybGQ="], [i["#text"] for i in result["DEVICES"]["DEVICE"]["IMG"]])
+
+    def test_invalid_xml(self):
+        """
+        Tests parsing an invalid document
+        """
+
+        with pytest.raises(ExpatError):
+            parse_stream(chunked('<?xml version="1.0" encoding="UTF-8"?><tag>unclosed', 4))
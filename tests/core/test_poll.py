@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import itertools
+import unittest
+
+from pysecuritas.core.poll import FixedPollStrategy, ExponentialPollStrategy, LearnedPollStrategy
+
+
+def first(strategy, count, action="EST"):
+    """
+    Returns the first delays of a strategy
+
+    :param strategy strategy to be sampled
+    :param count number of delays
+    :param action action being polled
+    """
+
+    return list(itertools.islice(strategy.delays(action), count))
+
+
+class TestPoll(unittest.TestCase):
+    """
+    Test suite for poll strategies
+    """
+
+    def test_fixed(self):
+        """
+        Tests the historical fixed interval
+        """
+
+        self.assertEqual([2, 1, 1, 1], first(FixedPollStrategy(), 4))
+        self.assertEqual([0.3, 0.5, 0.5], first(FixedPollStrategy(0.5, 0.3), 3))
+
+    def test_exponential(self):
+        """
+        Tests exponential growth with and without jitter
+        """
+
+        self.assertEqual([0.5, 1.0, 2.0, 4.0, 4.0], first(ExponentialPollStrategy(0.5, 2, 4, 0), 5))
+        for delay, expected in zip(first(ExponentialPollStrategy(1, 2, 8, 0.1), 4), [1, 2, 4, 8]):
+            self.assertGreaterEqual(delay, expected * 0.9)
+            self.assertLessEqual(delay, expected * 1.1)
+
+    def test_learned(self):
+        """
+        Tests that the first poll moves towards the latency observed for each action
+        """
+
+        strategy = LearnedPollStrategy(initial=2, interval=0.5, factor=2, maximum=8, alpha=0.5, margin=1)
+        self.assertEqual([2, 0.5, 1.0, 2.0], first(strategy, 4))
+        strategy.record("EST", 0.4)
+        self.assertEqual([0.4, 0.5], first(strategy, 2))
+        strategy.record("EST", 0.8)
+        self.assertAlmostEqual(0.6, first(strategy, 1)[0])
+        self.assertEqual([2], first(strategy, 1, "ARM"))
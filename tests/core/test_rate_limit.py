@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import threading
+import time
+import unittest
+
+import pytest
+import responses
+
+from pysecuritas.core.rate_limit import RateLimiter, RateLimitException, get_priority
+from pysecuritas.core.session import Session, BASE_URL
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Test suite for rate limiter
+    """
+
+    def test_get_priority(self):
+        """
+        Tests the priority of requests
+        """
+
+        self.assertEqual(0, get_priority("DARM1"))
+        self.assertEqual(0, get_priority("DARM2"))
+        self.assertEqual(1, get_priority("ARM1"))
+        self.assertEqual(4, get_priority("EST2"))
+        self.assertEqual(4, get_priority("ACT_V2"))
+        self.assertEqual(3, get_priority("UNKNOWN"))
+        self.assertEqual(3, get_priority(None))
+
+    def test_rate(self):
+        """
+        Tests that requests beyond the burst are spaced by the rate
+        """
+
+        limiter = RateLimiter(20, 2)
+        started = time.time()
+        for _ in range(6):
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.time() - started, 0.19)
+        report = limiter.report()
+        self.assertEqual(6, report["acquired"])
+        self.assertEqual(0, report["queued"])
+        self.assertEqual({3: 6}, report["by_priority"])
+        self.assertGreater(report["max_wait"], 0)
+
+    def test_priority(self):
+        """
+        Tests that queued requests are served by priority
+        """
+
+        limiter = RateLimiter(5, 1)
+        limiter.acquire()
+        served = []
+
+        def acquire(priority):
+            limiter.acquire(priority)
+            served.append(priority)
+
+        threads = [threading.Thread(target=acquire, args=(p,)) for p in (4, 4, 0)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        self.assertEqual(3, limiter.report()["queued"])
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([0, 4, 4], served)
+
+    def test_timeout(self):
+        """
+        Tests giving up when waiting too long
+        """
+
+        limiter = RateLimiter(1, 1)
+        limiter.acquire()
+        with pytest.raises(RateLimitException):
+            limiter.acquire(timeout=0.05)
+
+        self.assertEqual(1, limiter.report()["rejected"])
+        self.assertEqual(0, limiter.report()["queued"])
+
+    def test_parent(self):
+        """
+        Tests that account limiters also respect a global limiter
+        """
+
+        shared = RateLimiter(20, 1)
+        accounts = [RateLimiter(100, 10, shared), RateLimiter(100, 10, shared)]
+        started = time.time()
+        for limiter in accounts * 2:
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.time() - started, 0.14)
+        self.assertEqual(4, shared.report()["acquired"])
+        self.assertEqual(2, accounts[0].report()["acquired"])
+
+    @responses.activate
+    def test_session(self):
+        """
+        Tests that every request of a session goes through its rate limiter
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>')
+        limiter = RateLimiter(100, 1)
+        with Session("u1", "p1", "i1", "es", "es").set_rate_limiter(limiter) as session:
+            session.for_installation("i2").get(session.build_payload(request="EST1"))
+
+        self.assertEqual({2: 2, 4: 1}, limiter.report()["by_priority"])
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import responses
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.installation import RequestException
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.retry import RetryEngine, RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenException, \
+    TRANSIENT, AUTH, BUSY, TIMEOUT, FATAL
+from pysecuritas.core.session import Session, BASE_URL
+from pysecuritas.core.transport import RequestsTransport, MemoryTransport
+from pysecuritas.testing.server import MockSecuritasServer
+
+OK = '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH><STATUS>1</STATUS></PET>'
+
+
+def http_error(status, retry_after=None):
+    """
+    Builds the exception raised by requests for an http error status
+    """
+
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+
+    return requests.HTTPError(response=response)
+
+
+class TestRetry(unittest.TestCase):
+    """
+    Test suite for the retry engine
+    """
+
+    def test_policy(self):
+        """
+        Tests retry delays
+        """
+
+        policy = RetryPolicy(5, 1, 2, 5, 0)
+        self.assertEqual([1, 2, 4, 5], [policy.delay(a) for a in range(1, 5)])
+        self.assertEqual(3, policy.delay(1, 3))
+        self.assertEqual(5, policy.delay(1, 60))
+        self.assertTrue(0.9 <= RetryPolicy(jitter=0.1).delay(1) <= 1.1)
+
+    def test_classify(self):
+        """
+        Tests categories of failures
+        """
+
+        engine = RetryEngine(codes={"B1": BUSY})
+        self.assertEqual((None, None), engine.classify({"RES": "OK"}))
+        self.assertEqual((AUTH, None), engine.classify({"RES": "ERROR", "ERR": "60022"}))
+        self.assertEqual((None, None), engine.classify({"RES": "ERROR", "ERR": "1"}))
+        self.assertEqual((TIMEOUT, None), engine.classify(None))
+        self.assertEqual((BUSY, None), engine.classify(error=RequestException("Busy", code="B1")))
+        self.assertEqual((FATAL, None), engine.classify(error=RequestException("Unknown request")))
+        self.assertEqual((TRANSIENT, None), engine.classify(error=requests.ConnectionError()))
+        self.assertEqual((TRANSIENT, 7), engine.classify(error=http_error(503, "7")))
+        category, retry_after = engine.classify(error=http_error(429, "Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertEqual(TRANSIENT, category)
+        self.assertLess(retry_after, 0)
+        self.assertEqual((FATAL, None), engine.classify(error=http_error(404)))
+        self.assertEqual((FATAL, None), engine.classify(error=ValueError()))
+        self.assertEqual((TRANSIENT, None), engine.classify(error=requests.Timeout()))
+        self.assertEqual((TRANSIENT, None), engine.classify(error=ConnectionResetError()))
+        self.assertEqual((FATAL, None), engine.classify(error=requests.exceptions.SSLError()))
+        self.assertEqual((FATAL, None), engine.classify(error=requests.exceptions.MissingSchema()))
+        self.assertEqual((FATAL, None), engine.classify(error=requests.exceptions.InvalidURL()))
+        self.assertEqual((FATAL, None), engine.classify(error=PermissionError()))
+
+    @responses.activate
+    def test_request_retries(self):
+        """
+        Tests that network errors are retried and expired logins renewed
+        """
+
+        responses.add(responses.GET, BASE_URL, body=requests.ConnectionError("reset"))
+        responses.add(responses.GET, BASE_URL, status=503, headers={"Retry-After": "0"})
+        responses.add(responses.GET, BASE_URL,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>60022</ERR></PET>')
+        responses.add(responses.GET, BASE_URL, body=OK)
+        engine = RetryEngine({TRANSIENT: RetryPolicy(3, 0)})
+        session = Session("u1", "p1", "i1", "es", "es", transport=RequestsTransport(retries=0))
+        session.set_retry_engine(engine).login_hash = "0"
+        self.assertEqual("OK", session.get({"request": "EST1", "hash": "0"})["RES"])
+        self.assertEqual(5, len(responses.calls))
+        self.assertEqual("LOGIN", responses.calls[3].request.params["request"])
+        self.assertEqual("1", responses.calls[4].request.params["hash"])
+        self.assertEqual({TRANSIENT: 2, AUTH: 1}, engine.report()["retries"])
+
+        responses.replace(responses.GET, BASE_URL, body=requests.ConnectionError("reset"))
+        with pytest.raises(requests.ConnectionError):
+            session.get({"request": "EST1", "hash": "1"})
+
+        self.assertEqual(9, len(responses.calls))
+        self.assertEqual({TRANSIENT: 1}, engine.report()["exhausted"])
+
+    def test_concurrent_relogin(self):
+        """
+        Tests that many requests hitting an expired login all succeed after a single re-login, whatever the budget
+        """
+
+        with MockSecuritasServer() as server:
+            session = Session("u1", "p1", "i1", "es", "es", transport=MemoryTransport(server.answer, 0.01))
+            session.set_retry_engine(RetryEngine())
+            session.connect()
+            server.hashes.clear()
+            with ThreadPoolExecutor(max_workers=40) as pool:
+                results = list(pool.map(lambda _: session.get(session.build_payload(
+                    request="SRV", ID=session.generate_request_id())), range(40)))
+
+        self.assertEqual(["OK"] * 40, [r["RES"] for r in results])
+        self.assertEqual(2, server.stats["LOGIN"])
+        self.assertEqual(10, session.retry_engine.report()["budget"])
+
+    def test_transport_retries(self):
+        """
+        Tests that the transport of a session with a retry engine does not retry by itself
+        """
+
+        session = Session("u1", "p1", "i1", "es", "es")
+        self.assertEqual(3, session.get_transport().retries)
+        session.set_retry_engine(RetryEngine())
+        self.assertEqual(0, session.get_transport().retries)
+        adapter = session.get_or_create_session().get_adapter(BASE_URL)
+        self.assertEqual(0, adapter.max_retries.total)
+
+    @responses.activate
+    def test_busy_panel(self):
+        """
+        Tests that a command answered with a busy panel error is sent again
+        """
+
+        answers = []
+
+        def callback(request):
+            answers.append(request.params["request"])
+            if answers.count("ARM2") == 1:
+                return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>B1</ERR>' \
+                                '<MSG>Panel busy</MSG></PET>'
+
+            return 200, {}, OK
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        session = Session("u1", "p1", "i1", "es", "es").set_retry_engine(
+            RetryEngine({BUSY: RetryPolicy(2, 0)}, {"B1": BUSY}))
+        session.login_hash = "1"
+        self.assertEqual("1", Alarm(session, 10, FixedPollStrategy(0, 0)).activate_total_mode()["STATUS"])
+        self.assertEqual(["ARM1", "ARM2", "ARM1", "ARM2"], answers)
+
+        session.set_retry_engine(None)
+        answers.clear()
+        with pytest.raises(RequestException) as e:
+            Alarm(session, 10, FixedPollStrategy(0, 0)).activate_total_mode()
+
+        self.assertEqual("B1", e.value.code)
+
+    def test_circuit_breaker(self):
+        """
+        Tests that commands to a failing installation are stopped for a while
+        """
+
+        calls = []
+
+        def fail():
+            calls.append(1)
+
+            raise requests.ConnectionError("down")
+
+        engine = RetryEngine({TRANSIENT: RetryPolicy(1, 0)}, breaker=CircuitBreaker(2, 0.2))
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                engine.execute(fail, "i1", sleep=lambda _: None)
+
+        with pytest.raises(CircuitOpenException):
+            engine.execute(fail, "i1")
+
+        self.assertEqual(4, len(calls))
+        self.assertEqual("OK", engine.execute(lambda: {"RES": "OK"}, "i2")["RES"])
+        self.assertEqual(["i1"], engine.report()["open"])
+        self.assertEqual(1, engine.report()["rejected"])
+
+        time.sleep(0.2)
+        self.assertIsNone(engine.execute(lambda: None, "i1"))
+        with pytest.raises(CircuitOpenException):
+            engine.execute(lambda: {"RES": "OK"}, "i1")
+
+        time.sleep(0.2)
+        self.assertEqual("OK", engine.execute(lambda: {"RES": "OK"}, "i1")["RES"])
+        self.assertEqual([], engine.report()["open"])
+
+    def test_budget(self):
+        """
+        Tests that retries stop once the budget is spent
+        """
+
+        calls = []
+
+        def fail():
+            calls.append(1)
+
+            raise requests.ConnectionError("down")
+
+        engine = RetryEngine({TRANSIENT: RetryPolicy(5, 0)}, budget=RetryBudget(0.5, 2))
+        with pytest.raises(requests.ConnectionError):
+            engine.execute(fail)
+
+        self.assertEqual(3, len(calls))
+        self.assertEqual(0, engine.report()["budget"])
+        with pytest.raises(requests.ConnectionError):
+            engine.execute(fail)
+
+        self.assertEqual(4, len(calls))
@@ -3,12 +3,32 @@
     :copyright: © pysecuritas, All Rights Reserved
 """
 
+import threading
 import unittest
 
 import pytest
 import responses
 
 from pysecuritas.core.session import Session, BASE_URL, ConnectionException
+from pysecuritas.core.token_store import TokenStore
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    In memory token store
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def get(self, username, country):
+        return self.hashes.get((username, country))
+
+    def set(self, username, country, login_hash):
+        self.hashes[(username, country)] = login_hash
+
+    def delete(self, username, country):
+        self.hashes.pop((username, country), None)
 
 
 class TestSession(unittest.TestCase):
@@ -31,6 +51,8 @@ class TestSession(unittest.TestCase):
         self.assertEqual(30, session.timeout)
         session.set_timeout(60)
         self.assertEqual(60, session.timeout)
+        self.assertFalse(session.streaming)
+        self.assertTrue(session.set_streaming(True).streaming)
 
     def test_build_payload(self):
         """
@@ -179,5 +201,122 @@ class TestSession(unittest.TestCase):
 
         session = Session("u1", "p1", "i1", "c1", "l1")
         session.login_hash = "2"
+        connections = session.get_or_create_session()
         session.get({"ACTION": "REQ"})
         self.assertEqual("11111111111", session.login_hash)
+        self.assertIs(connections, session.get_or_create_session())
+
+    @responses.activate
+    def test_concurrent_re_login(self):
+        """
+        Tests that threads hitting an expired hash at the same time share a single login
+        """
+
+        def callback(request):
+            if request.params["request"] == "LOGIN":
+                return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>3</HASH></PET>'
+            if request.params.get("hash") != "3":
+                return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>60022</ERR></PET>'
+
+            return 200, {}, '<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES></PET>'
+
+        responses.add_callback(responses.GET, BASE_URL, callback=callback)
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "2"
+        barrier = threading.Barrier(4)
+        results = []
+
+        def run():
+            barrier.wait()
+            results.append(session.get(session.build_payload(request="REQ")))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([{"RES": "OK"}] * 4, results)
+        self.assertEqual(1, len([c for c in responses.calls if c.request.params["request"] == "LOGIN"]))
+
+    def test_for_installation(self):
+        """
+        Tests building payloads for another installation sharing the login
+        """
+
+        session = Session("u1", "p1", "i1", "c1", "l1")
+        session.login_hash = "1"
+        view = session.for_installation("i2", "s2")
+        self.assertEqual("i2", view.build_payload()["numinst"])
+        self.assertEqual("1", view.build_payload()["hash"])
+        self.assertEqual("s2", view.sensor)
+        self.assertEqual("u1", view.username)
+        self.assertTrue(view.is_connected())
+
+    @responses.activate
+    def test_token_store(self):
+        """
+        Tests reusing a stored login and keeping it on close
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>'
+        )
+
+        store = MemoryTokenStore()
+        with Session("u1", "p1", "i1", "c1", "l1", token_store=store, keep_login=True) as session:
+            self.assertEqual("11111111111", session.login_hash)
+
+        self.assertEqual(["LOGIN"], [c.request.params["request"] for c in responses.calls])
+        with Session("u1", "p1", "i1", "c1", "l1", token_store=store) as session:
+            self.assertEqual("11111111111", session.login_hash)
+
+        self.assertEqual(["LOGIN", "CLS"], [c.request.params["request"] for c in responses.calls])
+        self.assertIsNone(store.get("u1", "C1"))
+
+    @responses.activate
+    def test_token_store_expired(self):
+        """
+        Tests that a stored login rejected by the server is replaced by a new login
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>ERROR</RES><ERR>60022</ERR></PET>'
+        )
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>11111111111</HASH></PET>'
+        )
+
+        store = MemoryTokenStore()
+        store.set("u1", "C1", "2")
+        session = Session("u1", "p1", "i1", "c1", "l1", token_store=store)
+        session.connect()
+        self.assertEqual("2", session.login_hash)
+        session.get(session.build_payload(request="REQ"))
+        self.assertEqual("11111111111", session.login_hash)
+        self.assertEqual("11111111111", store.get("u1", "C1"))
+
+    @responses.activate
+    def test_streaming_get(self):
+        """
+        Tests a request parsed incrementally
+        """
+
+        responses.add(
+            responses.GET,
+            BASE_URL,
+            status=200,
+            body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><BLOQ>1</BLOQ><IMG>aGVsbG8=</IMG></PET>'
+        )
+
+        session = Session("u1", "p1", "i1", "c1", "l1").set_streaming(True)
+        self.assertEqual({"RES": "OK", "IMG": b"aGVsbG8="}, session.get({"request": "REQ"}))
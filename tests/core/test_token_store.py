@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pysecuritas.core.token_store import FileTokenStore
+
+
+class TestTokenStore(unittest.TestCase):
+    """
+    Test suite for token stores
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "store", "tokens.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_store(self):
+        """
+        Tests storing, reading and deleting hashes per user and country
+        """
+
+        store = FileTokenStore(self.path)
+        self.assertIsNone(store.get("u1", "es"))
+        store.set("u1", "es", "h1")
+        store.set("u1", "it", "h2")
+        self.assertEqual("h1", FileTokenStore(self.path).get("u1", "ES"))
+        self.assertEqual("h2", store.get("u1", "IT"))
+        store.delete("u1", "es")
+        self.assertIsNone(store.get("u1", "es"))
+        self.assertEqual("h2", store.get("u1", "it"))
+        self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_expired(self):
+        """
+        Tests that hashes older than max age are ignored
+        """
+
+        FileTokenStore(self.path).set("u1", "es", "h1")
+        self.assertIsNone(FileTokenStore(self.path, max_age=-1).get("u1", "es"))
+        self.assertEqual("h1", FileTokenStore(self.path, max_age=60).get("u1", "es"))
+
+    def test_corrupted(self):
+        """
+        Tests that an unreadable store is considered empty
+        """
+
+        store = FileTokenStore(self.path)
+        store.set("u1", "es", "h1")
+        with open(self.path, "w") as f:
+            f.write("{")
+        self.assertIsNone(store.get("u1", "es"))
+        store.set("u1", "es", "h2")
+        self.assertEqual("h2", store.get("u1", "es"))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import unittest
+
+import pytest
+import responses
+from urllib3.util import ssl_
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.installation import Installation
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import Session, BASE_URL
+from pysecuritas.core.transport import RequestsTransport, HttpxTransport, MemoryTransport, CIPHERS
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestTransport(unittest.TestCase):
+    """
+    Test suite for transport
+    """
+
+    def test_configuration(self):
+        """
+        Tests that the pool configuration is applied to the mounted adapters
+        """
+
+        with RequestsTransport(pool_maxsize=4, pool_block=True, retries=1, keep_alive=False) as transport:
+            session = transport.get_or_create_session()
+            self.assertIs(session, transport.get_or_create_session())
+            adapter = session.get_adapter(BASE_URL)
+            self.assertEqual(4, adapter._pool_maxsize)
+            self.assertTrue(adapter._pool_block)
+            self.assertEqual(1, adapter.max_retries.total)
+            self.assertIs(adapter, session.get_adapter("http://localhost"))
+            self.assertEqual("close", session.headers["Connection"])
+
+        self.assertIsNone(transport.session)
+
+    def test_ciphers(self):
+        """
+        Tests that ciphers are set on the transport ssl context without changing urllib3 globals
+        """
+
+        ciphers = getattr(ssl_, "DEFAULT_CIPHERS", None)
+        for _ in range(2):
+            Session("u1", "p1", "i1", "es", "es").get_or_create_session()
+
+        self.assertEqual(ciphers, getattr(ssl_, "DEFAULT_CIPHERS", None))
+        self.assertTrue(CIPHERS.endswith("HIGH:!DH:!aNULL"))
+        adapter = RequestsTransport().get_or_create_session().get_adapter(BASE_URL)
+        self.assertIs(adapter.ssl_context, adapter.poolmanager.connection_pool_kw["ssl_context"])
+
+    @responses.activate
+    def test_shared(self):
+        """
+        Tests that sessions of different accounts share connections and only close their own transport
+        """
+
+        responses.add(responses.GET, BASE_URL, status=200,
+                      body='<?xml version="1.0" encoding="UTF-8"?><PET><RES>OK</RES><HASH>1</HASH></PET>')
+        transport = RequestsTransport()
+        sessions = [Session(u, "p1", "i1", "es", "es", transport=transport) for u in ("u1", "u2")]
+        for session in sessions:
+            session.connect()
+        self.assertIs(sessions[0].get_or_create_session(), sessions[1].get_or_create_session())
+
+        connections = transport.session
+        sessions[0].close()
+        self.assertIs(connections, transport.session)
+        self.assertIs(connections, sessions[1].get_or_create_session())
+
+        own = Session("u3", "p1", "i1", "es", "es")
+        own.connect()
+        self.assertIsNot(connections, own.get_or_create_session())
+        own.close()
+        self.assertIsNone(own.transport.session)
+
+    def test_memory(self):
+        """
+        Tests answering requests in memory, parsing them at once or streaming
+        """
+
+        server = MockSecuritasServer(waits=2)
+        try:
+            transport = MemoryTransport(server.answer)
+            for streaming in (False, True):
+                with Session("u1", "p1", "i1", "es", "es", transport=transport).set_streaming(streaming) as session:
+                    self.assertEqual("1", Alarm(session, 10, FixedPollStrategy(0, 0)).activate_total_mode()["STATUS"])
+        finally:
+            server.server.server_close()
+
+        self.assertEqual((2, 6), (server.stats["ARM1"], server.stats["ARM2"]))
+        self.assertEqual(server.stats["TOTAL"], transport.calls)
+
+    def test_httpx(self):
+        """
+        Tests sending requests with httpx
+        """
+
+        pytest.importorskip("h2")
+        with MockSecuritasServer(waits=1) as server:
+            with HttpxTransport(max_connections=2) as transport:
+                with Session("u1", "p1", "i1", "es", "es", transport=transport).set_base_url(server.url) as session:
+                    alarm = Alarm(session, 10, FixedPollStrategy(0.01, 0.01))
+                    self.assertEqual("1", alarm.activate_total_mode()["STATUS"])
+                    self.assertEqual("OK", Installation(session).get_activity_log()["RES"])
+                    session.set_streaming(True)
+                    self.assertEqual("1", alarm.get_status()["STATUS"])
+
+                self.assertIsNotNone(transport.client)
+
+            self.assertIsNone(transport.client)
+            self.assertEqual(1, server.stats["LOGIN"])
@@ -72,3 +72,19 @@ class TestUtils(unittest.TestCase):
         )
 
         self.assertEqual("correct", handle_response(requests.get("https://securitas.dummy.com")))
+
+    @responses.activate
+    def test_streaming_response_xml(self):
+        """
+        Tests parsing a response incrementally
+        """
+
+        responses.add(
+            responses.GET,
+            "https://securitas.dummy.com",
+            status=200,
+            body='<PET><RES>OK</RES><BLOQ><X>1</X></BLOQ><IMG>aGVsbG8=</IMG></PET>'
+        )
+
+        self.assertEqual({"RES": "OK", "IMG": b"aGVsbG8="},
+                         handle_response(requests.get("https://securitas.dummy.com", stream=True), True))
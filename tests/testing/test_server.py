@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    :copyright: © pysecuritas, All Rights Reserved
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pysecuritas.api.alarm import Alarm
+from pysecuritas.api.camera import Camera, DirectorySink, MemorySink
+from pysecuritas.api.installation import Installation
+from pysecuritas.core.poll import FixedPollStrategy
+from pysecuritas.core.session import Session
+from pysecuritas.testing.server import MockSecuritasServer
+
+
+class TestMockServer(unittest.TestCase):
+    """
+    End-to-end test suite against the mock server
+    """
+
+    def test_alarm_commands(self):
+        """
+        Tests two-phase alarm commands with WAIT answers
+        """
+
+        with MockSecuritasServer(waits=2) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                alarm = Alarm(session, 10, FixedPollStrategy(0.01, 0.01))
+                self.assertEqual("1", alarm.activate_total_mode()["STATUS"])
+                self.assertEqual("1", alarm.get_status()["STATUS"])
+                self.assertEqual("0", alarm.disconnect()["STATUS"])
+                log = Installation(session).get_activity_log()["LIST"]["REG"]
+                self.assertEqual(["1", "2"], [r["@signaltype"] for r in log])
+
+            self.assertEqual((1, 3), (server.stats["ARM1"], server.stats["ARM2"]))
+            self.assertEqual((1, 3), (server.stats["EST1"], server.stats["EST2"]))
+            self.assertEqual(1, server.stats["LOGIN"])
+            self.assertEqual(1, server.stats["CLS"])
+
+    def test_coalesced_status(self):
+        """
+        Tests that concurrent status requests on the same installation share one round trip
+        """
+
+        with MockSecuritasServer(latency=0.02, waits=3) as server:
+            with Session("u1", "p1", "i1", "es", "es").set_base_url(server.url) as session:
+                barrier = threading.Barrier(5)
+
+                def status():
+                    barrier.wait()
+
+                    return Alarm(session, 10, FixedPollStrategy(0.05, 0.05)).get_status()
+
+                with ThreadPoolExecutor(max_workers=5) as pool:
+                    results = list(pool.map(lambda _: status(), range(5)))
+
+            self.assertTrue(all(r["STATUS"] == "0" for r in results))
+            self.assertEqual((1, 4), (server.stats["EST1"], server.stats["EST2"]))
+
+    def test_re_login(self):
+        """
+        Tests that expired hashes are renewed by the session
+        """
+
+        with MockSecuritasServer(hash_ttl=2, expire_code="60067") as server:
+            session = Session("u1", "p1", "i1", "es", "es").set_base_url(server.url)
+            session.connect()
+            installation = Installation(session)
+            for _ in range(5):
+                self.assertEqual("Mock", installation.get_alias())
+
+            self.assertEqual(3, server.stats["LOGIN"])
+            self.assertEqual(2, server.stats["EXPIRED"])
+
+    def test_shared_session(self):
+        """
+        Tests that threads sharing a session renew expired logins once and keep their connections
+        """
+
+        with MockSecuritasServer(hash_ttl=40) as server:
+            session = Session("u1", "p1", "i1", "es", "es").set_base_url(server.url)
+            session.connect()
+            connections = session.get_or_create_session()
+
+            def work(i):
+                installation = Installation(session.for_installation(str(i)))
+                return [installation.get_alias() for _ in range(10)]
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(work, range(8)))
+
+            self.assertEqual([["Mock"] * 10] * 8, results)
+            self.assertIs(connections, session.get_or_create_session())
+            self.assertLessEqual(server.stats["LOGIN"], 1 + server.stats["EXPIRED"])
+            self.assertLess(server.stats["LOGIN"], 8)
+
+    def test_snapshot(self):
+        """
+        Tests capturing images
+        """
+
+        directory = tempfile.mkdtemp()
+        try:
+            with MockSecuritasServer(image_size=1000, images=2) as server:
+                with Session("u1", "p1", "i1", "es", "es", "7").set_base_url(server.url) as session:
+                    files = Camera(session, 10, FixedPollStrategy(0.01, 0.01)).capture_snapshots(
+                        DirectorySink(directory))["FILES"]
+
+            self.assertEqual(["IMG1", "IMG2"], sorted(files))
+            for filename in files.values():
+                self.assertEqual(1000, os.path.getsize(os.path.join(directory, filename)))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_snapshot_in_memory(self):
+        """
+        Tests capturing images without writing them to disk
+        """
+
+        with MockSecuritasServer(image_size=1000, images=2) as server:
+            with Session("u1", "p1", "i1", "es", "es", "7").set_base_url(server.url) as session:
+                camera = Camera(session, 10, FixedPollStrategy(0.01, 0.01))
+                images = camera.capture_images()
+                result = camera.capture_snapshots(MemorySink())
+
+        self.assertEqual([1000, 1000], [len(i) for i in images])
+        self.assertTrue(all(isinstance(i, memoryview) for i in images))
+        self.assertEqual(["IMG1", "IMG2"], sorted(result["IMAGES"]))
+        self.assertNotIn("FILES", result)